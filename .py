@@ -1,246 +1,1245 @@
+import os
 import sys
 import sqlite3
 import csv
-from datetime import datetime, timedelta
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+
+# Tiempos de arranque (segundos desde este punto, antes de importar Qt)
+STARTUP_T0 = time.perf_counter()
+STARTUP_TIMES = {}
+
+from finanzas_servicios import (
+    Money, ChangeEvent, DatabaseManager, DASHBOARD_WINDOWS, RECURRENCE_FREQUENCIES,
+    load_dashboard_summary, load_open_goals, generate_notifications, load_notifications,
+    unread_count, mark_notifications_read, materialize_recurrences, add_recurrence,
+    stop_recurrence, import_file, create_sample_data, export_file, search_transactions, filter_conditions,
+    DEFAULT_USER_ID, DEFAULT_CURRENCY, USER_CURRENCIES, load_users, user_currency, open_user_database, create_user,
+    month_keys
+)
+
+try:
+    import numpy as np
+    from finanzas_analitica import (
+        DEBT_STRATEGIES, DEBT_HORIZON_MONTHS, load_trends, load_debts, simulate_payoff
+    )
+except ImportError:  # la analítica es opcional; el resto de la app no usa NumPy
+    np = None
+
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
+    QLabel, QLineEdit, QPushButton, QTableView,
     QComboBox, QDateEdit, QMessageBox, QHeaderView, QGroupBox, QFormLayout,
-    QDoubleSpinBox, QProgressBar, QFrame, QListWidget,
-    QListWidgetItem, QDialog, QDialogButtonBox, QMenu,
-    QAbstractItemView, QStyleFactory, QInputDialog
+    QDoubleSpinBox, QProgressBar, QFrame,
+    QDialog, QDialogButtonBox, QMenu,
+    QAbstractItemView, QStyleFactory, QInputDialog, QFileDialog,
+    QGraphicsOpacityEffect, QListView, QStyledItemDelegate, QToolTip,
+    QSlider, QTableWidget, QTableWidgetItem, QSpinBox, QCheckBox, QGraphicsScene
 )
-from PyQt5.QtCore import Qt, QDate, QTimer, QPropertyAnimation, QEasingCurve
-from PyQt5.QtGui import QFont, QColor, QPixmap, QIcon, QPainter, QImage
-from PyQt5.QtChart import QChart, QChartView, QPieSeries, QBarSet, QBarSeries, QBarCategoryAxis, QValueAxis
-
-# ====================== BASE DE DATOS SIMPLIFICADA ======================
-class DatabaseManager:
-    def __init__(self, db_name='finanzas.db'):
-        self.connection = sqlite3.connect(db_name)
-        self.create_tables()
-    
-    def create_tables(self):
-        cursor = self.connection.cursor()
-        
-        # Tabla de usuarios
-        cursor.execute('''CREATE TABLE IF NOT EXISTS usuarios (
-                        id INTEGER PRIMARY KEY,
-                        nombre TEXT NOT NULL,
-                        email TEXT UNIQUE NOT NULL,
-                        moneda TEXT DEFAULT '$')''')
-        
-        # Tabla de ingresos
-        cursor.execute('''CREATE TABLE IF NOT EXISTS ingresos (
-                        id INTEGER PRIMARY KEY,
-                        usuario_id INTEGER NOT NULL,
-                        tipo TEXT NOT NULL,
-                        monto REAL NOT NULL,
-                        fecha DATE NOT NULL,
-                        descripcion TEXT)''')
-        
-        # Tabla de gastos
-        cursor.execute('''CREATE TABLE IF NOT EXISTS gastos (
-                        id INTEGER PRIMARY KEY,
-                        usuario_id INTEGER NOT NULL,
-                        categoria TEXT NOT NULL,
-                        tipo TEXT NOT NULL,
-                        monto REAL NOT NULL,
-                        fecha DATE NOT NULL,
-                        descripcion TEXT)''')
-        
-        # Tabla de deudas
-        cursor.execute('''CREATE TABLE IF NOT EXISTS deudas (
-                        id INTEGER PRIMARY KEY,
-                        usuario_id INTEGER NOT NULL,
-                        nombre TEXT NOT NULL,
-                        tipo TEXT NOT NULL,
-                        monto_inicial REAL NOT NULL,
-                        monto_actual REAL NOT NULL,
-                        tasa_interes REAL,
-                        fecha_inicio DATE,
-                        fecha_pago DATE)''')
-        
-        # Tabla de objetivos
-        cursor.execute('''CREATE TABLE IF NOT EXISTS objetivos (
-                        id INTEGER PRIMARY KEY,
-                        usuario_id INTEGER NOT NULL,
-                        titulo TEXT NOT NULL,
-                        tipo TEXT NOT NULL,
-                        monto_actual REAL DEFAULT 0,
-                        meta REAL,
-                        fecha_creacion DATE,
-                        fecha_meta DATE,
-                        completado BOOLEAN DEFAULT 0)''')
-        
-        # Tabla de notificaciones
-        cursor.execute('''CREATE TABLE IF NOT EXISTS notificaciones (
-                        id INTEGER PRIMARY KEY,
-                        usuario_id INTEGER NOT NULL,
-                        titulo TEXT NOT NULL,
-                        mensaje TEXT NOT NULL,
-                        fecha DATE NOT NULL,
-                        leida BOOLEAN DEFAULT 0)''')
-        
-        self.connection.commit()
-    
-    def execute_query(self, query, params=None):
-        cursor = self.connection.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        self.connection.commit()
-        return cursor
-    
-    def fetch_all(self, query, params=None):
-        cursor = self.connection.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        return cursor.fetchall()
+from PyQt5.QtCore import (
+    Qt, QDate, QTimer, QPropertyAnimation, QEasingCurve, QThread, pyqtSignal,
+    QAbstractTableModel, QModelIndex, QObject, QRunnable, QThreadPool,
+    QAbstractListModel, QEvent, QRect, QRectF, QSize, QPointF
+)
+from PyQt5.QtGui import QFont, QColor, QPixmap, QIcon, QPainter, QImage, QPalette, QCursor
+# PyQt5.QtChart se importa recién al construir el dashboard (ver DashboardTab)
+
+STARTUP_TIMES["importación"] = time.perf_counter() - STARTUP_T0
+
+def report_startup():
+    if "--startup-report" in sys.argv:
+        parts = [f"{name}: {seconds * 1000:.0f} ms" for name, seconds in STARTUP_TIMES.items()]
+        print("Arranque - " + ", ".join(parts), file=sys.stderr)
+
+# ====================== IMPORTACIÓN Y EXPORTACIÓN EN SEGUNDO PLANO ======================
+@contextmanager
+def warn_if_busy(parent):
+    # Las importaciones escriben todo el archivo en una sola transacción:
+    # mientras tanto, una escritura de la interfaz espera el timeout de
+    # sqlite3 y falla con "database is locked". Se avisa y se saltea el resto
+    # del bloque en vez de dejar que la excepción cierre la aplicación
+    try:
+        yield
+    except sqlite3.OperationalError as e:
+        if "locked" not in str(e):
+            raise
+        QMessageBox.warning(parent, "Base ocupada",
+                            "Hay una importación en curso. Intente de nuevo cuando termine.")
+
+class ImportWorker(QThread):
+    progress = pyqtSignal(int)
+    completed = pyqtSignal(int, int)
+    failed = pyqtSignal(str)
     
-    def fetch_one(self, query, params=None):
-        cursor = self.connection.cursor()
-        if params:
-            cursor.execute(query, params)
-        else:
-            cursor.execute(query)
-        return cursor.fetchone()
+    def __init__(self, db_name, importer, args, parent=None):
+        super().__init__(parent)
+        self.db_name = db_name
+        self.importer = importer
+        self.args = args
+    
+    def run(self):
+        # SQLite no comparte conexiones entre hilos: el hilo abre la suya.
+        # Cualquier error llega a failed, como en QueryWorker: es lo que
+        # vuelve a habilitar el botón y oculta la barra de progreso
+        db_manager = None
+        try:
+            db_manager = DatabaseManager(self.db_name)
+            imported, skipped = self.importer(db_manager, *self.args, progress=self.progress.emit)
+        except Exception as e:
+            self.failed.emit(str(e) or type(e).__name__)
+            return
+        finally:
+            if db_manager is not None:
+                db_manager.close()
+        self.completed.emit(imported, skipped)
+
+def start_import(tab, table):
+    path, _ = QFileDialog.getOpenFileName(
+        tab, "Importar movimientos", "",
+        "Extractos (*.csv *.txt *.ofx *.qfx *.qif);;Todos los archivos (*)"
+    )
+    if not path:
+        return
+    tab.btn_import.setEnabled(False)
+    tab.import_progress.setValue(0)
+    tab.import_progress.show()
+    
+    def finish():
+        tab.btn_import.setEnabled(True)
+        tab.import_progress.hide()
+        # La importación escribió desde otra conexión: se avisa a las vistas con
+        # un evento por tabla para que recarguen
+        for changed_table in ("ingresos", "gastos"):
+            tab.db_manager.publish(ChangeEvent(changed_table, "insert"))
+    
+    def on_completed(imported, skipped):
+        finish()
+        QMessageBox.information(
+            tab, "Importación completada",
+            f"Filas importadas: {imported:,}\nFilas omitidas: {skipped:,}"
+        )
+    
+    def on_failed(message):
+        finish()
+        QMessageBox.warning(tab, "Error al importar", f"{message}\n\nNo se guardó ninguna fila del archivo.")
+    
+    tab.import_worker = ImportWorker(tab.db_manager.db_name, import_file, (path, table, tab.user_id), tab)
+    tab.import_worker.progress.connect(tab.import_progress.setValue)
+    tab.import_worker.completed.connect(on_completed)
+    tab.import_worker.failed.connect(on_failed)
+    tab.import_worker.start()
+
+class ExportWorker(QThread):
+    progress = pyqtSignal(int)
+    completed = pyqtSignal(int)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, db_name, args, search=None, parent=None):
+        super().__init__(parent)
+        self.db_name = db_name
+        self.args = args
+        self.search = search
+    
+    def run(self):
+        # Conexión de solo lectura propia del hilo; la exportación va por
+        # lotes. Igual que al importar, todo error termina en failed
+        db_manager = None
+        try:
+            db_manager = DatabaseManager(self.db_name, read_only=True)
+            exported = export_file(db_manager, *self.args, progress=self.progress.emit, search=self.search)
+        except Exception as e:
+            self.failed.emit(str(e) or type(e).__name__)
+            return
+        finally:
+            if db_manager is not None:
+                db_manager.close()
+        self.completed.emit(exported)
+
+def start_export(tab, table):
+    path, _ = QFileDialog.getSaveFileName(
+        tab, "Exportar movimientos", f"{table}.csv",
+        "CSV (*.csv);;JSON Lines (*.jsonl);;CSV comprimido (*.csv.gz);;JSON Lines comprimido (*.jsonl.gz)"
+    )
+    if not path:
+        return
+    # Se exporta lo que muestra la tabla: los filtros y la búsqueda del modelo
+    filters = dict(tab.model.filters)
+    search = tab.model.search
+    tab.btn_export.setEnabled(False)
+    tab.import_progress.setRange(0, 0)
+    tab.import_progress.show()
+    
+    def finish():
+        tab.btn_export.setEnabled(True)
+        tab.import_progress.hide()
+        tab.import_progress.setRange(0, 100)
+        tab.import_progress.setFormat("%p%")
+    
+    def on_completed(exported):
+        finish()
+        QMessageBox.information(tab, "Exportación completada", f"Filas exportadas: {exported:,}")
+    
+    def on_failed(message):
+        finish()
+        QMessageBox.warning(tab, "Error al exportar", message)
+    
+    tab.export_worker = ExportWorker(tab.db_manager.db_name, (path, table, tab.user_id, filters), search, tab)
+    tab.export_worker.progress.connect(lambda count: tab.import_progress.setFormat(f"{count:,} filas"))
+    tab.export_worker.completed.connect(on_completed)
+    tab.export_worker.failed.connect(on_failed)
+    tab.export_worker.start()
+
+# ====================== CONSULTAS EN SEGUNDO PLANO ======================
+_thread_readers = threading.local()
+
+def reader_for(db_name):
+    # Cada hilo del pool conserva su propia conexión de lectura
+    readers = getattr(_thread_readers, "readers", None)
+    if readers is None:
+        readers = _thread_readers.readers = {}
+    reader = readers.get(db_name)
+    if reader is None:
+        reader = readers[db_name] = DatabaseManager(db_name, read_only=True)
+    return reader
+
+class QueryWorkerSignals(QObject):
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+
+class QueryWorker(QRunnable):
+    def __init__(self, request_id, db_name, job, read_only=True):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.request_id = request_id
+        self.db_name = db_name
+        self.job = job
+        self.read_only = read_only
+        self.cancelled = False
+        self.signals = QueryWorkerSignals()
+    
+    def execute(self):
+        if self.read_only:
+            return self.job(reader_for(self.db_name))
+        # Los trabajos que escriben abren su propia conexión, como ImportWorker
+        db_manager = DatabaseManager(self.db_name)
+        try:
+            return self.job(db_manager)
+        finally:
+            db_manager.close()
     
-    def close(self):
-        self.connection.close()
+    def run(self):
+        # Siempre se emite una de las dos señales: AsyncLoader deja de estar
+        # ocupado recién al recibirla. Cualquier error cuenta (SQLite, NumPy o
+        # un armado de datos), no solo sqlite3.Error
+        result = None
+        error = "La consulta se interrumpió"
+        try:
+            # Una petición que ya quedó vieja no llega a consultar la base
+            if not self.cancelled:
+                result = self.execute()
+            error = None
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        finally:
+            if error is None:
+                self.signals.finished.emit(self.request_id, result)
+            else:
+                self.signals.failed.emit(self.request_id, error)
+
+class AsyncLoader(QObject):
+    # Ejecuta job(db_manager) en el QThreadPool y entrega el resultado en el
+    # hilo de la interfaz; una petición nueva deja obsoletas las anteriores.
+    # Con read_only=False el trabajo recibe una conexión de escritura
+    def __init__(self, db_manager, parent=None, read_only=True):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.read_only = read_only
+        self.request_id = 0
+        self.workers = {}
+        self.on_result = None
+        self.on_error = None
+    
+    def request(self, job, on_result, on_error=None):
+        self.cancel()
+        self.request_id += 1
+        self.on_result = on_result
+        self.on_error = on_error
+        if self.db_manager.db_name == ":memory:":
+            # Una base en memoria no se puede abrir desde otro hilo
+            try:
+                result = job(self.db_manager)
+            except Exception as e:
+                if on_error:
+                    on_error(str(e) or type(e).__name__)
+                return
+            on_result(result)
+            return
+        worker = QueryWorker(self.request_id, self.db_manager.db_name, job, self.read_only)
+        worker.signals.finished.connect(self.handle_finished)
+        worker.signals.failed.connect(self.handle_failed)
+        self.workers[self.request_id] = worker
+        QThreadPool.globalInstance().start(worker)
+    
+    def cancel(self):
+        pool = QThreadPool.globalInstance()
+        for request_id, worker in list(self.workers.items()):
+            worker.cancelled = True
+            if pool.tryTake(worker):
+                del self.workers[request_id]
+    
+    def is_busy(self):
+        return self.request_id in self.workers
+    
+    def handle_finished(self, request_id, result):
+        self.workers.pop(request_id, None)
+        if request_id == self.request_id:
+            self.on_result(result)
+    
+    def handle_failed(self, request_id, message):
+        self.workers.pop(request_id, None)
+        if request_id == self.request_id and self.on_error:
+            self.on_error(message)
+
+# ====================== PLANIFICADOR DE REFRESCOS ======================
+class RefreshScheduler(QObject):
+    # Las vistas registran su función de recarga y las escrituras solo las
+    # marcan como pendientes. Un único QTimer con rebote agrupa las marcas:
+    # cada vista pendiente se recarga una vez, y las pestañas ocultas esperan
+    # a mostrarse
+    def __init__(self, interval=50, max_delay=300, parent=None):
+        super().__init__(parent)
+        self.callbacks = {}
+        self.dirty = {}
+        self.max_delay = max_delay / 1000
+        self.first_mark = None
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.run_pending)
+    
+    def register(self, view, callback):
+        self.callbacks[view] = callback
+    
+    def mark_dirty(self, view):
+        self.dirty[view] = True
+        now = time.monotonic()
+        if self.first_mark is None:
+            self.first_mark = now
+        # Se reinicia el rebote salvo que ya se haya esperado demasiado
+        if not self.timer.isActive() or now - self.first_mark < self.max_delay:
+            self.timer.start()
+    
+    def run_pending(self):
+        self.first_mark = None
+        for view in list(self.dirty):
+            # isVisibleTo también mira a los contenedores (pestaña no actual)
+            if view.isVisibleTo(view.window()):
+                self.run(view)
+    
+    def show_view(self, view):
+        # También las vistas pendientes que están dentro de la que se muestra
+        for dirty in list(self.dirty):
+            if dirty is view or (view is not None and view.isAncestorOf(dirty)):
+                self.run(dirty)
+    
+    def run(self, view):
+        del self.dirty[view]
+        self.callbacks[view]()
+    
+    def clear(self):
+        self.timer.stop()
+        self.first_mark = None
+        self.callbacks.clear()
+        self.dirty.clear()
+
+class NotificationScheduler(QObject):
+    unread_changed = pyqtSignal(int)
+    
+    # Revisa los avisos cada `interval` ms y, con rebote, después de cada
+    # escritura que pueda generarlos. El contador sale de estado_notificaciones
+    def __init__(self, db_manager, user_id, interval=60000, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.user_id = user_id
+        self.rescan = False
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.tick)
+        self.soon = QTimer(self)
+        self.soon.setSingleShot(True)
+        self.soon.setInterval(0)
+        self.soon.timeout.connect(self.tick)
+        db_manager.subscribe(self.handle_change)
+    
+    def start(self):
+        self.timer.start()
+        self.soon.start()
+    
+    def stop(self):
+        self.timer.stop()
+        self.soon.stop()
+        self.db_manager.unsubscribe(self.handle_change)
+    
+    def tick(self):
+        rescan, self.rescan = self.rescan, False
+        try:
+            generate_notifications(self.db_manager, self.user_id, rescan=rescan)
+        except sqlite3.OperationalError as e:
+            # Base ocupada por una importación: se reintenta en la próxima vuelta
+            if "locked" not in str(e):
+                raise
+            self.rescan = self.rescan or rescan
+    
+    def handle_change(self, event):
+        # Un objetivo o una deuda con fecha ya revisada obliga a repasar la
+        # franja de vencimientos; los gastos nuevos los encuentra la marca de id
+        if event.table in ("objetivos", "deudas"):
+            self.rescan = True
+            self.soon.start()
+        elif event.table == "gastos":
+            self.soon.start()
+        elif event.table == "notificaciones":
+            self.unread_changed.emit(self.unread())
+    
+    def unread(self):
+        return unread_count(self.db_manager, self.user_id)
+
+# ====================== TEMAS ======================
+# Colores de acento: los widgets los referencian por nombre mediante la
+# propiedad dinámica "accent", nunca con una hoja de estilos propia
+ACCENTS = ("primary", "danger", "success", "purple", "secondary")
+
+THEMES = {
+    "light": {
+        "window": "#f4f6f8", "surface": "#ffffff", "border": "#e0e0e0",
+        "text": "#212529", "muted": "#6c757d", "track": "#f8f9fa",
+        "alternate": "#f8f9fa", "highlight": "#0d6efd",
+        "primary": "#0d6efd", "danger": "#dc3545", "success": "#20c997",
+        "purple": "#6f42c1", "secondary": "#6c757d",
+        "hover": 20,
+    },
+    "dark": {
+        "window": "#16191d", "surface": "#1f2328", "border": "#343a40",
+        "text": "#e9ecef", "muted": "#adb5bd", "track": "#2b3035",
+        "alternate": "#262a2f", "highlight": "#3d8bfd",
+        "primary": "#3d8bfd", "danger": "#e35d6a", "success": "#3dd5a7",
+        "purple": "#8c68cd", "secondary": "#868e96",
+        "hover": -20,
+    },
+}
+
+STYLESHEET_TEMPLATE = """
+QFrame#card {{
+    background: {surface};
+    border-radius: 12px;
+    padding: 15px;
+    border: 1px solid {border};
+}}
+QLabel#card-title {{
+    font-size: 14px;
+    color: {muted};
+    font-weight: 500;
+}}
+QLabel#card-value {{
+    font-size: 24px;
+    font-weight: 700;
+    margin-top: 8px;
+    color: {text};
+}}
+{accent_rules}
+QPushButton[accent] {{
+    color: white;
+    border: none;
+    border-radius: 8px;
+    padding: 8px 16px;
+    font-weight: 600;
+    font-size: 14px;
+}}
+{button_rules}
+QFrame#panel {{
+    background: {surface};
+    border-radius: 12px;
+    border: 1px solid {border};
+}}
+QGroupBox#panel {{
+    border: 1px solid {border};
+    border-radius: 12px;
+    margin-top: 0;
+    padding-top: 20px;
+    background: {surface};
+}}
+QGroupBox#panel::title {{
+    subcontrol-origin: margin;
+    left: 10px;
+    padding: 0 8px;
+    font-weight: bold;
+}}
+QListView#goal-list {{
+    background-color: {surface};
+    border: none;
+}}
+QTableView {{
+    background-color: {surface};
+    alternate-background-color: {alternate};
+}}
+"""
+
+def adjust_color(hex_color, amount):
+    r, g, b = int(hex_color[1:3], 16), int(hex_color[3:5], 16), int(hex_color[5:7], 16)
+    r = min(255, max(0, r + amount))
+    g = min(255, max(0, g + amount))
+    b = min(255, max(0, b + amount))
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+def build_stylesheet(palette):
+    # Los colores de hover se calculan acá, una vez por paleta
+    accent_rules = "\n".join(
+        f'QLabel#card-value[accent="{accent}"] {{ color: {palette[accent]}; }}'
+        for accent in ACCENTS
+    )
+    button_rules = "\n".join(
+        f'QPushButton[accent="{accent}"] {{ background-color: {palette[accent]}; }}\n'
+        f'QPushButton[accent="{accent}"]:hover {{ background-color: {adjust_color(palette[accent], palette["hover"])}; }}'
+        for accent in ACCENTS
+    )
+    return STYLESHEET_TEMPLATE.format(accent_rules=accent_rules, button_rules=button_rules, **palette)
+
+_stylesheets = {}
+_current_theme = "light"
+
+def stylesheet_for(theme):
+    if theme not in _stylesheets:
+        _stylesheets[theme] = build_stylesheet(THEMES[theme])
+    return _stylesheets[theme]
+
+def current_theme():
+    return _current_theme
+
+def theme_color(name):
+    return THEMES[_current_theme][name]
+
+def apply_theme(app, theme):
+    # Una sola hoja de estilos para toda la aplicación, más la paleta de Qt
+    # para los widgets que no tienen reglas propias
+    global _current_theme
+    _current_theme = theme
+    colors = THEMES[theme]
+    palette = QPalette()
+    for role, key in (
+        (QPalette.Window, "window"), (QPalette.Base, "surface"),
+        (QPalette.AlternateBase, "alternate"), (QPalette.Button, "surface"),
+        (QPalette.WindowText, "text"), (QPalette.Text, "text"),
+        (QPalette.ButtonText, "text"), (QPalette.ToolTipBase, "surface"),
+        (QPalette.ToolTipText, "text"), (QPalette.Highlight, "highlight"),
+    ):
+        palette.setColor(role, QColor(colors[key]))
+    palette.setColor(QPalette.HighlightedText, QColor("#ffffff"))
+    app.setPalette(palette)
+    app.setStyleSheet(stylesheet_for(theme))
+
+def apply_chart_theme(chart, axes=()):
+    # Los QChart se pintan fuera de la hoja de estilos: cada pestaña con
+    # gráficos llama a esto al armarlos y en cada cambio de tema
+    text, surface, grid = (QColor(theme_color(name)) for name in ("text", "surface", "border"))
+    chart.setBackgroundBrush(surface)
+    chart.setTitleBrush(text)
+    chart.legend().setLabelColor(text)
+    for axis in axes:
+        axis.setLabelsColor(text)
+        axis.setTitleBrush(text)
+        axis.setGridLineColor(grid)
+
+# Hojas propias que CardWidget y ModernButton armaban para cada instancia
+# antes de la hoja compartida; solo las usa benchmark_widgets para comparar
+LEGACY_CARD_STYLE = """
+    #card {{
+        background: {surface};
+        border-radius: 12px;
+        padding: 15px;
+        border: 1px solid {border};
+    }}
+    QLabel#card-title {{
+        font-size: 14px;
+        color: {muted};
+        font-weight: 500;
+    }}
+    QLabel#card-value {{
+        font-size: 24px;
+        font-weight: 700;
+        margin-top: 8px;
+    }}
+"""
+
+LEGACY_BUTTON_STYLE = """
+    QPushButton {{
+        background-color: {color};
+        color: white;
+        border: none;
+        border-radius: 8px;
+        padding: 8px 16px;
+        font-weight: 600;
+        font-size: 14px;
+    }}
+    QPushButton:hover {{
+        background-color: {hover};
+    }}
+"""
+
+def apply_legacy_styles(card, button, accent):
+    palette = THEMES[_current_theme]
+    color = palette[accent]
+    card.setStyleSheet(LEGACY_CARD_STYLE.format(**palette))
+    card.lbl_value.setStyleSheet(f"color: {color};")
+    button.setStyleSheet(LEGACY_BUTTON_STYLE.format(color=color, hover=adjust_color(color, palette["hover"])))
+
+def benchmark_widgets(count=300):
+    # Compara crear tarjetas y botones con la hoja compartida contra
+    # asignar una hoja propia a cada widget (como se hacía antes)
+    results = {}
+    for mode in ("compartida", "por widget"):
+        started = time.perf_counter()
+        container = QWidget()
+        layout = QVBoxLayout(container)
+        for i in range(count):
+            accent = ACCENTS[i % len(ACCENTS)]
+            card = CardWidget("Tarjeta", "$0", accent)
+            button = ModernButton("Botón", color=accent)
+            if mode == "por widget":
+                apply_legacy_styles(card, button, accent)
+            layout.addWidget(card)
+            layout.addWidget(button)
+        container.ensurePolished()
+        for child in container.findChildren(QWidget):
+            child.ensurePolished()
+        results[mode] = time.perf_counter() - started
+        container.deleteLater()
+    parts = [f"{mode}: {seconds * 1000:.0f} ms" for mode, seconds in results.items()]
+    print(f"{count} tarjetas + {count} botones - " + ", ".join(parts), file=sys.stderr)
+    return results
 
 # ====================== COMPONENTES UI ======================
 class CardWidget(QFrame):
     def __init__(self, title, value, color, icon=None, parent=None):
+        # color es el nombre de un acento del tema (ACCENTS)
         super().__init__(parent)
         self.setObjectName("card")
         self.setMinimumWidth(200)
-        self.setStyleSheet(f"""
-            #card {{
-                background: #ffffff;
-                border-radius: 12px;
-                padding: 15px;
-                border: 1px solid #e0e0e0;
-            }}
-            QLabel#card-title {{
-                font-size: 14px;
-                color: #6c757d;
-                font-weight: 500;
-            }}
-            QLabel#card-value {{
-                font-size: 24px;
-                font-weight: 700;
-                margin-top: 8px;
-            }}
-        """)
         
         layout = QVBoxLayout()
         self.setLayout(layout)
         
-        lbl_title = QLabel(title)
-        lbl_title.setObjectName("card-title")
-        layout.addWidget(lbl_title)
+        self.lbl_title = QLabel(title)
+        self.lbl_title.setObjectName("card-title")
+        layout.addWidget(self.lbl_title)
         
         self.lbl_value = QLabel(value)
         self.lbl_value.setObjectName("card-value")
-        self.lbl_value.setStyleSheet(f"color: {color};")
+        self.lbl_value.setProperty("accent", color)
         layout.addWidget(self.lbl_value)
 
     def setValue(self, value):
         self.lbl_value.setText(value)
+        self.setToolTip("")
+        self.setLoading(False)
+    
+    def setLoading(self, loading):
+        # Mientras se recalcula, el valor anterior queda atenuado
+        if loading:
+            effect = QGraphicsOpacityEffect(self.lbl_value)
+            effect.setOpacity(0.35)
+            self.lbl_value.setGraphicsEffect(effect)
+        else:
+            self.lbl_value.setGraphicsEffect(None)
 
 class ModernButton(QPushButton):
-    def __init__(self, text, color="#0d6efd", parent=None):
+    def __init__(self, text, color="primary", parent=None):
+        # color es el nombre de un acento del tema (ACCENTS)
         super().__init__(text, parent)
         self.setMinimumHeight(36)
-        self.setStyleSheet(f"""
-            QPushButton {{
-                background-color: {color};
-                color: white;
-                border: none;
-                border-radius: 8px;
-                padding: 8px 16px;
-                font-weight: 600;
-                font-size: 14px;
-            }}
-            QPushButton:hover {{
-                background-color: {self.adjust_color(color, 20)};
-            }}
-        """)
-    
-    def adjust_color(self, hex_color, amount):
-        r, g, b = int(hex_color[1:3], 16), int(hex_color[3:5], 16), int(hex_color[5:7], 16)
-        r = min(255, max(0, r + amount))
-        g = min(255, max(0, g + amount))
-        b = min(255, max(0, b + amount))
-        return f"#{r:02x}{g:02x}{b:02x}"
-
-class GoalWidget(QWidget):
-    def __init__(self, title, goal_type, current, target, currency="$", parent=None):
+        self.setProperty("accent", color)
+
+class GoalDelegate(QStyledItemDelegate):
+    # Pinta cada objetivo (título, tipo, barra de progreso y botón de
+    # completar) directamente, sin un widget por fila
+    complete_requested = pyqtSignal(int)
+    
+    ROW_HEIGHT = 80
+    MARGIN = 4
+    PADDING = 12
+    BUTTON_SIZE = 32
+    
+    def __init__(self, currency=DEFAULT_CURRENCY, accent="success", parent=None):
         super().__init__(parent)
-        self.setStyleSheet("""
-            background-color: #ffffff;
-            border-radius: 8px;
-            padding: 12px;
-            border: 1px solid #e0e0e0;
-        """)
+        self.currency = currency
+        self.accent = accent
+        self.title_font = QFont("Arial", 11, QFont.Bold)
+        self.type_font = QFont("Arial", 9)
+        self.bar_font = QFont("Arial", 8)
+        self.button_font = QFont("Arial", 12, QFont.Bold)
+    
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.ROW_HEIGHT)
+    
+    def card_rect(self, rect):
+        return rect.adjusted(self.MARGIN, self.MARGIN, -self.MARGIN, -self.MARGIN)
+    
+    def button_rect(self, rect):
+        card = self.card_rect(rect)
+        return QRect(card.right() - self.PADDING - self.BUTTON_SIZE,
+                     card.center().y() - self.BUTTON_SIZE // 2,
+                     self.BUTTON_SIZE, self.BUTTON_SIZE)
+    
+    def paint(self, painter, option, index):
+        goal_id, title, goal_type, current, target = index.data(GoalListModel.GoalRole)
+        card = self.card_rect(option.rect)
+        button = self.button_rect(option.rect)
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        
+        # Tarjeta
+        painter.setPen(QColor(theme_color("border")))
+        painter.setBrush(QColor(theme_color("surface")))
+        painter.drawRoundedRect(QRectF(card), 8, 8)
+        
+        # Título y tipo
+        left = card.left() + self.PADDING
+        width = button.left() - self.PADDING - left
+        painter.setPen(QColor(theme_color("text")))
+        painter.setFont(self.title_font)
+        painter.drawText(QRect(left, card.top() + 8, width, 20), Qt.AlignLeft | Qt.AlignVCenter,
+                         painter.fontMetrics().elidedText(title, Qt.ElideRight, width))
+        painter.setPen(QColor(theme_color("muted")))
+        painter.setFont(self.type_font)
+        painter.drawText(QRect(left, card.top() + 28, width, 16), Qt.AlignLeft | Qt.AlignVCenter,
+                         f"Tipo: {goal_type}")
+        
+        # Barra de progreso
+        current, target = Money(current or 0), Money(target or 0)
+        progress = (current.cents / target.cents) * 100 if target.cents > 0 else 0
+        bar = QRect(left, card.top() + 46, width, 20)
+        painter.setPen(QColor(theme_color("border")))
+        painter.setBrush(QColor(theme_color("track")))
+        painter.drawRoundedRect(QRectF(bar), 6, 6)
+        filled = int(bar.width() * min(max(progress, 0), 100) / 100)
+        if filled > 0:
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(theme_color(self.accent)))
+            painter.drawRoundedRect(QRectF(bar.left(), bar.top(), filled, bar.height()), 6, 6)
+        painter.setPen(QColor(theme_color("text")))
+        painter.setFont(self.bar_font)
+        painter.drawText(bar, Qt.AlignCenter,
+                         f"{current.format(self.currency)} de {target.format(self.currency)} ({progress:.0f}%)")
+        
+        # Botón para completar
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(theme_color(self.accent)))
+        painter.drawRoundedRect(QRectF(button), 8, 8)
+        painter.setPen(QColor("#ffffff"))
+        painter.setFont(self.button_font)
+        painter.drawText(button, Qt.AlignCenter, "✓")
+        painter.restore()
+    
+    def editorEvent(self, event, model, option, index):
+        # Los clics se resuelven por posición sobre el rectángulo del botón
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            if self.button_rect(option.rect).contains(event.pos()):
+                self.complete_requested.emit(index.data(Qt.UserRole))
+                return True
+        return super().editorEvent(event, model, option, index)
+    
+    def helpEvent(self, event, view, option, index):
+        if event.type() == QEvent.ToolTip and self.button_rect(option.rect).contains(event.pos()):
+            QToolTip.showText(event.globalPos(), "Marcar como completado", view)
+            return True
+        return super().helpEvent(event, view, option, index)
+
+class TransactionFilterBar(QWidget):
+    changed = pyqtSignal()
+    
+    def __init__(self, category_label, categories, currency=DEFAULT_CURRENCY, search_delay=250, parent=None):
+        super().__init__(parent)
+        self.currency = currency
         layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
         self.setLayout(layout)
         
-        # Información del objetivo
-        info_layout = QVBoxLayout()
-        info_layout.setSpacing(5)
-        
-        lbl_title = QLabel(title)
-        lbl_title.setFont(QFont("Arial", 11, QFont.Bold))
-        info_layout.addWidget(lbl_title)
+        # Búsqueda mientras se escribe: el rebote espera una pausa al tipear
+        # para no consultar en cada tecla
+        self.search = QLineEdit()
+        self.search.setPlaceholderText("Buscar en descripciones…")
+        self.search.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(search_delay)
+        self.search_timer.timeout.connect(self.changed)
+        self.search.textChanged.connect(self.search_timer.start)
+        layout.addWidget(self.search, 1)
+        
+        # Las fechas y montos en su valor mínimo significan "sin límite"
+        self.date_from = self.create_date_edit("Desde: -")
+        self.date_to = self.create_date_edit("Hasta: -")
+        
+        self.category = QComboBox()
+        self.category.addItem(f"{category_label}: todas")
+        self.category.addItems(categories)
+        self.category.currentIndexChanged.connect(self.changed)
+        
+        self.amount_min = self.create_amount_spin("Mín: -")
+        self.amount_max = self.create_amount_spin("Máx: -")
+        
+        btn_clear = QPushButton("Limpiar")
+        btn_clear.clicked.connect(self.clear)
+        
+        for widget in (self.date_from, self.date_to, self.category, self.amount_min, self.amount_max):
+            layout.addWidget(widget)
+        layout.addWidget(btn_clear)
+    
+    def create_date_edit(self, special_text):
+        date_edit = QDateEdit()
+        date_edit.setCalendarPopup(True)
+        date_edit.setMinimumDate(QDate(1900, 1, 1))
+        date_edit.setSpecialValueText(special_text)
+        date_edit.setDate(date_edit.minimumDate())
+        date_edit.dateChanged.connect(self.changed)
+        return date_edit
+    
+    def create_amount_spin(self, special_text):
+        spin = QDoubleSpinBox()
+        spin.setRange(0, 1000000)
+        spin.setPrefix(f"{self.currency} ")
+        spin.setSpecialValueText(special_text)
+        spin.valueChanged.connect(self.changed)
+        return spin
+    
+    def date_value(self, date_edit):
+        if date_edit.date() == date_edit.minimumDate():
+            return None
+        return date_edit.date().toString("yyyy-MM-dd")
+    
+    def amount_cents(self, spin):
+        return Money.from_amount(spin.value()).cents or None
+    
+    def search_text(self):
+        return self.search.text().strip()
+    
+    def filters(self, category_column):
+        category = self.category.currentText() if self.category.currentIndex() > 0 else None
+        return {
+            "fecha": (self.date_value(self.date_from), self.date_value(self.date_to)),
+            category_column: category,
+            "monto": (self.amount_cents(self.amount_min), self.amount_cents(self.amount_max)),
+        }
+    
+    def clear(self):
+        # Se bloquean las señales para emitir un único cambio
+        widgets = (self.search, self.date_from, self.date_to, self.category, self.amount_min, self.amount_max)
+        for widget in widgets:
+            widget.blockSignals(True)
+        self.search.clear()
+        self.search_timer.stop()
+        self.date_from.setDate(self.date_from.minimumDate())
+        self.date_to.setDate(self.date_to.minimumDate())
+        self.category.setCurrentIndex(0)
+        self.amount_min.setValue(0)
+        self.amount_max.setValue(0)
+        for widget in widgets:
+            widget.blockSignals(False)
+        self.changed.emit()
+
+class RecurrenceSelector(QWidget):
+    # "No se repite" o una frecuencia con su intervalo (cada N meses/semanas/días)
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
         
-        lbl_type = QLabel(f"Tipo: {goal_type}")
-        lbl_type.setFont(QFont("Arial", 9))
-        lbl_type.setStyleSheet("color: #6c757d;")
-        info_layout.addWidget(lbl_type)
+        self.frequency_combo = QComboBox()
+        self.frequency_combo.addItem("No se repite", None)
+        for key, label in RECURRENCE_FREQUENCIES.items():
+            self.frequency_combo.addItem(label, key)
+        self.frequency_combo.currentIndexChanged.connect(self.update_interval)
         
-        # Barra de progreso
-        progress = (current / target) * 100 if target > 0 else 0
-        self.progress_bar = QProgressBar()
-        self.progress_bar.setValue(int(progress))
-        self.progress_bar.setFormat(f"{currency}{current:,.2f} de {currency}{target:,.2f} ({progress:.0f}%)")
-        self.progress_bar.setStyleSheet('''
-            QProgressBar {
-                border: 1px solid #e0e0e0;
-                border-radius: 6px;
-                text-align: center;
-                height: 20px;
-                background: #f8f9fa;
-                font-size: 10px;
-            }
-            QProgressBar::chunk {
-                background-color: #20c997;
-                border-radius: 6px;
-            }
-        ''')
-        info_layout.addWidget(self.progress_bar)
-        
-        layout.addLayout(info_layout, 1)
+        self.interval_spin = QSpinBox()
+        self.interval_spin.setRange(1, 365)
+        self.interval_spin.setPrefix("cada ")
         
-        # Botón para completar
-        self.btn_complete = ModernButton("✓", color="#20c997")
-        self.btn_complete.setFixedSize(32, 32)
-        self.btn_complete.setToolTip("Marcar como completado")
-        layout.addWidget(self.btn_complete)
+        layout.addWidget(self.frequency_combo, 1)
+        layout.addWidget(self.interval_spin)
+        self.update_interval()
+    
+    def update_interval(self):
+        suffixes = {"mensual": " mes(es)", "semanal": " semana(s)", "dias": " día(s)"}
+        frequency = self.frequency()
+        self.interval_spin.setEnabled(frequency is not None)
+        self.interval_spin.setSuffix(suffixes.get(frequency, ""))
+    
+    def frequency(self):
+        return self.frequency_combo.currentData()
+    
+    def interval(self):
+        return self.interval_spin.value()
+    
+    def reset(self):
+        self.frequency_combo.setCurrentIndex(0)
+        self.interval_spin.setValue(1)
+
+# ====================== MODELOS DE TABLA ======================
+def format_money(value, currency=DEFAULT_CURRENCY):
+    # value son centavos tal como vienen de la base
+    return Money(value).format(currency)
+
+class PagedTableModel(QAbstractTableModel):
+    reload_requested = pyqtSignal()
+    
+    # Carga las filas por páginas con paginación por clave (keyset) sobre
+    # (columna de orden, columna secundaria, id); el orden y los filtros se
+    # resuelven en SQL y el formato de cada celda solo se calcula cuando la
+    # vista la pinta. Con un texto de búsqueda las filas salen del índice FTS5
+    # en orden de relevancia, en una sola página
+    def __init__(self, db_manager, table, columns, headers, user_id,
+                 sort_column="fecha", descending=True, sortable_columns=None,
+                 secondary_sort=None, formatters=None, colors=None,
+                 page_size=200, parent=None):
+        super().__init__(parent)
+        self.db_manager = db_manager
+        self.table = table
+        self.columns = columns
+        self.headers = headers
+        self.user_id = user_id
+        self.sort_column = sort_column
+        self.descending = descending
+        self.sortable_columns = sortable_columns or columns
+        self.secondary_sort = secondary_sort
+        self.formatters = formatters or {}
+        self.colors = colors or {}
+        self.page_size = page_size
+        self.filters = {}
+        self.search = ""
+        self.rows = []
+        self.has_more = True
+        self.loading = False
+        self.loader = AsyncLoader(db_manager, self)
+        db_manager.subscribe(self.handle_change)
+    
+    def order_columns(self):
+        # El desempate por la columna secundaria deja que los índices
+        # (usuario_id, columna, fecha) resuelvan casi todo el orden
+        columns = [self.sort_column]
+        if self.secondary_sort and self.secondary_sort != self.sort_column:
+            columns.append(self.secondary_sort)
+        if self.sort_column != "id":
+            columns.append("id")
+        return tuple(columns)
+    
+    def filter_clause(self):
+        # Los nombres de columna solo pueden ser columnas del modelo
+        return filter_conditions(self.filters, self.columns)
+    
+    def page_query(self, after_key):
+        order_columns = self.order_columns()
+        direction = "DESC" if self.descending else "ASC"
+        order = ", ".join(f"{column} {direction}" for column in order_columns)
+        conditions, filter_params = self.filter_clause()
+        conditions.insert(0, "usuario_id = ?")
+        params = [self.user_id] + filter_params
+        if after_key is not None:
+            keys = ", ".join(order_columns)
+            marks = ", ".join("?" for _ in order_columns)
+            conditions.append(f"({keys}) {'<' if self.descending else '>'} ({marks})")
+            params.extend(after_key)
+        params.append(self.page_size)
+        query = (f"SELECT {', '.join(self.columns)} FROM {self.table} "
+                 f"WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT ?")
+        return query, params
+    
+    def last_key(self):
+        if not self.rows:
+            return None
+        last = self.rows[-1]
+        return [last[self.columns.index(column)] for column in self.order_columns()]
+    
+    def reload(self):
+        self.beginResetModel()
+        self.rows = []
+        self.has_more = True
+        self.loading = False
+        self.endResetModel()
+        self.fetchMore()
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+    
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+    
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self.has_more and not self.loading
+    
+    def fetchMore(self, parent=QModelIndex()):
+        # La página se lee en segundo plano; al llegar se agregan las filas
+        self.loading = True
+        if self.search:
+            search = (self.table, self.user_id, self.search, self.columns, dict(self.filters))
+            self.loader.request(lambda db: search_transactions(db, *search), self.append_page, self.page_failed)
+            return
+        query, params = self.page_query(self.last_key())
+        self.loader.request(lambda db: db.fetch_all(query, params), self.append_page, self.page_failed)
+    
+    def append_page(self, page):
+        self.loading = False
+        self.has_more = not self.search and len(page) == self.page_size
+        if not page:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self.rows.extend(page)
+        self.endInsertRows()
+    
+    def page_failed(self, message):
+        self.loading = False
+        self.has_more = False
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        value = self.rows[index.row()][index.column()]
+        if role == Qt.DisplayRole:
+            formatter = self.formatters.get(index.column())
+            if formatter:
+                return formatter(value)
+            return "" if value is None else str(value)
+        if role == Qt.ForegroundRole:
+            color = self.colors.get(index.column())
+            return color(value) if color else None
+        return None
+    
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.headers[section]
+        return None
+    
+    def sort(self, column, order=Qt.AscendingOrder):
+        sort_column = self.columns[column]
+        descending = order == Qt.DescendingOrder
+        if sort_column not in self.sortable_columns:
+            return
+        if (sort_column, descending) == (self.sort_column, self.descending):
+            return
+        self.sort_column = sort_column
+        self.descending = descending
+        self.reload()
+    
+    def set_filters(self, filters, reload=True):
+        if filters == self.filters:
+            return False
+        self.filters = filters
+        if reload:
+            self.reload()
+        return True
+    
+    def set_search(self, text, reload=True):
+        if text == self.search:
+            return False
+        self.search = text
+        if reload:
+            self.reload()
+        return True
+    
+    def row_id(self, row):
+        return self.rows[row][self.columns.index("id")]
+    
+    def find_row(self, row_id):
+        position = self.columns.index("id")
+        for row, values in enumerate(self.rows):
+            if values[position] == row_id:
+                return row
+        return -1
+    
+    def handle_change(self, event):
+        # Los eventos con fila se aplican como deltas; el resto recarga, y
+        # también durante una búsqueda (el orden es por relevancia)
+        if event.table != self.table:
+            return
+        if event.row is None or self.loading or self.search:
+            self.reload_requested.emit()
+        elif event.op == "insert":
+            self.insert_row(event.row)
+        elif event.op == "delete":
+            self.remove_row(event.row_id)
+        else:
+            self.update_row(event.row_id, event.row)
+    
+    def matches_filters(self, values):
+        for column, value in self.filters.items():
+            current = values.get(column)
+            if isinstance(value, tuple):
+                low, high = value
+                if (low is not None and current < low) or (high is not None and current > high):
+                    return False
+            elif value is not None and current != value:
+                return False
+        return True
+    
+    def comes_before(self, first, second):
+        positions = [self.columns.index(column) for column in self.order_columns()]
+        first_key = tuple(first[position] for position in positions)
+        second_key = tuple(second[position] for position in positions)
+        return first_key > second_key if self.descending else first_key < second_key
+    
+    def insert_row(self, values):
+        if values.get("usuario_id") != self.user_id or not self.matches_filters(values):
+            return
+        row = tuple(values.get(column) for column in self.columns)
+        # Búsqueda binaria de la posición según el orden actual
+        low, high = 0, len(self.rows)
+        while low < high:
+            middle = (low + high) // 2
+            if self.comes_before(self.rows[middle], row):
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self.rows) and self.has_more:
+            return  # cae después de lo cargado: llegará con fetchMore
+        self.beginInsertRows(QModelIndex(), low, low)
+        self.rows.insert(low, row)
+        self.endInsertRows()
+    
+    def remove_row(self, row_id):
+        row = self.find_row(row_id)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.rows[row]
+        self.endRemoveRows()
+    
+    def update_row(self, row_id, changes):
+        row = self.find_row(row_id)
+        if row < 0:
+            return
+        if any(column in changes for column in self.order_columns() + tuple(self.filters)):
+            self.reload_requested.emit()
+            return
+        values = list(self.rows[row])
+        for column, value in changes.items():
+            if column in self.columns:
+                values[self.columns.index(column)] = value
+        self.rows[row] = tuple(values)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.columns) - 1))
+
+def create_table_view(model):
+    table = QTableView()
+    table.setModel(model)
+    table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+    table.verticalHeader().setVisible(False)
+    table.setAlternatingRowColors(True)
+    table.setSelectionBehavior(QAbstractItemView.SelectRows)
+    table.setContextMenuPolicy(Qt.CustomContextMenu)
+    return table
+
+class GoalListModel(QAbstractListModel):
+    # Objetivos abiertos como tuplas (id, titulo, tipo, monto_actual, meta),
+    # ordenados por id; set_goals solo notifica las filas que cambiaron
+    GoalRole = Qt.UserRole + 1
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.goals = []
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.goals)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        goal = self.goals[index.row()]
+        if role == Qt.DisplayRole:
+            return goal[1]
+        if role == Qt.UserRole:
+            return goal[0]
+        if role == self.GoalRole:
+            return goal
+        return None
+    
+    def find_row(self, goal_id):
+        low, high = 0, len(self.goals)
+        while low < high:
+            middle = (low + high) // 2
+            if self.goals[middle][0] < goal_id:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def goal(self, goal_id):
+        row = self.find_row(goal_id)
+        if row < len(self.goals) and self.goals[row][0] == goal_id:
+            return self.goals[row]
+        return None
+    
+    def set_goals(self, goals):
+        wanted = {goal[0]: tuple(goal) for goal in goals}
+        for row in range(len(self.goals) - 1, -1, -1):
+            if self.goals[row][0] not in wanted:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.goals[row]
+                self.endRemoveRows()
+        for goal in wanted.values():
+            self.upsert(goal)
+    
+    def upsert(self, goal):
+        goal = tuple(goal)
+        row = self.find_row(goal[0])
+        if row < len(self.goals) and self.goals[row][0] == goal[0]:
+            if self.goals[row] != goal:
+                self.goals[row] = goal
+                self.dataChanged.emit(self.index(row), self.index(row))
+            return
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.goals.insert(row, goal)
+        self.endInsertRows()
+    
+    def remove(self, goal_id):
+        row = self.find_row(goal_id)
+        if row < len(self.goals) and self.goals[row][0] == goal_id:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.goals[row]
+            self.endRemoveRows()
 
 # ====================== PESTAÑA DASHBOARD ======================
+PIE_COLORS = ["#dc3545", "#fd7e14", "#ffc107", "#20c997", "#0d6efd", "#6f42c1"]
+
+def month_labels(keys):
+    label_format = "MMM" if len(keys) <= 12 else "MMM yy"
+    return [QDate(int(key[:4]), int(key[5:]), 1).toString(label_format) for key in keys]
+
+def set_money_axis(axis, currency):
+    # QValueAxis arma las etiquetas con printf sobre el formato en Latin-1: un
+    # símbolo que no es ASCII (€, £) sale como "?", así que va en el título
+    if currency.isascii():
+        axis.setLabelFormat(f"{currency}%d")
+        axis.setTitleText("")
+    else:
+        axis.setLabelFormat("%d")
+        axis.setTitleText(currency)
+
 class DashboardTab(QWidget):
-    def __init__(self, db_manager, user_id):
+    def __init__(self, db_manager, user_id, scheduler=None):
         super().__init__()
         self.db_manager = db_manager
         self.user_id = user_id
-        self.currency = "$"
+        self.scheduler = scheduler or RefreshScheduler(parent=self)
+        self.scheduler.register(self, self.refresh_data)
+        self.currency = user_currency(db_manager, user_id)
+        self.months = DASHBOARD_WINDOWS[0]
+        self.loader = AsyncLoader(db_manager, self)
+        self.summary = None
+        self.trends = None
         self.init_ui()
         self.refresh_data()
+        db_manager.subscribe(self.handle_change)
     
     def init_ui(self):
         main_layout = QVBoxLayout()
@@ -254,8 +1253,15 @@ class DashboardTab(QWidget):
         title.setFont(QFont("Arial", 18, QFont.Bold))
         header_layout.addWidget(title)
         
+        # Ventana de meses del gráfico de barras
+        self.window_combo = QComboBox()
+        for months in DASHBOARD_WINDOWS:
+            self.window_combo.addItem(f"{months} meses", months)
+        self.window_combo.currentIndexChanged.connect(self.change_window)
+        header_layout.addWidget(self.window_combo)
+        
         # Botón de actualizar
-        self.refresh_btn = ModernButton("Actualizar", color="#0d6efd")
+        self.refresh_btn = ModernButton("Actualizar", color="primary")
         self.refresh_btn.setFixedWidth(100)
         self.refresh_btn.clicked.connect(self.refresh_data)
         header_layout.addWidget(self.refresh_btn)
@@ -267,10 +1273,10 @@ class DashboardTab(QWidget):
         cards_layout.setSpacing(15)
         
         # Crear tarjetas
-        self.income_card = CardWidget("Ingresos Totales", f"{self.currency}0", "#0d6efd")
-        self.expense_card = CardWidget("Gastos Totales", f"{self.currency}0", "#dc3545")
-        self.savings_card = CardWidget("Ahorros", f"{self.currency}0", "#20c997")
-        self.net_card = CardWidget("Patrimonio Neto", f"{self.currency}0", "#6f42c1")
+        self.income_card = CardWidget("Ingresos Totales", f"{self.currency}0", "primary")
+        self.expense_card = CardWidget("Gastos Totales", f"{self.currency}0", "danger")
+        self.savings_card = CardWidget("Ahorros", f"{self.currency}0", "success")
+        self.net_card = CardWidget("Patrimonio Neto", f"{self.currency}0", "purple")
         
         cards_layout.addWidget(self.income_card)
         cards_layout.addWidget(self.expense_card)
@@ -286,7 +1292,7 @@ class DashboardTab(QWidget):
         # Gráfico de gastos por categoría
         self.expense_chart = self.create_expense_chart()
         chart_frame = QFrame()
-        chart_frame.setStyleSheet("background: white; border-radius: 12px; border: 1px solid #e0e0e0;")
+        chart_frame.setObjectName("panel")
         chart_layout = QVBoxLayout(chart_frame)
         chart_layout.addWidget(QLabel("Distribución de Gastos"))
         chart_layout.addWidget(self.expense_chart)
@@ -295,54 +1301,73 @@ class DashboardTab(QWidget):
         # Gráfico de ingresos vs gastos
         self.income_vs_expense_chart = self.create_income_vs_expense_chart()
         chart_frame2 = QFrame()
-        chart_frame2.setStyleSheet("background: white; border-radius: 12px; border: 1px solid #e0e0e0;")
+        chart_frame2.setObjectName("panel")
         chart_layout2 = QVBoxLayout(chart_frame2)
-        chart_layout2.addWidget(QLabel("Ingresos vs Gastos (Últimos 6 meses)"))
+        self.bar_chart_title = QLabel(f"Ingresos vs Gastos (Últimos {self.months} meses)")
+        chart_layout2.addWidget(self.bar_chart_title)
         chart_layout2.addWidget(self.income_vs_expense_chart)
         charts_layout.addWidget(chart_frame2, 1)
         
         main_layout.addLayout(charts_layout)
         
+        # Tendencia de gastos (analítica con NumPy; sin NumPy no se muestra)
+        self.trend_frame = None
+        if np is not None:
+            self.trend_frame = QFrame()
+            self.trend_frame.setObjectName("panel")
+            trend_layout = QVBoxLayout(self.trend_frame)
+            self.trend_title = QLabel("Tendencia de gastos")
+            trend_layout.addWidget(self.trend_title)
+            trend_layout.addWidget(self.create_trend_chart())
+            main_layout.addWidget(self.trend_frame)
+            self.trend_loader = AsyncLoader(self.db_manager, self)
+            self.scheduler.register(self.trend_frame, self.refresh_trends)
+        
         # Objetivos
         goals_group = QGroupBox("Objetivos Financieros")
-        goals_group.setStyleSheet("""
-            QGroupBox {
-                border: 1px solid #e0e0e0;
-                border-radius: 12px;
-                margin-top: 0;
-                padding-top: 20px;
-                background: white;
-            }
-            QGroupBox::title {
-                subcontrol-origin: margin;
-                left: 10px;
-                padding: 0 8px;
-                font-weight: bold;
-            }
-        """)
+        goals_group.setObjectName("panel")
         goals_layout = QVBoxLayout()
         goals_group.setLayout(goals_layout)
         
-        self.goals_list = QListWidget()
-        self.goals_list.setStyleSheet("background-color: #ffffff; border: none;")
+        self.goals_model = GoalListModel(self)
+        self.goals_delegate = GoalDelegate(self.currency, parent=self)
+        self.goals_delegate.complete_requested.connect(self.mark_goal_completed)
+        self.goals_list = QListView()
+        self.goals_list.setModel(self.goals_model)
+        self.goals_list.setItemDelegate(self.goals_delegate)
+        self.goals_list.setUniformItemSizes(True)
+        self.goals_list.setSelectionMode(QAbstractItemView.NoSelection)
+        self.goals_list.setObjectName("goal-list")
         self.goals_list.setMinimumHeight(150)
         
         goals_layout.addWidget(self.goals_list)
         main_layout.addWidget(goals_group)
+        self.apply_theme()
+    
+    def apply_theme(self):
+        # Los gráficos y la lista de objetivos se pintan fuera de la hoja de estilos
+        apply_chart_theme(self.chart)
+        apply_chart_theme(self.bar_chart, (self.axis_x, self.axis_y))
+        if self.trend_frame is not None:
+            apply_chart_theme(self.trend_chart, (self.trend_axis_x, self.trend_axis_y))
+        self.goals_list.viewport().update()
     
     def create_expense_chart(self):
+        from PyQt5.QtChart import QChart, QChartView, QPieSeries
         self.pie_series = QPieSeries()
         self.chart = QChart()
         self.chart.addSeries(self.pie_series)
         self.chart.setTitle("")
         self.chart.legend().setVisible(True)
         self.chart.legend().setAlignment(Qt.AlignRight)
+        self.pie_series.hovered.connect(self.show_category_tooltip)
         
         chart_view = QChartView(self.chart)
         chart_view.setMinimumHeight(250)
         return chart_view
     
     def create_income_vs_expense_chart(self):
+        from PyQt5.QtChart import QChart, QChartView, QBarSet, QBarSeries, QBarCategoryAxis, QValueAxis
         self.set_income = QBarSet("Ingresos")
         self.set_expense = QBarSet("Gastos")
         
@@ -354,15 +1379,13 @@ class DashboardTab(QWidget):
         self.bar_chart.addSeries(self.bar_series)
         self.bar_chart.setTitle("")
         
-        # Ejes
-        months = [QDate.currentDate().addMonths(-i).toString("MMM") for i in range(5, -1, -1)]
+        # Ejes (las etiquetas de meses se cargan en refresh_data)
         self.axis_x = QBarCategoryAxis()
-        self.axis_x.append(months)
         self.bar_chart.addAxis(self.axis_x, Qt.AlignBottom)
         self.bar_series.attachAxis(self.axis_x)
         
         self.axis_y = QValueAxis()
-        self.axis_y.setLabelFormat(f"{self.currency}%d")
+        set_money_axis(self.axis_y, self.currency)
         self.bar_chart.addAxis(self.axis_y, Qt.AlignLeft)
         self.bar_series.attachAxis(self.axis_y)
         
@@ -370,95 +1393,236 @@ class DashboardTab(QWidget):
         chart_view.setMinimumHeight(250)
         return chart_view
     
+    def create_trend_chart(self):
+        from PyQt5.QtChart import QChart, QChartView, QLineSeries, QBarCategoryAxis, QValueAxis
+        self.trend_chart = QChart()
+        self.trend_lines = {}
+        for key, name in (("gasto", "Gasto mensual"), (3, "Media 3 meses"), (12, "Media 12 meses")):
+            series = QLineSeries()
+            series.setName(name)
+            self.trend_chart.addSeries(series)
+            self.trend_lines[key] = series
+        
+        self.trend_axis_x = QBarCategoryAxis()
+        self.trend_chart.addAxis(self.trend_axis_x, Qt.AlignBottom)
+        self.trend_axis_y = QValueAxis()
+        set_money_axis(self.trend_axis_y, self.currency)
+        self.trend_chart.addAxis(self.trend_axis_y, Qt.AlignLeft)
+        for series in self.trend_lines.values():
+            series.attachAxis(self.trend_axis_x)
+            series.attachAxis(self.trend_axis_y)
+        
+        chart_view = QChartView(self.trend_chart)
+        chart_view.setRenderHint(QPainter.Antialiasing)
+        chart_view.setMinimumHeight(220)
+        return chart_view
+    
+    def change_window(self):
+        self.months = self.window_combo.currentData()
+        self.bar_chart_title.setText(f"Ingresos vs Gastos (Últimos {self.months} meses)")
+        self.refresh_data()
+    
     def refresh_data(self):
-        # Actualizar tarjetas
-        total_income = self.db_manager.fetch_one(
-            "SELECT SUM(monto) FROM ingresos WHERE usuario_id = ?", (self.user_id,)
-        )[0] or 0
-        
-        total_expense = self.db_manager.fetch_one(
-            "SELECT SUM(monto) FROM gastos WHERE usuario_id = ?", (self.user_id,)
-        )[0] or 0
-        
-        total_savings = self.db_manager.fetch_one(
-            "SELECT SUM(monto_actual) FROM objetivos WHERE usuario_id = ?", (self.user_id,)
-        )[0] or 0
-        
-        total_debts = self.db_manager.fetch_one(
-            "SELECT SUM(monto_actual) FROM deudas WHERE usuario_id = ?", (self.user_id,)
-        )[0] or 0
-        
-        net_worth = total_savings - total_debts
+        # Las consultas corren en segundo plano; un refresco nuevo descarta el anterior
+        for card in (self.income_card, self.expense_card, self.savings_card, self.net_card):
+            card.setLoading(True)
+        user_id, months = self.user_id, self.months
+        self.loader.request(
+            lambda db: (load_dashboard_summary(db, user_id, months), load_open_goals(db, user_id)),
+            self.apply_data, self.refresh_failed
+        )
+        self.refresh_trends()
+    
+    def refresh_failed(self, message):
+        # Quedan los valores anteriores, sin atenuar; el error en el tooltip
+        for card in (self.income_card, self.expense_card, self.savings_card, self.net_card):
+            card.setLoading(False)
+            card.setToolTip(f"No se pudo actualizar: {message}")
+    
+    def apply_data(self, result):
+        self.summary, goals = result
+        self.show_summary()
+        self.show_goals(goals)
+    
+    def refresh_trends(self):
+        # Carga columnar en su propio hilo: con muchos movimientos tarda más
+        # que el resumen y no debe demorarlo
+        if self.trend_frame is None:
+            return
+        user_id, months = self.user_id, self.months
+        self.trend_loader.request(lambda db: load_trends(db, user_id, months), self.show_trends)
+    
+    def show_trends(self, trends):
+        self.trends = trends
+        series = {"gasto": trends.monthly_expense / 100}
+        series.update((window, values / 100) for window, values in trends.expense_averages.items())
+        for key, values in series.items():
+            self.trend_lines[key].replace([QPointF(index, value) for index, value in enumerate(values)])
+        self.trend_axis_x.clear()
+        self.trend_axis_x.append(month_labels(trends.months))
+        peak = max(float(values.max()) for values in series.values()) if len(trends.months) else 0
+        self.trend_axis_y.setRange(0, peak * 1.1 if peak > 0 else 1)
+        rate = trends.window_savings_rate
+        rate_text = "-" if np.isnan(rate) else f"{rate:.0%}"
+        self.trend_title.setText(f"Tendencia de gastos · Tasa de ahorro: {rate_text}")
+    
+    def show_category_tooltip(self, slice_, state):
+        # Estadísticas por categoría de la analítica al pasar sobre el gráfico
+        stats = self.trends.expense_stats.get(slice_.label()) if state and self.trends else None
+        if stats is None:
+            QToolTip.hideText()
+            return
+        money = lambda cents: Money(round(cents)).format(self.currency)
+        QToolTip.showText(QCursor.pos(), "\n".join([
+            f"{slice_.label()}: {stats['cantidad']:,} gastos",
+            f"Media: {money(stats['media'])}",
+            f"Mediana: {money(stats['p50'])}",
+            f"Percentil 90: {money(stats['p90'])}",
+        ]))
+    
+    def show_summary(self):
+        summary = self.summary
         
-        self.income_card.setValue(f"{self.currency}{total_income:,.2f}")
-        self.expense_card.setValue(f"{self.currency}{total_expense:,.2f}")
-        self.savings_card.setValue(f"{self.currency}{total_savings:,.2f}")
-        self.net_card.setValue(f"{self.currency}{net_worth:,.2f}")
+        # Actualizar tarjetas
+        self.update_cards()
         
         # Actualizar gráfico de gastos
         self.pie_series.clear()
-        expense_data = self.db_manager.fetch_all(
-            "SELECT categoria, SUM(monto) FROM gastos WHERE usuario_id = ? GROUP BY categoria",
-            (self.user_id,)
-        )
-        
-        colors = ["#dc3545", "#fd7e14", "#ffc107", "#20c997", "#0d6efd", "#6f42c1"]
-        for i, (category, amount) in enumerate(expense_data):
-            if amount > 0:
-                slice_ = self.pie_series.append(category, amount)
-                slice_.setColor(QColor(colors[i % len(colors)]))
+        for category, amount in summary.expense_by_category:
+            self.set_pie_value(category, amount)
         
         # Actualizar gráfico de barras
         self.set_income.remove(0, self.set_income.count())
         self.set_expense.remove(0, self.set_expense.count())
+        self.set_income.append([cents / 100 for cents in summary.monthly_income])
+        self.set_expense.append([cents / 100 for cents in summary.monthly_expense])
         
-        current_date = QDate.currentDate()
-        for i in range(6):
-            month_start = current_date.addMonths(-i).addDays(-current_date.day() + 1)
-            month_end = month_start.addMonths(1).addDays(-1)
-            
-            monthly_income = self.db_manager.fetch_one(
-                "SELECT SUM(monto) FROM ingresos WHERE usuario_id = ? AND fecha BETWEEN ? AND ?",
-                (self.user_id, month_start.toString("yyyy-MM-dd"), month_end.toString("yyyy-MM-dd"))
-            )[0] or 0
-            
-            monthly_expense = self.db_manager.fetch_one(
-                "SELECT SUM(monto) FROM gastos WHERE usuario_id = ? AND fecha BETWEEN ? AND ?",
-                (self.user_id, month_start.toString("yyyy-MM-dd"), month_end.toString("yyyy-MM-dd"))
-            )[0] or 0
-            
-            self.set_income.append(monthly_income)
-            self.set_expense.append(monthly_expense)
-        
-        # Actualizar lista de objetivos
-        self.goals_list.clear()
-        goals = self.db_manager.fetch_all(
-            "SELECT id, titulo, tipo, monto_actual, meta FROM objetivos WHERE usuario_id = ? AND completado = 0",
-            (self.user_id,)
-        )
-        
-        for goal_id, title, goal_type, current, target in goals:
-            item = QListWidgetItem()
-            widget = GoalWidget(title, goal_type, current, target, self.currency)
-            widget.btn_complete.clicked.connect(
-                lambda _, gid=goal_id: self.mark_goal_completed(gid))
-            item.setSizeHint(widget.sizeHint())
-            self.goals_list.addItem(item)
-            self.goals_list.setItemWidget(item, widget)
+        self.axis_x.clear()
+        self.axis_x.append(month_labels(summary.months))
+        self.update_value_axis()
+    
+    def update_cards(self):
+        summary = self.summary
+        self.income_card.setValue(Money(summary.total_income).format(self.currency))
+        self.expense_card.setValue(Money(summary.total_expense).format(self.currency))
+        self.savings_card.setValue(Money(summary.total_savings).format(self.currency))
+        self.net_card.setValue(Money(summary.net_worth).format(self.currency))
+    
+    def update_value_axis(self):
+        peak = max(self.summary.monthly_income + self.summary.monthly_expense) / 100
+        self.axis_y.setRange(0, peak * 1.1 if peak > 0 else 1)
+    
+    def set_pie_value(self, category, cents):
+        amount = cents / 100
+        for slice_ in self.pie_series.slices():
+            if slice_.label() == category:
+                if amount > 0:
+                    slice_.setValue(amount)
+                else:
+                    self.pie_series.remove(slice_)
+                return
+        if amount > 0:
+            slice_ = self.pie_series.append(category, amount)
+            slice_.setColor(QColor(PIE_COLORS[(self.pie_series.count() - 1) % len(PIE_COLORS)]))
+    
+    def show_goals(self, goals):
+        self.goals_model.set_goals(goals)
+    
+    def add_goal_item(self, goal_id, title, goal_type, current, target):
+        self.goals_model.upsert((goal_id, title, goal_type, current, target))
+    
+    def remove_goal_item(self, goal_id):
+        self.goals_model.remove(goal_id)
+    
+    def handle_change(self, event):
+        # Deltas por fila sobre el resumen ya cargado; si no hay resumen, hay
+        # una carga en curso o el evento no trae la fila, se recarga todo
+        if event.table not in ("ingresos", "gastos", "objetivos", "deudas"):
+            return
+        if event.row is None or self.summary is None or self.loader.is_busy() or event.table == "deudas":
+            self.scheduler.mark_dirty(self)
+            return
+        if event.op == "update":
+            if event.table == "objetivos" and self.apply_goal_update(event.row_id, event.row):
+                return
+            self.scheduler.mark_dirty(self)
+            return
+        if event.row.get("usuario_id") != self.user_id:
+            return
+        sign = 1 if event.op == "insert" else -1
+        if event.table == "objetivos":
+            self.apply_goal_delta(event, sign)
+        else:
+            self.apply_transaction_delta(event.table, event.row, sign)
+    
+    def apply_goal_delta(self, event, sign):
+        row = event.row
+        self.summary.total_savings += sign * (row.get("monto_actual") or 0)
+        self.update_cards()
+        if sign > 0 and not row.get("completado"):
+            self.add_goal_item(event.row_id, row["titulo"], row["tipo"],
+                               row.get("monto_actual") or 0, row.get("meta") or 0)
+        elif sign < 0:
+            self.remove_goal_item(event.row_id)
+    
+    def apply_goal_update(self, goal_id, changes):
+        # Solo se aplican en el lugar los cambios sobre un objetivo ya listado
+        if set(changes) == {"completado"} and changes["completado"]:
+            self.remove_goal_item(goal_id)
+            return True
+        goal = self.goals_model.goal(goal_id)
+        if goal is None or not set(changes) <= {"titulo", "tipo", "monto_actual", "meta"}:
+            return False
+        _, title, goal_type, current, target = goal
+        updated = (goal_id, changes.get("titulo", title), changes.get("tipo", goal_type),
+                   changes.get("monto_actual", current), changes.get("meta", target))
+        self.summary.total_savings += (updated[3] or 0) - (current or 0)
+        self.update_cards()
+        self.goals_model.upsert(updated)
+        return True
+    
+    def apply_transaction_delta(self, table, row, sign):
+        summary = self.summary
+        amount = sign * row["monto"]
+        position = summary.months.index(row["fecha"][:7]) if row["fecha"][:7] in summary.months else None
+        if table == "ingresos":
+            summary.total_income += amount
+            if position is not None:
+                summary.monthly_income[position] += amount
+                self.set_income.replace(position, summary.monthly_income[position] / 100)
+        else:
+            summary.total_expense += amount
+            categories = dict(summary.expense_by_category)
+            categories[row["categoria"]] = categories.get(row["categoria"], 0) + amount
+            summary.expense_by_category = sorted(categories.items(), key=lambda item: item[1], reverse=True)
+            self.set_pie_value(row["categoria"], categories[row["categoria"]])
+            if position is not None:
+                summary.monthly_expense[position] += amount
+                self.set_expense.replace(position, summary.monthly_expense[position] / 100)
+        self.update_cards()
+        if position is not None:
+            self.update_value_axis()
+        # Las tendencias no tienen delta: se recalculan con rebote
+        if self.trend_frame is not None:
+            self.scheduler.mark_dirty(self.trend_frame)
     
     def mark_goal_completed(self, goal_id):
-        self.db_manager.execute_query(
-            "UPDATE objetivos SET completado = 1 WHERE id = ?", (goal_id,)
-        )
-        self.refresh_data()
+        with warn_if_busy(self):
+            self.db_manager.update("objetivos", goal_id, {"completado": 1})
 
 # ====================== PESTAÑA INGRESOS ======================
+INCOME_TYPES = ["Sueldo", "Freelance", "Inversiones", "Regalías", "Otros"]
+
 class IncomeTab(QWidget):
-    def __init__(self, db_manager, user_id):
+    def __init__(self, db_manager, user_id, scheduler=None):
         super().__init__()
         self.db_manager = db_manager
         self.user_id = user_id
+        self.currency = user_currency(db_manager, user_id)
+        self.scheduler = scheduler or RefreshScheduler(parent=self)
+        self.scheduler.register(self, self.load_data)
         self.init_ui()
+        self.model.reload_requested.connect(lambda: self.scheduler.mark_dirty(self))
         self.load_data()
     
     def init_ui(self):
@@ -472,12 +1636,12 @@ class IncomeTab(QWidget):
         
         # Tipo de ingreso
         self.income_type = QComboBox()
-        self.income_type.addItems(["Sueldo", "Freelance", "Inversiones", "Regalías", "Otros"])
+        self.income_type.addItems(INCOME_TYPES)
         
         # Monto
         self.income_amount = QDoubleSpinBox()
         self.income_amount.setRange(0, 1000000)
-        self.income_amount.setPrefix("$ ")
+        self.income_amount.setPrefix(f"{self.currency} ")
         
         # Fecha
         self.income_date = QDateEdit()
@@ -487,83 +1651,122 @@ class IncomeTab(QWidget):
         # Descripción
         self.income_description = QLineEdit()
         
+        # Repetición
+        self.income_recurrence = RecurrenceSelector()
+        
         form_layout.addRow("Tipo:", self.income_type)
         form_layout.addRow("Monto:", self.income_amount)
         form_layout.addRow("Fecha:", self.income_date)
         form_layout.addRow("Descripción:", self.income_description)
+        form_layout.addRow("Repetir:", self.income_recurrence)
         
         # Botón
-        btn_add = ModernButton("Agregar Ingreso", color="#0d6efd")
+        btn_add = ModernButton("Agregar Ingreso", color="primary")
         btn_add.clicked.connect(self.add_income)
         form_layout.addRow(btn_add)
         
         main_layout.addLayout(form_layout)
         
+        # Importación masiva desde CSV, OFX o QIF
+        import_layout = QHBoxLayout()
+        self.btn_import = ModernButton("Importar extracto", color="secondary")
+        self.btn_import.clicked.connect(lambda: start_import(self, "ingresos"))
+        import_layout.addWidget(self.btn_import)
+        self.btn_export = ModernButton("Exportar", color="secondary")
+        self.btn_export.clicked.connect(lambda: start_export(self, "ingresos"))
+        import_layout.addWidget(self.btn_export)
+        self.import_progress = QProgressBar()
+        self.import_progress.hide()
+        import_layout.addWidget(self.import_progress, 1)
+        main_layout.addLayout(import_layout)
+        
         # Tabla de ingresos
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["ID", "Tipo", "Monto", "Fecha", "Descripción"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setStyleSheet('''
-            QTableWidget {
-                background-color: white;
-                alternate-background-color: #f8f9fa;
-            }
-        ''')
-        self.table.verticalHeader().setVisible(False)
-        self.table.setAlternatingRowColors(True)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.model = PagedTableModel(
+            self.db_manager, "ingresos",
+            ["id", "tipo", "monto", "fecha", "descripcion"],
+            ["ID", "Tipo", "Monto", "Fecha", "Descripción"],
+            self.user_id, sortable_columns=["id", "tipo", "monto", "fecha"],
+            secondary_sort="fecha",
+            formatters={2: lambda value: format_money(value, self.currency)}
+        )
+        
+        # Filtros
+        self.filter_bar = TransactionFilterBar("Tipo", INCOME_TYPES, self.currency)
+        self.filter_bar.changed.connect(self.apply_filters)
+        main_layout.addWidget(self.filter_bar)
+        
+        self.table = create_table_view(self.model)
+        self.table.horizontalHeader().setSortIndicator(3, Qt.DescendingOrder)
+        self.table.setSortingEnabled(True)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
         
         main_layout.addWidget(self.table)
     
     def add_income(self):
-        self.db_manager.execute_query(
-            "INSERT INTO ingresos (usuario_id, tipo, monto, fecha, descripcion) VALUES (?, ?, ?, ?, ?)",
-            (self.user_id,
-             self.income_type.currentText(),
-             self.income_amount.value(),
-             self.income_date.date().toString("yyyy-MM-dd"),
-             self.income_description.text())
-        )
-        self.load_data()
-        self.income_description.clear()
-        self.income_amount.setValue(0)
+        amount = Money.from_amount(self.income_amount.value()).cents
+        day = self.income_date.date().toString("yyyy-MM-dd")
+        with warn_if_busy(self):
+            if self.income_recurrence.frequency():
+                add_recurrence(
+                    self.db_manager, self.user_id, "ingreso", self.income_type.currentText(), amount, day,
+                    self.income_recurrence.frequency(), self.income_recurrence.interval(),
+                    description=self.income_description.text(),
+                )
+            else:
+                self.db_manager.insert("ingresos", {
+                    "usuario_id": self.user_id,
+                    "tipo": self.income_type.currentText(),
+                    "monto": amount,
+                    "fecha": day,
+                    "descripcion": self.income_description.text(),
+                })
+            self.income_description.clear()
+            self.income_amount.setValue(0)
+            self.income_recurrence.reset()
     
     def load_data(self):
-        data = self.db_manager.fetch_all(
-            "SELECT id, tipo, monto, fecha, descripcion FROM ingresos WHERE usuario_id = ? ORDER BY fecha DESC",
-            (self.user_id,)
-        )
-        self.table.setRowCount(len(data))
-        
-        for row, record in enumerate(data):
-            for col, value in enumerate(record):
-                item = QTableWidgetItem(str(value))
-                if col == 2:  # Monto
-                    item.setText(f"${float(value):,.2f}")
-                self.table.setItem(row, col, item)
+        self.model.reload()
+    
+    def apply_filters(self):
+        # Los cambios de filtro y de búsqueda también pasan por el rebote del planificador
+        filters_changed = self.model.set_filters(self.filter_bar.filters("tipo"), reload=False)
+        search_changed = self.model.set_search(self.filter_bar.search_text(), reload=False)
+        if filters_changed or search_changed:
+            self.scheduler.mark_dirty(self)
     
     def show_context_menu(self, pos):
         menu = QMenu()
         delete_action = menu.addAction("Eliminar")
+        stop_action = menu.addAction("Dejar de repetir")
         action = menu.exec_(self.table.viewport().mapToGlobal(pos))
         
-        if action == delete_action:
-            selected_row = self.table.currentRow()
-            if selected_row >= 0:
-                income_id = self.table.item(selected_row, 0).text()
-                self.db_manager.execute_query("DELETE FROM ingresos WHERE id = ?", (income_id,))
-                self.load_data()
+        selected_row = self.table.currentIndex().row()
+        if selected_row < 0:
+            return
+        income_id = self.model.row_id(selected_row)
+        with warn_if_busy(self):
+            if action == delete_action:
+                self.db_manager.delete("ingresos", income_id)
+            elif action == stop_action and not stop_recurrence(self.db_manager, "ingresos", income_id):
+                QMessageBox.information(self, "Repetición", "Este ingreso no se repite.")
 
 # ====================== PESTAÑA GASTOS ======================
+EXPENSE_CATEGORIES = [
+    "Vivienda", "Alimentación", "Transporte", "Entretenimiento",
+    "Salud", "Educación", "Otros"
+]
+EXPENSE_TYPES = ["Variable", "Fijo"]
+
 class ExpensesTab(QWidget):
-    def __init__(self, db_manager, user_id):
+    def __init__(self, db_manager, user_id, scheduler=None):
         super().__init__()
         self.db_manager = db_manager
         self.user_id = user_id
+        self.currency = user_currency(db_manager, user_id)
+        self.scheduler = scheduler or RefreshScheduler(parent=self)
+        self.scheduler.register(self, self.load_data)
         self.init_ui()
+        self.model.reload_requested.connect(lambda: self.scheduler.mark_dirty(self))
         self.load_data()
     
     def init_ui(self):
@@ -577,103 +1780,143 @@ class ExpensesTab(QWidget):
         
         # Categoría
         self.expense_category = QComboBox()
-        self.expense_category.addItems([
-            "Vivienda", "Alimentación", "Transporte", "Entretenimiento", 
-            "Salud", "Educación", "Otros"
-        ])
+        self.expense_category.addItems(EXPENSE_CATEGORIES)
         
         # Monto
         self.expense_amount = QDoubleSpinBox()
         self.expense_amount.setRange(0, 1000000)
-        self.expense_amount.setPrefix("$ ")
+        self.expense_amount.setPrefix(f"{self.currency} ")
         
         # Fecha
         self.expense_date = QDateEdit()
         self.expense_date.setDate(QDate.currentDate())
         self.expense_date.setCalendarPopup(True)
         
+        # Tipo (fijo o variable)
+        self.expense_type = QComboBox()
+        self.expense_type.addItems(EXPENSE_TYPES)
+        
         # Descripción
         self.expense_description = QLineEdit()
         
+        # Repetición: un gasto que se repite pasa a ser fijo
+        self.expense_recurrence = RecurrenceSelector()
+        self.expense_recurrence.frequency_combo.currentIndexChanged.connect(self.recurrence_changed)
+        
         form_layout.addRow("Categoría:", self.expense_category)
+        form_layout.addRow("Tipo:", self.expense_type)
         form_layout.addRow("Monto:", self.expense_amount)
         form_layout.addRow("Fecha:", self.expense_date)
         form_layout.addRow("Descripción:", self.expense_description)
+        form_layout.addRow("Repetir:", self.expense_recurrence)
         
         # Botón
-        btn_add = ModernButton("Agregar Gasto", color="#dc3545")
+        btn_add = ModernButton("Agregar Gasto", color="danger")
         btn_add.clicked.connect(self.add_expense)
         form_layout.addRow(btn_add)
         
         main_layout.addLayout(form_layout)
         
+        # Importación masiva desde CSV, OFX o QIF
+        import_layout = QHBoxLayout()
+        self.btn_import = ModernButton("Importar extracto", color="secondary")
+        self.btn_import.clicked.connect(lambda: start_import(self, "gastos"))
+        import_layout.addWidget(self.btn_import)
+        self.btn_export = ModernButton("Exportar", color="secondary")
+        self.btn_export.clicked.connect(lambda: start_export(self, "gastos"))
+        import_layout.addWidget(self.btn_export)
+        self.import_progress = QProgressBar()
+        self.import_progress.hide()
+        import_layout.addWidget(self.import_progress, 1)
+        main_layout.addLayout(import_layout)
+        
         # Tabla de gastos
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["ID", "Categoría", "Monto", "Fecha", "Descripción"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setStyleSheet('''
-            QTableWidget {
-                background-color: white;
-                alternate-background-color: #f8f9fa;
-            }
-        ''')
-        self.table.verticalHeader().setVisible(False)
-        self.table.setAlternatingRowColors(True)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.model = PagedTableModel(
+            self.db_manager, "gastos",
+            ["id", "categoria", "monto", "fecha", "descripcion"],
+            ["ID", "Categoría", "Monto", "Fecha", "Descripción"],
+            self.user_id, sortable_columns=["id", "categoria", "monto", "fecha"],
+            secondary_sort="fecha",
+            formatters={2: lambda value: format_money(value, self.currency)},
+            colors={2: lambda value: QColor(theme_color("danger"))}
+        )
+        
+        # Filtros
+        self.filter_bar = TransactionFilterBar("Categoría", EXPENSE_CATEGORIES, self.currency)
+        self.filter_bar.changed.connect(self.apply_filters)
+        main_layout.addWidget(self.filter_bar)
+        
+        self.table = create_table_view(self.model)
+        self.table.horizontalHeader().setSortIndicator(3, Qt.DescendingOrder)
+        self.table.setSortingEnabled(True)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
         
         main_layout.addWidget(self.table)
     
+    def recurrence_changed(self):
+        if self.expense_recurrence.frequency():
+            self.expense_type.setCurrentText("Fijo")
+    
     def add_expense(self):
-        self.db_manager.execute_query(
-            "INSERT INTO gastos (usuario_id, categoria, tipo, monto, fecha, descripcion) VALUES (?, ?, ?, ?, ?, ?)",
-            (self.user_id,
-             self.expense_category.currentText(),
-             "Variable",  # Tipo fijo para simplificar
-             self.expense_amount.value(),
-             self.expense_date.date().toString("yyyy-MM-dd"),
-             self.expense_description.text())
-        )
-        self.load_data()
-        self.expense_description.clear()
-        self.expense_amount.setValue(0)
+        amount = Money.from_amount(self.expense_amount.value()).cents
+        day = self.expense_date.date().toString("yyyy-MM-dd")
+        with warn_if_busy(self):
+            if self.expense_recurrence.frequency():
+                add_recurrence(
+                    self.db_manager, self.user_id, "gasto", self.expense_category.currentText(), amount, day,
+                    self.expense_recurrence.frequency(), self.expense_recurrence.interval(),
+                    expense_type=self.expense_type.currentText(), description=self.expense_description.text(),
+                )
+            else:
+                self.db_manager.insert("gastos", {
+                    "usuario_id": self.user_id,
+                    "categoria": self.expense_category.currentText(),
+                    "tipo": self.expense_type.currentText(),
+                    "monto": amount,
+                    "fecha": day,
+                    "descripcion": self.expense_description.text(),
+                })
+            self.expense_description.clear()
+            self.expense_amount.setValue(0)
+            self.expense_recurrence.reset()
     
     def load_data(self):
-        data = self.db_manager.fetch_all(
-            "SELECT id, categoria, monto, fecha, descripcion FROM gastos WHERE usuario_id = ? ORDER BY fecha DESC",
-            (self.user_id,)
-        )
-        self.table.setRowCount(len(data))
-        
-        for row, record in enumerate(data):
-            for col, value in enumerate(record):
-                item = QTableWidgetItem(str(value))
-                if col == 2:  # Monto
-                    item.setText(f"${float(value):,.2f}")
-                    item.setForeground(QColor("#dc3545"))
-                self.table.setItem(row, col, item)
+        self.model.reload()
+    
+    def apply_filters(self):
+        # Los cambios de filtro y de búsqueda también pasan por el rebote del planificador
+        filters_changed = self.model.set_filters(self.filter_bar.filters("categoria"), reload=False)
+        search_changed = self.model.set_search(self.filter_bar.search_text(), reload=False)
+        if filters_changed or search_changed:
+            self.scheduler.mark_dirty(self)
     
     def show_context_menu(self, pos):
         menu = QMenu()
         delete_action = menu.addAction("Eliminar")
+        stop_action = menu.addAction("Dejar de repetir")
         action = menu.exec_(self.table.viewport().mapToGlobal(pos))
         
-        if action == delete_action:
-            selected_row = self.table.currentRow()
-            if selected_row >= 0:
-                expense_id = self.table.item(selected_row, 0).text()
-                self.db_manager.execute_query("DELETE FROM gastos WHERE id = ?", (expense_id,))
-                self.load_data()
+        selected_row = self.table.currentIndex().row()
+        if selected_row < 0:
+            return
+        expense_id = self.model.row_id(selected_row)
+        with warn_if_busy(self):
+            if action == delete_action:
+                self.db_manager.delete("gastos", expense_id)
+            elif action == stop_action and not stop_recurrence(self.db_manager, "gastos", expense_id):
+                QMessageBox.information(self, "Repetición", "Este gasto no se repite.")
 
 # ====================== PESTAÑA AHORROS ======================
 class SavingsTab(QWidget):
-    def __init__(self, db_manager, user_id):
+    def __init__(self, db_manager, user_id, scheduler=None):
         super().__init__()
         self.db_manager = db_manager
         self.user_id = user_id
+        self.currency = user_currency(db_manager, user_id)
+        self.scheduler = scheduler or RefreshScheduler(parent=self)
+        self.scheduler.register(self, self.load_data)
         self.init_ui()
+        self.model.reload_requested.connect(lambda: self.scheduler.mark_dirty(self))
         self.load_data()
     
     def init_ui(self):
@@ -694,9 +1937,9 @@ class SavingsTab(QWidget):
         
         # Montos
         self.goal_current = QDoubleSpinBox()
-        self.goal_current.setPrefix("$ ")
+        self.goal_current.setPrefix(f"{self.currency} ")
         self.goal_target = QDoubleSpinBox()
-        self.goal_target.setPrefix("$ ")
+        self.goal_target.setPrefix(f"{self.currency} ")
         
         # Fecha meta
         self.goal_date = QDateEdit()
@@ -710,63 +1953,289 @@ class SavingsTab(QWidget):
         form_layout.addRow("Fecha meta:", self.goal_date)
         
         # Botón
-        btn_add = ModernButton("Agregar Objetivo", color="#20c997")
+        btn_add = ModernButton("Agregar Objetivo", color="success")
         btn_add.clicked.connect(self.add_savings)
         form_layout.addRow(btn_add)
         
         main_layout.addLayout(form_layout)
         
         # Tabla de ahorros
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["ID", "Título", "Tipo", "Actual", "Meta", "Completado"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.table.setStyleSheet('''
-            QTableWidget {
-                background-color: white;
-                alternate-background-color: #f8f9fa;
-            }
-        ''')
-        self.table.verticalHeader().setVisible(False)
-        self.table.setAlternatingRowColors(True)
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.model = PagedTableModel(
+            self.db_manager, "objetivos",
+            ["id", "titulo", "tipo", "monto_actual", "meta", "completado"],
+            ["ID", "Título", "Tipo", "Actual", "Meta", "Completado"],
+            self.user_id, sort_column="id", descending=False,
+            formatters={
+                3: lambda value: format_money(value, self.currency),
+                4: lambda value: format_money(value, self.currency),
+                5: lambda value: "Sí" if value == 1 else "No",
+            },
+            colors={5: lambda value: QColor(theme_color("success" if value == 1 else "danger"))}
+        )
+        self.table = create_table_view(self.model)
         self.table.customContextMenuRequested.connect(self.show_context_menu)
         
         main_layout.addWidget(self.table)
     
     def add_savings(self):
-        self.db_manager.execute_query(
-            "INSERT INTO objetivos (usuario_id, titulo, tipo, monto_actual, meta, fecha_creacion, fecha_meta) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (self.user_id,
-             self.goal_title.text(),
-             self.goal_type.currentText(),
-             self.goal_current.value(),
-             self.goal_target.value(),
-             QDate.currentDate().toString("yyyy-MM-dd"),
-             self.goal_date.date().toString("yyyy-MM-dd"))
-        )
+        with warn_if_busy(self):
+            self.db_manager.insert("objetivos", {
+                "usuario_id": self.user_id,
+                "titulo": self.goal_title.text(),
+                "tipo": self.goal_type.currentText(),
+                "monto_actual": Money.from_amount(self.goal_current.value()).cents,
+                "meta": Money.from_amount(self.goal_target.value()).cents,
+                "fecha_creacion": QDate.currentDate().toString("yyyy-MM-dd"),
+                "fecha_meta": self.goal_date.date().toString("yyyy-MM-dd"),
+                "completado": 0,
+            })
+            self.goal_title.clear()
+            self.goal_current.setValue(0)
+            self.goal_target.setValue(0)
+    
+    def load_data(self):
+        self.model.reload()
+    
+    def show_context_menu(self, pos):
+        menu = QMenu()
+        delete_action = menu.addAction("Eliminar")
+        action = menu.exec_(self.table.viewport().mapToGlobal(pos))
+        
+        if action == delete_action:
+            selected_row = self.table.currentIndex().row()
+            if selected_row >= 0:
+                goal_id = self.model.row_id(selected_row)
+                with warn_if_busy(self):
+                    self.db_manager.delete("objetivos", goal_id)
+
+# ====================== PESTAÑA DEUDAS ======================
+DEBT_TYPES = ["Tarjeta", "Préstamo personal", "Hipoteca", "Auto", "Estudios", "Otro"]
+
+class DebtsTab(QWidget):
+    def __init__(self, db_manager, user_id, scheduler=None):
+        super().__init__()
+        self.db_manager = db_manager
+        self.user_id = user_id
+        self.currency = user_currency(db_manager, user_id)
+        self.scheduler = scheduler or RefreshScheduler(parent=self)
+        self.scheduler.register(self, self.load_data)
+        self.debts = None
+        self.init_ui()
+        self.model.reload_requested.connect(lambda: self.scheduler.mark_dirty(self))
+        db_manager.subscribe(self.handle_change)
         self.load_data()
-        self.goal_title.clear()
-        self.goal_current.setValue(0)
-        self.goal_target.setValue(0)
+    
+    def init_ui(self):
+        main_layout = QVBoxLayout()
+        main_layout.setSpacing(15)
+        main_layout.setContentsMargins(20, 15, 20, 20)
+        self.setLayout(main_layout)
+        
+        # Formulario
+        form_layout = QFormLayout()
+        
+        self.debt_name = QLineEdit()
+        
+        self.debt_type = QComboBox()
+        self.debt_type.addItems(DEBT_TYPES)
+        
+        # Saldo, tasa anual y pago mínimo (0 = se calcula con la fecha de pago)
+        self.debt_balance = QDoubleSpinBox()
+        self.debt_balance.setRange(0, 100000000)
+        self.debt_balance.setPrefix(f"{self.currency} ")
+        self.debt_rate = QDoubleSpinBox()
+        self.debt_rate.setRange(0, 200)
+        self.debt_rate.setSuffix(" %")
+        self.debt_minimum = QDoubleSpinBox()
+        self.debt_minimum.setRange(0, 10000000)
+        self.debt_minimum.setPrefix(f"{self.currency} ")
+        self.debt_minimum.setSpecialValueText("Según fecha de pago")
+        
+        self.debt_due = QDateEdit()
+        self.debt_due.setDate(QDate.currentDate().addYears(5))
+        self.debt_due.setCalendarPopup(True)
+        
+        form_layout.addRow("Nombre:", self.debt_name)
+        form_layout.addRow("Tipo:", self.debt_type)
+        form_layout.addRow("Saldo actual:", self.debt_balance)
+        form_layout.addRow("Tasa anual:", self.debt_rate)
+        form_layout.addRow("Pago mínimo:", self.debt_minimum)
+        form_layout.addRow("Fecha de pago:", self.debt_due)
+        
+        btn_add = ModernButton("Agregar Deuda", color="danger")
+        btn_add.clicked.connect(self.add_debt)
+        form_layout.addRow(btn_add)
+        
+        main_layout.addLayout(form_layout)
+        
+        # Tabla de deudas
+        self.model = PagedTableModel(
+            self.db_manager, "deudas",
+            ["id", "nombre", "tipo", "monto_actual", "tasa_interes", "pago_minimo", "fecha_pago"],
+            ["ID", "Nombre", "Tipo", "Saldo", "Tasa", "Pago mínimo", "Fecha de pago"],
+            self.user_id, sort_column="id", descending=False,
+            formatters={
+                3: lambda value: format_money(value, self.currency),
+                4: lambda value: f"{value or 0:.2f} %",
+                5: lambda value: format_money(value, self.currency) if value else "Automático",
+            },
+        )
+        self.table = create_table_view(self.model)
+        self.table.customContextMenuRequested.connect(self.show_context_menu)
+        main_layout.addWidget(self.table, 1)
+        
+        # Plan de pago (necesita NumPy)
+        self.planner = None
+        if np is not None:
+            self.planner = self.create_planner()
+            main_layout.addWidget(self.planner, 2)
+            self.scheduler.register(self.planner, self.load_plan)
+    
+    def create_planner(self):
+        from PyQt5.QtChart import QChart, QChartView, QLineSeries, QValueAxis
+        planner = QGroupBox("Plan de pago")
+        planner.setObjectName("panel")
+        layout = QVBoxLayout(planner)
+        
+        controls = QHBoxLayout()
+        self.strategy_combo = QComboBox()
+        for key, label in DEBT_STRATEGIES.items():
+            self.strategy_combo.addItem(label, key)
+        self.strategy_combo.currentIndexChanged.connect(self.update_plan)
+        controls.addWidget(self.strategy_combo)
+        controls.addWidget(QLabel("Pago extra mensual:"))
+        # El deslizador va en unidades enteras de moneda
+        self.extra_slider = QSlider(Qt.Horizontal)
+        self.extra_slider.setRange(0, 2000)
+        self.extra_slider.setSingleStep(10)
+        self.extra_slider.setPageStep(100)
+        self.extra_slider.valueChanged.connect(self.update_plan)
+        controls.addWidget(self.extra_slider, 1)
+        self.extra_label = QLabel()
+        self.extra_label.setMinimumWidth(90)
+        controls.addWidget(self.extra_label)
+        layout.addLayout(controls)
+        
+        self.plan_summary = QLabel()
+        layout.addWidget(self.plan_summary)
+        
+        results = QHBoxLayout()
+        self.payoff_table = QTableWidget(0, 4)
+        self.payoff_table.setHorizontalHeaderLabels(["Deuda", "Pago mínimo", "Intereses", "Saldada en"])
+        self.payoff_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.payoff_table.verticalHeader().setVisible(False)
+        self.payoff_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        results.addWidget(self.payoff_table, 1)
+        
+        # Saldo total mes a mes de cada estrategia
+        self.plan_chart = QChart()
+        self.plan_lines = {}
+        for key, label in DEBT_STRATEGIES.items():
+            series = QLineSeries()
+            series.setName(label)
+            self.plan_chart.addSeries(series)
+            self.plan_lines[key] = series
+        self.plan_axis_x = QValueAxis()
+        self.plan_axis_x.setLabelFormat("%d")
+        self.plan_axis_x.setTitleText("Meses")
+        self.plan_axis_y = QValueAxis()
+        set_money_axis(self.plan_axis_y, self.currency)
+        self.plan_chart.addAxis(self.plan_axis_x, Qt.AlignBottom)
+        self.plan_chart.addAxis(self.plan_axis_y, Qt.AlignLeft)
+        for series in self.plan_lines.values():
+            series.attachAxis(self.plan_axis_x)
+            series.attachAxis(self.plan_axis_y)
+        chart_view = QChartView(self.plan_chart)
+        chart_view.setRenderHint(QPainter.Antialiasing)
+        chart_view.setMinimumHeight(220)
+        results.addWidget(chart_view, 2)
+        layout.addLayout(results)
+        apply_chart_theme(self.plan_chart, (self.plan_axis_x, self.plan_axis_y))
+        return planner
+    
+    def apply_theme(self):
+        if self.planner is not None:
+            apply_chart_theme(self.plan_chart, (self.plan_axis_x, self.plan_axis_y))
+    
+    def add_debt(self):
+        balance = Money.from_amount(self.debt_balance.value()).cents
+        with warn_if_busy(self):
+            self.db_manager.insert("deudas", {
+                "usuario_id": self.user_id,
+                "nombre": self.debt_name.text(),
+                "tipo": self.debt_type.currentText(),
+                "monto_inicial": balance,
+                "monto_actual": balance,
+                "tasa_interes": self.debt_rate.value(),
+                "pago_minimo": Money.from_amount(self.debt_minimum.value()).cents or None,
+                "fecha_inicio": QDate.currentDate().toString("yyyy-MM-dd"),
+                "fecha_pago": self.debt_due.date().toString("yyyy-MM-dd"),
+            })
+            self.debt_name.clear()
+            self.debt_balance.setValue(0)
+            self.debt_rate.setValue(0)
+            self.debt_minimum.setValue(0)
     
     def load_data(self):
-        data = self.db_manager.fetch_all(
-            "SELECT id, titulo, tipo, monto_actual, meta, completado FROM objetivos WHERE usuario_id = ?",
-            (self.user_id,)
+        self.model.reload()
+        self.load_plan()
+    
+    def handle_change(self, event):
+        # La tabla aplica sus propios deltas; el plan se recalcula con rebote
+        if event.table == "deudas" and self.planner is not None:
+            self.scheduler.mark_dirty(self.planner)
+    
+    def load_plan(self):
+        if self.planner is None:
+            return
+        self.debts = load_debts(self.db_manager, self.user_id)
+        self.update_plan()
+    
+    def update_plan(self):
+        # Se simulan ambas estrategias en cada cambio del deslizador: con
+        # arreglos por mes el cálculo cabe holgado entre dos repintados
+        extra = self.extra_slider.value() * 100
+        self.extra_label.setText(Money(extra).format(self.currency))
+        debts = self.debts
+        if debts is None or not debts.ids:
+            self.plan_summary.setText("No hay deudas pendientes.")
+            self.payoff_table.setRowCount(0)
+            for series in self.plan_lines.values():
+                series.clear()
+            return
+        plans = {key: simulate_payoff(debts, key, extra) for key in DEBT_STRATEGIES}
+        selected = self.strategy_combo.currentData()
+        plan = plans[selected]
+        other = plans["snowball" if selected == "avalanche" else "avalanche"]
+        money = lambda cents: Money(int(cents)).format(self.currency)
+        
+        debt_free = plan.debt_free
+        free_text = (QDate(int(debt_free[:4]), int(debt_free[5:]), 1).toString("MM/yyyy")
+                     if debt_free else f"no en {DEBT_HORIZON_MONTHS // 12} años")
+        difference = other.total_interest - plan.total_interest
+        comparison = (f"{money(difference)} menos que {DEBT_STRATEGIES[other.strategy]}" if difference > 0 else
+                      f"{money(-difference)} más que {DEBT_STRATEGIES[other.strategy]}" if difference < 0 else
+                      f"igual que {DEBT_STRATEGIES[other.strategy]}")
+        self.plan_summary.setText(
+            f"Libre de deudas: {free_text} · Intereses totales: {money(plan.total_interest)} ({comparison})"
         )
-        self.table.setRowCount(len(data))
-        
-        for row, record in enumerate(data):
-            for col, value in enumerate(record):
-                item = QTableWidgetItem(str(value))
-                if col in [3, 4]:  # Montos
-                    item.setText(f"${float(value):,.2f}")
-                elif col == 5:  # Completado
-                    item.setText("Sí" if value == 1 else "No")
-                    item.setForeground(QColor("#20c997" if value == 1 else "#dc3545"))
-                self.table.setItem(row, col, item)
+        
+        interest_by_debt = plan.interest.sum(axis=0)
+        self.payoff_table.setRowCount(len(debts.ids))
+        for row, name in enumerate(debts.names):
+            month = plan.payoff_months[row]
+            paid_off = plan.months[month] if month >= 0 else "-"
+            values = (name, money(debts.minimums[row]), money(interest_by_debt[row]), paid_off)
+            for column, value in enumerate(values):
+                self.payoff_table.setItem(row, column, QTableWidgetItem(value))
+        
+        longest = 1
+        for key, series in self.plan_lines.items():
+            totals = plans[key].balances.sum(axis=1) / 100
+            series.replace([QPointF(index + 1, value) for index, value in enumerate(totals)])
+            longest = max(longest, len(totals))
+        self.plan_axis_x.setRange(0, longest)
+        self.plan_axis_y.setRange(0, debts.balances.sum() / 100 * 1.1)
     
     def show_context_menu(self, pos):
         menu = QMenu()
@@ -774,36 +2243,290 @@ class SavingsTab(QWidget):
         action = menu.exec_(self.table.viewport().mapToGlobal(pos))
         
         if action == delete_action:
-            selected_row = self.table.currentRow()
+            selected_row = self.table.currentIndex().row()
             if selected_row >= 0:
-                goal_id = self.table.item(selected_row, 0).text()
-                self.db_manager.execute_query("DELETE FROM objetivos WHERE id = ?", (goal_id,))
-                self.load_data()
+                with warn_if_busy(self):
+                    self.db_manager.delete("deudas", self.model.row_id(selected_row))
+
+# ====================== RENDERIZADO FUERA DE PANTALLA ======================
+class ChartRenderer:
+    # Dibuja en PNG las tarjetas y los gráficos de torta y de barras del
+    # dashboard sin ventana (plataforma "offscreen"). Los gráficos, su escena,
+    # las tarjetas y las imágenes se crean una sola vez: cada render cambia
+    # los datos en el lugar (las porciones y barras existentes se reutilizan)
+    # y vuelve a pintar sobre la misma imagen
+    def __init__(self, width=640, height=400, cards_width=1040, png_quality=80):
+        from PyQt5.QtChart import QChart, QPieSeries, QBarSet, QBarSeries, QBarCategoryAxis, QValueAxis
+        # En PNG la calidad fija el nivel de zlib: con 90 o más no comprime y
+        # escribir ~750 KB por gráfico cuesta más que comprimir a ~25 KB con 80
+        self.png_quality = png_quality
+        self.currency = None
+        
+        self.pie_series = QPieSeries()
+        self.pie_chart = QChart()
+        self.pie_chart.addSeries(self.pie_series)
+        self.pie_chart.legend().setAlignment(Qt.AlignRight)
+        
+        self.set_income = QBarSet("Ingresos")
+        self.set_expense = QBarSet("Gastos")
+        self.bar_series = QBarSeries()
+        self.bar_series.append(self.set_income)
+        self.bar_series.append(self.set_expense)
+        self.bar_chart = QChart()
+        self.bar_chart.addSeries(self.bar_series)
+        self.axis_x = QBarCategoryAxis()
+        self.bar_chart.addAxis(self.axis_x, Qt.AlignBottom)
+        self.bar_series.attachAxis(self.axis_x)
+        self.axis_y = QValueAxis()
+        self.bar_chart.addAxis(self.axis_y, Qt.AlignLeft)
+        self.bar_series.attachAxis(self.axis_y)
+        
+        # Los dos gráficos en una misma escena, uno debajo del otro; cada PNG
+        # pinta solo el rectángulo de su gráfico
+        self.scene = QGraphicsScene()
+        for row, chart in enumerate((self.pie_chart, self.bar_chart)):
+            chart.setGeometry(QRectF(0, row * height, width, height))
+            self.scene.addItem(chart)
+        self.chart_image = QImage(width, height, QImage.Format_RGB32)
+        
+        # Tarjetas: los mismos widgets del dashboard, con la hoja de estilos
+        # del tema; nunca se muestran
+        self.cards_widget = QWidget()
+        cards_layout = QHBoxLayout(self.cards_widget)
+        self.cards = [CardWidget(title, "", accent) for title, accent in (
+            ("Ingresos Totales", "primary"), ("Gastos Totales", "danger"),
+            ("Ahorros", "success"), ("Patrimonio Neto", "purple"),
+        )]
+        for card in self.cards:
+            cards_layout.addWidget(card)
+        self.cards_widget.ensurePolished()
+        self.cards_widget.resize(max(cards_width, cards_layout.minimumSize().width()), cards_layout.sizeHint().height())
+        cards_layout.activate()
+        self.cards_image = QImage(self.cards_widget.size(), QImage.Format_RGB32)
+        self.apply_theme()
+    
+    def apply_theme(self):
+        self.surface = QColor(theme_color("surface"))
+        apply_chart_theme(self.pie_chart)
+        apply_chart_theme(self.bar_chart, (self.axis_x, self.axis_y))
+    
+    def set_pie(self, expense_by_category):
+        slices = self.pie_series.slices()
+        items = [(category, cents) for category, cents in expense_by_category if cents > 0]
+        for index, (category, cents) in enumerate(items):
+            if index < len(slices):
+                slice_ = slices[index]
+                slice_.setLabel(category)
+                slice_.setValue(cents / 100)
+            else:
+                slice_ = self.pie_series.append(category, cents / 100)
+            slice_.setColor(QColor(PIE_COLORS[index % len(PIE_COLORS)]))
+        for slice_ in slices[len(items):]:
+            self.pie_series.remove(slice_)
+    
+    def set_bars(self, bar_set, values):
+        if bar_set.count() != len(values):
+            bar_set.remove(0, bar_set.count())
+            bar_set.append(values)
+            return
+        for index, value in enumerate(values):
+            bar_set.replace(index, value)
+    
+    def show_summary(self, summary, currency):
+        if currency != self.currency:
+            self.currency = currency
+            set_money_axis(self.axis_y, currency)
+        self.set_pie(summary.expense_by_category)
+        self.set_bars(self.set_income, [cents / 100 for cents in summary.monthly_income])
+        self.set_bars(self.set_expense, [cents / 100 for cents in summary.monthly_expense])
+        labels = month_labels(summary.months)
+        if self.axis_x.categories() != labels:
+            self.axis_x.clear()
+            self.axis_x.append(labels)
+        peak = max(summary.monthly_income + summary.monthly_expense) / 100
+        self.axis_y.setRange(0, peak * 1.1 if peak > 0 else 1)
+        for card, cents in zip(self.cards, (summary.total_income, summary.total_expense,
+                                            summary.total_savings, summary.net_worth)):
+            card.lbl_value.setText(Money(cents).format(currency))
+        # Ahorros y deudas no guardan historia: al cierre de un mes son los
+        # saldos de hoy, y la tarjeta lo dice
+        current = " (saldo actual)" if summary.until else ""
+        self.cards[2].lbl_title.setText("Ahorros" + current)
+        self.cards[3].lbl_title.setText("Patrimonio Neto" + current)
+    
+    def render(self, summary, currency, prefix):
+        # Escribe prefix_gastos.png, prefix_barras.png y prefix_tarjetas.png
+        self.show_summary(summary, currency)
+        # Sin ventana no hay bucle de eventos que acomode leyendas, ejes y
+        # tarjetas después de cambiar los datos: se procesan solo esos avisos
+        QApplication.sendPostedEvents(None, QEvent.LayoutRequest)
+        paths = []
+        for chart, name in ((self.pie_chart, "gastos"), (self.bar_chart, "barras")):
+            self.chart_image.fill(self.surface)
+            painter = QPainter(self.chart_image)
+            painter.setRenderHint(QPainter.Antialiasing)
+            self.scene.render(painter, QRectF(self.chart_image.rect()), chart.geometry())
+            painter.end()
+            paths.append(self.save(self.chart_image, f"{prefix}_{name}.png"))
+        self.cards_image.fill(self.surface)
+        self.cards_widget.render(self.cards_image)
+        paths.append(self.save(self.cards_image, f"{prefix}_tarjetas.png"))
+        return paths
+    
+    def save(self, image, path):
+        if not image.save(path, "PNG", self.png_quality):
+            raise OSError(f"No se pudo escribir {path}")
+        return path
+
+def render_dashboards(directory, output_dir, months=DASHBOARD_WINDOWS[0], snapshots=1, today=None, renderer=None):
+    # Para cada usuario del directorio, el dashboard al cierre de cada uno de
+    # los últimos `snapshots` meses (ventana de `months` meses). Devuelve
+    # cuántas imágenes escribió
+    renderer = renderer or ChartRenderer()
+    os.makedirs(output_dir, exist_ok=True)
+    written = 0
+    for user_id, _, _, currency, own_file in load_users(directory):
+        db_manager = open_user_database(directory, user_id) if own_file else directory
+        try:
+            for key in month_keys(snapshots, today):
+                # Ingresos, gastos y torta al cierre del mes; ahorros y
+                # patrimonio, con los saldos de hoy (ver load_dashboard_summary)
+                summary = load_dashboard_summary(db_manager, user_id, months, date(int(key[:4]), int(key[5:]), 1),
+                                                 until=key)
+                prefix = os.path.join(output_dir, f"usuario{user_id}_{key}")
+                written += len(renderer.render(summary, currency or DEFAULT_CURRENCY, prefix))
+        finally:
+            if db_manager is not directory:
+                db_manager.close()
+    return written
 
 # ====================== APLICACIÓN PRINCIPAL ======================
+class LazyTab(QWidget):
+    # Contenedor de pestaña que construye su contenido la primera vez que se
+    # muestra (o se pide), después de que la ventana alcanzó a pintarse
+    def __init__(self, factory, parent=None):
+        super().__init__(parent)
+        self.factory = factory
+        self.page = None
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+    
+    def widget(self):
+        if self.page is None:
+            self.page = self.factory()
+            self.layout().addWidget(self.page)
+        return self.page
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.page is None:
+            QTimer.singleShot(0, self.build)
+    
+    def build(self):
+        # Si la pestaña se quitó antes de armarse (cambio de usuario) ya no se arma
+        if self.isVisible():
+            self.widget()
+
+class UserDialog(QDialog):
+    # Alta de usuario: nombre, correo, moneda y dónde guardar sus datos
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Nuevo usuario")
+        layout = QFormLayout(self)
+        
+        self.name = QLineEdit()
+        self.email = QLineEdit()
+        self.currency = QComboBox()
+        self.currency.setEditable(True)
+        self.currency.addItems(USER_CURRENCIES)
+        self.own_file = QCheckBox("Guardar sus datos en un archivo propio")
+        self.own_file.setToolTip("Sus consultas y escrituras no compiten con las de los demás usuarios")
+        
+        layout.addRow("Nombre:", self.name)
+        layout.addRow("Email:", self.email)
+        layout.addRow("Moneda:", self.currency)
+        layout.addRow(self.own_file)
+        
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+    
+    def accept(self):
+        if not self.name.text().strip() or not self.email.text().strip():
+            QMessageBox.warning(self, "Nuevo usuario", "El nombre y el email son obligatorios.")
+            return
+        super().accept()
+    
+    def values(self):
+        return (self.name.text().strip(), self.email.text().strip(),
+                self.currency.currentText().strip() or DEFAULT_CURRENCY, self.own_file.isChecked())
+
 class FinancialDashboard(QMainWindow):
-    def __init__(self):
+    def __init__(self, theme="light", db_name="finanzas.db", user_id=DEFAULT_USER_ID):
         super().__init__()
         self.setWindowTitle("Gestión Financiera Personal")
         self.setGeometry(100, 100, 1200, 800)
-        self.user_id = 1  # ID de usuario fijo para simplificar
-        
-        # Configurar base de datos
-        self.db_manager = DatabaseManager()
-        self.create_sample_data()
-        
-        # Crear pestañas
+        # El tema se aplica antes de crear widgets para no repulirlos después
+        apply_theme(QApplication.instance(), theme)
+        
+        # La base compartida es el directorio de usuarios; los datos del
+        # usuario activo se abren aparte (ver open_user)
+        opened = time.perf_counter()
+        self.directory = DatabaseManager(db_name)
+        create_sample_data(self.directory, DEFAULT_USER_ID)
+        STARTUP_TIMES["base de datos"] = time.perf_counter() - opened
+        
+        self.user_id = None
+        self.db_manager = None
+        self.scheduler = None
+        self.notifications = None
+        self.lazy_tabs = {}
         self.tabs = QTabWidget()
-        
-        self.dashboard_tab = DashboardTab(self.db_manager, self.user_id)
-        self.income_tab = IncomeTab(self.db_manager, self.user_id)
-        self.expenses_tab = ExpensesTab(self.db_manager, self.user_id)
-        self.savings_tab = SavingsTab(self.db_manager, self.user_id)
-        
-        self.tabs.addTab(self.dashboard_tab, "🏠 Dashboard")
-        self.tabs.addTab(self.income_tab, "📊 Ingresos")
-        self.tabs.addTab(self.expenses_tab, "💸 Gastos")
-        self.tabs.addTab(self.savings_tab, "💰 Ahorros")
+        # Las pestañas ocultas con cambios pendientes se recargan al mostrarse
+        self.tabs.currentChanged.connect(self.show_tab)
+        
+        # Cambio de tema claro/oscuro
+        self.theme_btn = QPushButton()
+        self.theme_btn.setFlat(True)
+        self.theme_btn.setToolTip("Cambiar tema")
+        self.theme_btn.clicked.connect(
+            lambda: self.set_theme("dark" if current_theme() == "light" else "light"))
+        self.theme_btn.setText("☀️" if theme == "dark" else "🌙")
+        
+        # Avisos: el menú se arma al abrirlo con las notificaciones sin leer
+        self.notifications_btn = QPushButton()
+        self.notifications_btn.setFlat(True)
+        self.notifications_btn.setToolTip("Notificaciones")
+        self.notifications_menu = QMenu(self)
+        self.notifications_menu.aboutToShow.connect(self.fill_notifications_menu)
+        self.notifications_btn.setMenu(self.notifications_menu)
+        
+        # Usuario activo: el menú lista el directorio y permite crear usuarios
+        self.user_btn = QPushButton()
+        self.user_btn.setFlat(True)
+        self.user_btn.setToolTip("Cambiar de usuario")
+        self.user_menu = QMenu(self)
+        self.user_menu.aboutToShow.connect(self.fill_user_menu)
+        self.user_btn.setMenu(self.user_menu)
+        
+        # Las recurrencias se generan en el QThreadPool (puede haber meses
+        # pendientes) y se revisan cada hora por si la app queda abierta de un
+        # día a otro
+        self.recurrence_loader = AsyncLoader(None, parent=self, read_only=False)
+        self.recurrence_timer = QTimer(self)
+        self.recurrence_timer.setInterval(3600000)
+        self.recurrence_timer.timeout.connect(self.materialize_pending)
+        self.recurrence_timer.start()
+        
+        corner = QWidget()
+        corner_layout = QHBoxLayout(corner)
+        corner_layout.setContentsMargins(0, 0, 0, 0)
+        corner_layout.addWidget(self.user_btn)
+        corner_layout.addWidget(self.notifications_btn)
+        corner_layout.addWidget(self.theme_btn)
+        self.tabs.setCornerWidget(corner)
         
         # Configurar layout principal
         main_widget = QWidget()
@@ -812,45 +2535,187 @@ class FinancialDashboard(QMainWindow):
         main_widget.setLayout(main_layout)
         
         self.setCentralWidget(main_widget)
+        self.open_user(user_id)
     
-    def create_sample_data(self):
-        # Crear usuario por defecto
-        self.db_manager.execute_query(
-            "INSERT OR IGNORE INTO usuarios (id, nombre, email) VALUES (?, ?, ?)",
-            (self.user_id, "Usuario Demo", "demo@finanzas.com")
-        )
-        
-        # Crear datos de muestra si la base está vacía
-        income_count = self.db_manager.fetch_one(
-            "SELECT COUNT(*) FROM ingresos WHERE usuario_id = ?", (self.user_id,)
-        )[0] or 0
-        
-        if income_count == 0:
-            today = datetime.now().date()
-            
-            # Ingresos de muestra
-            self.db_manager.execute_query(
-                "INSERT INTO ingresos (usuario_id, tipo, monto, fecha, descripcion) VALUES (?, ?, ?, ?, ?)",
-                (self.user_id, "Sueldo", 2500.00, today.strftime("%Y-%m-%d"), "Salario mensual")
-            )
-            
-            # Gastos de muestra
-            self.db_manager.execute_query(
-                "INSERT INTO gastos (usuario_id, categoria, tipo, monto, fecha, descripcion) VALUES (?, ?, ?, ?, ?, ?)",
-                (self.user_id, "Vivienda", "Fijo", 800.00, today.strftime("%Y-%m-%d"), "Alquiler")
-            )
-            
-            # Objetivos de muestra
-            self.db_manager.execute_query(
-                "INSERT INTO objetivos (usuario_id, titulo, tipo, monto_actual, meta, fecha_creacion, fecha_meta) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (self.user_id, "Fondo Emergencia", "Emergencia", 500.00, 5000.00, 
-                 today.strftime("%Y-%m-%d"), (today + timedelta(days=180)).strftime("%Y-%m-%d"))
+    def open_user(self, user_id):
+        # Todo lo que depende del usuario se arma de nuevo: su base, los
+        # planificadores y las pestañas (que se construyen al mostrarse)
+        current = self.tabs.currentIndex()
+        self.close_user()
+        self.user_id = user_id
+        self.db_manager = open_user_database(self.directory, user_id)
+        self.scheduler = RefreshScheduler(parent=self)
+        
+        self.tabs.blockSignals(True)
+        for name, tab_class, label in (
+            ("dashboard", DashboardTab, "🏠 Dashboard"),
+            ("income", IncomeTab, "📊 Ingresos"),
+            ("expenses", ExpensesTab, "💸 Gastos"),
+            ("savings", SavingsTab, "💰 Ahorros"),
+            ("debts", DebtsTab, "💳 Deudas"),
+        ):
+            self.lazy_tabs[name] = LazyTab(
+                lambda tab_class=tab_class: tab_class(self.db_manager, self.user_id, self.scheduler)
             )
+            self.tabs.addTab(self.lazy_tabs[name], label)
+        self.tabs.setCurrentIndex(max(current, 0))
+        self.tabs.blockSignals(False)
+        
+        self.notifications = NotificationScheduler(self.db_manager, user_id, parent=self)
+        self.notifications.unread_changed.connect(self.show_unread)
+        self.show_unread(self.notifications.unread())
+        self.notifications.start()
+        # Las pestañas muestran lo que ya hay; al terminar se recargan con los
+        # movimientos recurrentes generados
+        self.materialize_pending()
+        
+        name = next((user[1] for user in load_users(self.directory) if user[0] == user_id), "")
+        self.user_btn.setText(f"👤 {name}")
+        self.setWindowTitle(f"Gestión Financiera Personal - {name}")
+    
+    def close_user(self):
+        if self.db_manager is None:
+            return
+        # Se detiene primero lo que podría consultar la base que se cierra
+        # (una generación en curso escribe en su propia conexión: solo se
+        # descarta su resultado)
+        self.recurrence_loader.cancel()
+        self.recurrence_loader.request_id += 1
+        self.notifications.stop()
+        self.notifications.deleteLater()
+        self.scheduler.clear()
+        self.scheduler.deleteLater()
+        self.tabs.blockSignals(True)
+        while self.tabs.count():
+            page = self.tabs.widget(0)
+            self.tabs.removeTab(0)
+            page.deleteLater()
+        self.tabs.blockSignals(False)
+        self.lazy_tabs = {}
+        self.db_manager.close()
+        self.db_manager = None
+    
+    def materialize_pending(self):
+        if self.db_manager is None:
+            return
+        user_id = self.user_id
+        self.recurrence_loader.db_manager = self.db_manager
+        self.recurrence_loader.request(
+            lambda db_manager: materialize_recurrences(db_manager, user_id), self.recurrences_materialized)
+    
+    def recurrences_materialized(self, count):
+        # Se escribió desde otra conexión: un evento por tabla, como al importar
+        if count and self.db_manager is not None:
+            for table, action in (("ingresos", "insert"), ("gastos", "insert"), ("recurrencias", "update")):
+                self.db_manager.publish(ChangeEvent(table, action))
+    
+    def show_tab(self, index):
+        page = self.tabs.widget(index)
+        if page is not None:
+            self.scheduler.show_view(page.page)
+    
+    def fill_user_menu(self):
+        self.user_menu.clear()
+        for user_id, name, email, currency, own_file in load_users(self.directory):
+            action = self.user_menu.addAction(f"{name} ({currency or DEFAULT_CURRENCY})")
+            action.setToolTip(email)
+            action.setCheckable(True)
+            action.setChecked(user_id == self.user_id)
+            action.triggered.connect(lambda checked, user_id=user_id: self.switch_user(user_id))
+        self.user_menu.addSeparator()
+        self.user_menu.addAction("Nuevo usuario…", self.new_user)
+    
+    def switch_user(self, user_id):
+        if user_id != self.user_id:
+            self.open_user(user_id)
+    
+    def new_user(self):
+        dialog = UserDialog(self)
+        if dialog.exec_() != QDialog.Accepted:
+            return
+        user_id = None
+        with warn_if_busy(self):
+            try:
+                user_id = create_user(self.directory, *dialog.values())
+            except sqlite3.IntegrityError:
+                QMessageBox.warning(self, "Nuevo usuario", "Ya existe un usuario con ese email.")
+        if user_id is not None:
+            self.open_user(user_id)
+    
+    def set_theme(self, theme):
+        apply_theme(QApplication.instance(), theme)
+        self.theme_btn.setText("☀️" if theme == "dark" else "🌙")
+        # Cada pestaña ya armada vuelve a pintar sus gráficos con el tema nuevo
+        for lazy_tab in self.lazy_tabs.values():
+            apply_page_theme = getattr(lazy_tab.page, "apply_theme", None)
+            if apply_page_theme is not None:
+                apply_page_theme()
+    
+    def show_unread(self, count):
+        self.notifications_btn.setText(f"🔔 {count}" if count else "🔔")
+    
+    def fill_notifications_menu(self):
+        self.notifications_menu.clear()
+        rows = load_notifications(self.db_manager, self.user_id)
+        if not rows:
+            self.notifications_menu.addAction("Sin notificaciones nuevas").setEnabled(False)
+            return
+        for _, title, message, day in rows:
+            action = self.notifications_menu.addAction(f"{title}: {message}")
+            action.setToolTip(day)
+        self.notifications_menu.addSeparator()
+        self.notifications_menu.addAction("Marcar todo como leído", self.mark_all_read)
+    
+    def mark_all_read(self):
+        with warn_if_busy(self):
+            mark_notifications_read(self.db_manager, self.user_id)
+    
+    @property
+    def dashboard_tab(self):
+        return self.lazy_tabs["dashboard"].widget()
+    
+    @property
+    def income_tab(self):
+        return self.lazy_tabs["income"].widget()
+    
+    @property
+    def expenses_tab(self):
+        return self.lazy_tabs["expenses"].widget()
+    
+    @property
+    def savings_tab(self):
+        return self.lazy_tabs["savings"].widget()
+    
+    @property
+    def debts_tab(self):
+        return self.lazy_tabs["debts"].widget()
+    
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if "primer pintado" not in STARTUP_TIMES:
+            STARTUP_TIMES["primer pintado"] = time.perf_counter() - STARTUP_T0
+            report_startup()
 
 # ====================== EJECUCIÓN ======================
 if __name__ == "__main__":
+    # --render-charts DIR [--snapshots N]: PNG de los dashboards de todos los
+    # usuarios, sin ventana
+    if "--render-charts" in sys.argv:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
     app = QApplication(sys.argv)
     app.setStyle(QStyleFactory.create("Fusion"))
-    window = FinancialDashboard()
+    theme = "dark" if "--dark" in sys.argv else "light"
+    if "--render-charts" in sys.argv:
+        apply_theme(app, theme)
+        output_dir = sys.argv[sys.argv.index("--render-charts") + 1]
+        snapshots = int(sys.argv[sys.argv.index("--snapshots") + 1]) if "--snapshots" in sys.argv else 1
+        started = time.perf_counter()
+        written = render_dashboards(DatabaseManager(), output_dir, snapshots=snapshots)
+        print(f"{written} imágenes en {time.perf_counter() - started:.2f} s", file=sys.stderr)
+        sys.exit(0)
+    if "--benchmark-widgets" in sys.argv:
+        apply_theme(app, theme)
+        benchmark_widgets()
+    window = FinancialDashboard(theme)
     window.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,255 @@
+# Analítica columnar y plan de pago de deudas con NumPy. Es opcional: sin
+# NumPy este import falla con ImportError y la interfaz oculta lo que
+# depende de él
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+
+from finanzas_servicios import month_keys
+
+# ====================== ANALÍTICA ======================
+# Los movimientos de un usuario en arreglos columnares de NumPy: días desde
+# 1970-01-01 (int32), centavos (int64) y categoría codificada (uint8). Las
+# series y estadísticas son operaciones vectorizadas sobre esos arreglos
+TRANSACTION_CATEGORY_COLUMNS = {"ingresos": "tipo", "gastos": "categoria"}
+TREND_WINDOWS = (3, 12)
+
+@dataclass
+class TransactionColumns:
+    days: object              # np.int32
+    months: object            # np.int32, meses desde 1970-01 (precalculado al cargar)
+    cents: object             # np.int64
+    categories: object        # np.uint8, índice en category_names
+    category_names: list
+
+def build_columns(rows):
+    # Una fila por categoría, en el orden del índice (usuario, categoría,
+    # fecha, monto): las fechas concatenadas sin separador (10 caracteres
+    # cada una) y los montos separados por comas. NumPy decodifica ambos en C
+    # sin crear un objeto de Python por movimiento
+    names = [row[0] for row in rows]
+    if len(names) > 256:
+        # uint8 admite 256 códigos: las categorías que sobran van a "Otras"
+        names = names[:255] + ["Otras"]
+    days = [np.frombuffer(row[2].encode("ascii"), dtype="S10").astype("datetime64[D]").astype(np.int32)
+            for row in rows]
+    cents = [np.fromstring(row[3], dtype=np.int64, sep=",") for row in rows]
+    codes = np.minimum(np.arange(len(rows)), 255).astype(np.uint8)
+    days = np.concatenate(days) if days else np.zeros(0, np.int32)
+    columns = TransactionColumns(
+        days=days,
+        months=days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int32),
+        cents=np.concatenate(cents) if cents else np.zeros(0, np.int64),
+        categories=np.repeat(codes, [row[1] for row in rows]),
+        category_names=names,
+    )
+    # La caché comparte los arreglos entre hilos: quedan de solo lectura
+    for array in (columns.days, columns.months, columns.cents, columns.categories):
+        array.flags.writeable = False
+    return columns
+
+def load_columns(db_manager, user_id, table):
+    category = TRANSACTION_CATEGORY_COLUMNS[table]
+    return db_manager.fetch_derived(
+        f"SELECT {category}, COUNT(*), group_concat(fecha, ''), group_concat(monto) "
+        f"FROM {table} WHERE usuario_id = ? GROUP BY {category}",
+        (user_id,), build_columns
+    )
+
+def month_number(day):
+    return (day.year - 1970) * 12 + day.month - 1
+
+def week_number(day):
+    # Semanas de lunes a domingo; 1970-01-01 fue jueves
+    return ((day - date(1970, 1, 1)).days + 3) // 7
+
+def bucket_series(buckets, cents, last, length):
+    # Suma por cubeta de las últimas `length` cubetas que terminan en `last`.
+    # bincount suma en float64, exacto mientras cada total sea < 2**53 centavos
+    offset = buckets - (last - length + 1)
+    inside = (offset >= 0) & (offset < length)
+    totals = np.bincount(offset[inside], weights=cents[inside], minlength=length)
+    return np.rint(totals).astype(np.int64)
+
+def monthly_series(columns, months, today=None):
+    return bucket_series(columns.months, columns.cents, month_number(today or date.today()), months)
+
+def weekly_series(columns, weeks, today=None):
+    return bucket_series((columns.days + 3) // 7, columns.cents, week_number(today or date.today()), weeks)
+
+def rolling_average(series, window):
+    # Media de los últimos `window` puntos; al principio, de los que haya
+    sums = np.cumsum(series, dtype=np.float64)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums / np.minimum(np.arange(1, len(series) + 1), window)
+
+def savings_rate(income, expense):
+    # Fracción del ingreso que no se gastó; NaN donde no hubo ingresos
+    income = np.asarray(income, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(income > 0, (income - expense) / income, np.nan)
+
+def category_stats(columns, percentiles=(25, 50, 75, 90)):
+    # {categoría: {cantidad, total, media y percentiles en centavos}}
+    counts = np.bincount(columns.categories, minlength=len(columns.category_names))
+    # Las categorías vienen agrupadas (una fila por categoría), así que cada
+    # una es un tramo contiguo de los arreglos
+    bounds = np.concatenate(([0], np.cumsum(counts)))
+    stats = {}
+    for code, name in enumerate(columns.category_names):
+        part = columns.cents[bounds[code]:bounds[code + 1]]
+        if not len(part):
+            continue
+        values = np.percentile(part, percentiles)
+        stats[name] = {
+            "cantidad": int(len(part)),
+            "total": int(part.sum()),
+            "media": float(part.mean()),
+            **{f"p{p}": float(value) for p, value in zip(percentiles, values)},
+        }
+    return stats
+
+@dataclass
+class TrendSummary:
+    months: list                      # claves "YYYY-MM"
+    monthly_income: object            # np.int64, centavos
+    monthly_expense: object
+    expense_averages: dict            # {ventana en meses: media móvil de gastos}
+    savings_rate: object              # por mes
+    window_savings_rate: float        # sobre toda la ventana
+    expense_stats: dict               # category_stats de los gastos
+
+def load_trends(db_manager, user_id, months=6, today=None):
+    today = today or date.today()
+    income = load_columns(db_manager, user_id, "ingresos")
+    expense = load_columns(db_manager, user_id, "gastos")
+    # Se calculan meses de más para que las medias móviles arranquen completas
+    span = months + max(TREND_WINDOWS) - 1
+    income_series = monthly_series(income, span, today)
+    expense_series = monthly_series(expense, span, today)
+    income_total = income_series[-months:].sum()
+    return TrendSummary(
+        months=month_keys(months, today),
+        monthly_income=income_series[-months:],
+        monthly_expense=expense_series[-months:],
+        expense_averages={window: rolling_average(expense_series, window)[-months:] for window in TREND_WINDOWS},
+        savings_rate=savings_rate(income_series, expense_series)[-months:],
+        window_savings_rate=float((income_total - expense_series[-months:].sum()) / income_total) if income_total else float("nan"),
+        expense_stats=category_stats(expense),
+    )
+
+# ====================== PLAN DE DEUDAS ======================
+# Amortización de todas las deudas a la vez: cada mes es un paso vectorizado
+# sobre arreglos de N deudas, así el costo crece con los meses y no con N
+DEBT_STRATEGIES = {"avalanche": "Avalancha", "snowball": "Bola de nieve"}
+DEBT_HORIZON_MONTHS = 360
+DEFAULT_DEBT_TERM = 60      # meses, si la deuda no tiene pago mínimo ni fecha de pago
+
+@dataclass
+class DebtSet:
+    ids: list
+    names: list
+    balances: object          # np.int64, centavos
+    rates: object             # np.float64, tasa anual en %
+    minimums: object          # np.int64, centavos por mes
+
+@dataclass
+class PayoffPlan:
+    strategy: str
+    months: list              # claves "YYYY-MM" de cada fila de los arreglos
+    balances: object          # (meses, deudas) saldo al cierre de cada mes
+    payments: object          # (meses, deudas)
+    interest: object          # (meses, deudas)
+    payoff_months: object     # índice del mes en que se salda cada deuda, -1 si no se salda
+    total_interest: int
+    total_paid: int
+    
+    @property
+    def debt_free(self):
+        # Mes en que se salda la última deuda, o None si alguna no se salda
+        if not len(self.payoff_months) or (self.payoff_months < 0).any():
+            return None
+        return self.months[int(self.payoff_months.max())]
+
+def required_payment(balances, annual_rates, months):
+    # Cuota fija (sistema francés) que salda cada saldo en `months` meses
+    balances = np.asarray(balances, dtype=np.float64)
+    rates = np.asarray(annual_rates, dtype=np.float64) / 1200
+    months = np.maximum(np.asarray(months, dtype=np.float64), 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = balances * rates / (1 - (1 + rates) ** -months)
+    return np.ceil(np.where(rates > 0, annuity, balances / months)).astype(np.int64)
+
+def load_debts(db_manager, user_id, today=None):
+    today = today or date.today()
+    rows = db_manager.fetch_all(
+        "SELECT id, nombre, monto_actual, COALESCE(tasa_interes, 0), pago_minimo, fecha_pago "
+        "FROM deudas WHERE usuario_id = ? AND monto_actual > 0 ORDER BY id",
+        (user_id,)
+    )
+    current = month_number(today)
+    terms = []
+    for row in rows:
+        due = row[5]
+        # Meses que quedan hasta la fecha de pago final; sin fecha o con la
+        # fecha ya vencida, el plazo por defecto (no todo el saldo en un mes)
+        term = (int(due[:4]) - 1970) * 12 + int(due[5:7]) - 1 - current if due else 0
+        terms.append(term if term > 0 else DEFAULT_DEBT_TERM)
+    balances = np.array([row[2] for row in rows], dtype=np.int64)
+    rates = np.array([row[3] for row in rows], dtype=np.float64)
+    derived = required_payment(balances, rates, terms) if rows else np.zeros(0, np.int64)
+    minimums = np.array([row[4] or 0 for row in rows], dtype=np.int64)
+    return DebtSet(
+        ids=[row[0] for row in rows],
+        names=[row[1] for row in rows],
+        balances=balances,
+        rates=rates,
+        minimums=np.where(minimums > 0, minimums, derived),
+    )
+
+def payoff_order(debts, strategy):
+    # Avalancha: mayor tasa primero; bola de nieve: menor saldo primero
+    if strategy == "avalanche":
+        return np.lexsort((debts.balances, -debts.rates))
+    return np.lexsort((-debts.rates, debts.balances))
+
+def simulate_payoff(debts, strategy="avalanche", extra=0, horizon=DEBT_HORIZON_MONTHS, today=None):
+    # Presupuesto mensual fijo = suma de mínimos + extra. Cada mes se cobran
+    # intereses, se pagan los mínimos y lo que sobra (incluido lo que liberan
+    # las deudas ya saldadas) va a las deudas en orden de prioridad
+    count = len(debts.ids)
+    balance = debts.balances.astype(np.float64)
+    rate = debts.rates / 1200
+    minimum = debts.minimums.astype(np.float64)
+    order = payoff_order(debts, strategy)
+    budget = minimum.sum() + extra
+    balances = np.zeros((horizon, count))
+    payments = np.zeros((horizon, count))
+    interest = np.zeros((horizon, count))
+    payoff = np.full(count, -1)
+    used = 0
+    while used < horizon and (balance > 0).any():
+        # Intereses redondeados al centavo, como en un extracto
+        accrued = np.rint(balance * rate)
+        balance += accrued
+        paid = np.minimum(minimum, balance)
+        owed = (balance - paid)[order]
+        before = np.cumsum(owed) - owed
+        paid[order] += np.clip(budget - paid.sum() - before, 0, owed)
+        balance -= paid
+        balances[used], payments[used], interest[used] = balance, paid, accrued
+        payoff[(balance <= 0) & (payoff < 0)] = used
+        used += 1
+    first = month_number(today or date.today()) + 1
+    return PayoffPlan(
+        strategy=strategy,
+        months=[f"{(first + index) // 12 + 1970:04d}-{(first + index) % 12 + 1:02d}" for index in range(used)],
+        balances=balances[:used],
+        payments=payments[:used],
+        interest=interest[:used],
+        payoff_months=payoff,
+        total_interest=int(interest[:used].sum()),
+        total_paid=int(payments[:used].sum()),
+    )
+
@@ -0,0 +1,170 @@
+# Línea de comandos para reportes y tareas programadas (cron). Solo usa
+# finanzas_servicios: no importa PyQt5 ni QtChart y no necesita pantalla
+#
+#   python finanzas_cli.py summary --months 12
+#   python finanzas_cli.py export gastos -o gastos.csv --desde 2024-01-01
+#   python finanzas_cli.py export ingresos -o ingresos.jsonl.gz
+#   python finanzas_cli.py search gastos "mercadona"
+#   python finanzas_cli.py import extracto.ofx
+#   python finanzas_cli.py rebuild-aggregates
+#   python finanzas_cli.py add-user "Ana" ana@ejemplo.com --moneda € --archivo-propio
+#   python finanzas_cli.py --user 2 summary
+import argparse
+import csv
+import json
+import sqlite3
+import sys
+
+from finanzas_servicios import (
+    DatabaseManager, Money, EXPORT_COLUMNS, EXPORT_DATE_COLUMNS, EXPORT_CATEGORY_COLUMNS, EXPORT_FORMATS,
+    SEARCH_TABLES, SEARCH_LIMIT, DEFAULT_USER_ID, DEFAULT_CURRENCY, USER_CURRENCIES,
+    load_dashboard_summary, import_file, rebuild_aggregates, export_table, export_format_for, open_export,
+    search_transactions, load_users, user_currency, user_database_path, create_user
+)
+
+def print_summary(summary, currency="$"):
+    money = lambda cents: Money(cents).format(currency)
+    print(f"{'Mes':<10}{'Ingresos':>16}{'Gastos':>16}{'Balance':>16}")
+    for month, income, expense in zip(summary.months, summary.monthly_income, summary.monthly_expense):
+        print(f"{month:<10}{money(income):>16}{money(expense):>16}{money(income - expense):>16}")
+    print()
+    print("Gastos por categoría (histórico)")
+    for category, total in summary.expense_by_category:
+        print(f"  {category:<24}{money(total):>16}")
+    print()
+    print(f"{'Ingresos totales:':<24}{money(summary.total_income):>16}")
+    print(f"{'Gastos totales:':<24}{money(summary.total_expense):>16}")
+    print(f"{'Ahorros:':<24}{money(summary.total_savings):>16}")
+    print(f"{'Deudas:':<24}{money(summary.total_debts):>16}")
+    print(f"{'Patrimonio neto:':<24}{money(summary.net_worth):>16}")
+
+def command_summary(db_manager, args):
+    summary = load_dashboard_summary(db_manager, args.user, args.months)
+    if args.json:
+        # Montos en centavos, como en la base
+        json.dump({
+            "meses": summary.months,
+            "ingresos": summary.monthly_income,
+            "gastos": summary.monthly_expense,
+            "gastos_por_categoria": dict(summary.expense_by_category),
+            "ingresos_totales": summary.total_income,
+            "gastos_totales": summary.total_expense,
+            "ahorros": summary.total_savings,
+            "deudas": summary.total_debts,
+            "patrimonio_neto": summary.net_worth,
+        }, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_summary(summary, user_currency(db_manager, args.user))
+
+def command_export(db_manager, args):
+    filters = {
+        EXPORT_DATE_COLUMNS[args.table]: (args.desde, args.hasta),
+        EXPORT_CATEGORY_COLUMNS[args.table]: args.categoria,
+    }
+    if args.output == "-":
+        export_format = args.format or "csv"
+        count = export_table(db_manager, args.table, args.user, sys.stdout, export_format, filters)
+    else:
+        export_format = args.format or export_format_for(args.output)
+        with open_export(args.output, args.gzip or None) as output:
+            count = export_table(db_manager, args.table, args.user, output, export_format, filters)
+    print(f"Filas exportadas: {count:,}", file=sys.stderr)
+
+def command_search(db_manager, args):
+    rows = search_transactions(db_manager, args.table, args.user, args.text,
+                               ("id", "fecha", "monto", "descripcion"), limit=args.limit)
+    currency = user_currency(db_manager, args.user)
+    for row_id, day, amount, description in rows:
+        print(f"{row_id:>8}  {day}  {Money(amount).format(currency):>14}  {description}")
+
+def command_import(db_manager, args):
+    imported, skipped = import_file(db_manager, args.path, args.table, args.user)
+    print(f"Filas importadas: {imported:,}\nFilas omitidas: {skipped:,}")
+
+def command_rebuild(db_manager, args):
+    rebuild_aggregates(db_manager)
+    print("Resumen mensual y contadores recalculados")
+
+def command_users(directory, args):
+    for user_id, name, email, currency, own_file in load_users(directory):
+        print(f"{user_id:>4}  {name:<24}{email:<32}{currency or DEFAULT_CURRENCY:<6}{own_file or 'base compartida'}")
+
+def command_add_user(directory, args):
+    user_id = create_user(directory, args.nombre, args.email, args.moneda, args.archivo_propio)
+    print(f"Usuario creado con id {user_id}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="finanzas", description="Gestión financiera personal sin interfaz gráfica")
+    parser.add_argument("--db", default="finanzas.db", help="archivo de la base (por defecto finanzas.db)")
+    parser.add_argument("--user", type=int, default=DEFAULT_USER_ID, help=f"id de usuario (por defecto {DEFAULT_USER_ID})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    summary = commands.add_parser("summary", help="resumen de ingresos, gastos y patrimonio")
+    summary.add_argument("--months", type=int, default=6, help="meses a mostrar (por defecto 6)")
+    summary.add_argument("--json", action="store_true", help="salida en JSON, montos en centavos")
+    summary.set_defaults(handler=command_summary)
+    
+    export = commands.add_parser("export", help="exporta una tabla a CSV o JSON Lines")
+    export.add_argument("table", choices=sorted(EXPORT_COLUMNS))
+    export.add_argument("-o", "--output", default="-",
+                        help="archivo de salida (- = salida estándar); .jsonl y .gz eligen formato y compresión")
+    export.add_argument("--format", choices=EXPORT_FORMATS, help="formato, si no se deduce de la extensión")
+    export.add_argument("--gzip", action="store_true", help="comprime con gzip aunque el nombre no termine en .gz")
+    export.add_argument("--desde", help="fecha inicial AAAA-MM-DD")
+    export.add_argument("--hasta", help="fecha final AAAA-MM-DD")
+    export.add_argument("--categoria", help="solo esta categoría (tipo en ingresos, objetivos y deudas)")
+    export.set_defaults(handler=command_export)
+    
+    search = commands.add_parser("search", help="busca en las descripciones, de la más a la menos relevante")
+    search.add_argument("table", choices=SEARCH_TABLES)
+    search.add_argument("text")
+    search.add_argument("--limit", type=int, default=SEARCH_LIMIT, help=f"máximo de resultados (por defecto {SEARCH_LIMIT})")
+    search.set_defaults(handler=command_search)
+    
+    importer = commands.add_parser("import", help="importa un extracto CSV, OFX o QIF")
+    importer.add_argument("path")
+    importer.add_argument("--table", choices=("ingresos", "gastos"), default="gastos",
+                          help="tabla destino de un CSV (OFX/QIF se reparten por signo)")
+    importer.set_defaults(handler=command_import)
+    
+    rebuild = commands.add_parser("rebuild-aggregates", help="recalcula el resumen mensual y los contadores")
+    rebuild.set_defaults(handler=command_rebuild)
+    
+    # Los comandos de usuarios trabajan sobre el directorio (la base compartida)
+    users = commands.add_parser("users", help="lista los usuarios")
+    users.set_defaults(handler=command_users, on_directory=True)
+    
+    add_user = commands.add_parser("add-user", help="crea un usuario")
+    add_user.add_argument("nombre")
+    add_user.add_argument("email")
+    add_user.add_argument("--moneda", default=DEFAULT_CURRENCY, help=f"símbolo de moneda ({', '.join(USER_CURRENCIES)}...)")
+    add_user.add_argument("--archivo-propio", action="store_true",
+                          help="guarda sus datos en un archivo SQLite propio junto a la base")
+    add_user.set_defaults(handler=command_add_user, on_directory=True)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        # El usuario puede tener sus datos en un archivo propio (ver usuarios.archivo)
+        directory = db_manager = DatabaseManager(args.db)
+        path = user_database_path(directory, args.user)
+        if not getattr(args, "on_directory", False) and path != directory.db_name:
+            db_manager = DatabaseManager(path)
+    except sqlite3.Error as e:
+        print(f"No se pudo abrir {args.db}: {e}", file=sys.stderr)
+        return 1
+    try:
+        args.handler(db_manager, args)
+    except (OSError, ValueError, csv.Error, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if db_manager is not directory:
+            db_manager.close()
+        directory.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
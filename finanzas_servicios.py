@@ -0,0 +1,1738 @@
+# Lógica de la aplicación sin Qt: base de datos, agregaciones, avisos,
+# recurrencias e importación. La usan la interfaz (.py) y la línea de
+# comandos (finanzas_cli.py), que así arranca sin cargar PyQt5. Por eso
+# tampoco usa dataclasses (importa inspect, ~30 ms): tuplas con nombre y
+# clases simples alcanzan
+import sqlite3
+import calendar
+import csv
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from itertools import islice
+
+# ====================== DINERO ======================
+class Money(namedtuple("Money", "cents", defaults=(0,))):
+    # Monto exacto en centavos. La base guarda los montos como estos enteros,
+    # así que las sumas en SQL no acumulan error de punto flotante
+    __slots__ = ()
+    
+    @classmethod
+    def from_amount(cls, value):
+        # Desde un monto en unidades (float de un QDoubleSpinBox, texto, Decimal)
+        try:
+            amount = Decimal(str(value)) * 100
+        except InvalidOperation:
+            raise ValueError(f"Monto inválido: {value!r}")
+        return cls(int(amount.quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+    
+    # La aritmética se define entera: la de tuple (Money * 3 repite la tupla,
+    # Money + tupla concatena) no tiene sentido para un monto
+    def __add__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return Money(self.cents + other.cents)
+    
+    def __radd__(self, other):
+        # Solo para sum(), que empieza sumando desde 0
+        if isinstance(other, int) and other == 0:
+            return self
+        return NotImplemented
+    
+    def __sub__(self, other):
+        if not isinstance(other, Money):
+            return NotImplemented
+        return Money(self.cents - other.cents)
+    
+    def __mul__(self, factor):
+        # Escala por un entero o un Decimal (tasas, porcentajes) redondeando
+        # al centavo; un float no, por la misma razón que los montos en centavos
+        if isinstance(factor, int):
+            return Money(self.cents * factor)
+        if isinstance(factor, Decimal):
+            return Money(int((self.cents * factor).quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+        return NotImplemented
+    
+    __rmul__ = __mul__
+    
+    def __neg__(self):
+        return Money(-self.cents)
+    
+    def __bool__(self):
+        return self.cents != 0
+    
+    def __float__(self):
+        # Solo para dibujar (gráficos, barras de progreso), nunca para sumar
+        return self.cents / 100
+    
+    def format(self, currency="$"):
+        units, cents = divmod(abs(self.cents), 100)
+        sign = "-" if self.cents < 0 else ""
+        return f"{sign}{currency}{units:,}.{cents:02d}"
+    
+    def __str__(self):
+        return self.format()
+
+# ====================== BASE DE DATOS SIMPLIFICADA ======================
+# Resumen mensual materializado: totales por (usuario, movimiento, mes, categoría)
+# que los triggers mantienen al día con cada alta, baja o cambio de movimientos
+MONTHLY_SUMMARY_REBUILD = [
+    "DELETE FROM resumen_mensual",
+    """INSERT INTO resumen_mensual (usuario_id, movimiento, mes, categoria, total, cantidad)
+       SELECT usuario_id, 'ingreso', substr(fecha, 1, 7), tipo, SUM(monto), COUNT(*)
+       FROM ingresos GROUP BY usuario_id, substr(fecha, 1, 7), tipo""",
+    """INSERT INTO resumen_mensual (usuario_id, movimiento, mes, categoria, total, cantidad)
+       SELECT usuario_id, 'gasto', substr(fecha, 1, 7), categoria, SUM(monto), COUNT(*)
+       FROM gastos GROUP BY usuario_id, substr(fecha, 1, 7), categoria""",
+]
+
+MONTHLY_SUMMARY_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS resumen_mensual (
+        usuario_id INTEGER NOT NULL,
+        movimiento TEXT NOT NULL,
+        mes TEXT NOT NULL,
+        categoria TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        cantidad INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (usuario_id, movimiento, mes, categoria)) WITHOUT ROWID""",
+        """CREATE TRIGGER IF NOT EXISTS trg_ingresos_resumen_insert AFTER INSERT ON ingresos BEGIN
+            INSERT INTO resumen_mensual (usuario_id, movimiento, mes, categoria, total, cantidad)
+            VALUES (NEW.usuario_id, 'ingreso', substr(NEW.fecha, 1, 7), NEW.tipo, NEW.monto, 1)
+            ON CONFLICT (usuario_id, movimiento, mes, categoria)
+            DO UPDATE SET total = total + excluded.total, cantidad = cantidad + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_ingresos_resumen_delete AFTER DELETE ON ingresos BEGIN
+            UPDATE resumen_mensual SET total = total - OLD.monto, cantidad = cantidad - 1
+            WHERE usuario_id = OLD.usuario_id AND movimiento = 'ingreso'
+              AND mes = substr(OLD.fecha, 1, 7) AND categoria = OLD.tipo;
+            DELETE FROM resumen_mensual
+            WHERE usuario_id = OLD.usuario_id AND movimiento = 'ingreso'
+              AND mes = substr(OLD.fecha, 1, 7) AND categoria = OLD.tipo AND cantidad = 0;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_ingresos_resumen_update
+        AFTER UPDATE OF usuario_id, tipo, monto, fecha ON ingresos BEGIN
+            UPDATE resumen_mensual SET total = total - OLD.monto, cantidad = cantidad - 1
+            WHERE usuario_id = OLD.usuario_id AND movimiento = 'ingreso'
+              AND mes = substr(OLD.fecha, 1, 7) AND categoria = OLD.tipo;
+            DELETE FROM resumen_mensual
+            WHERE usuario_id = OLD.usuario_id AND movimiento = 'ingreso'
+              AND mes = substr(OLD.fecha, 1, 7) AND categoria = OLD.tipo AND cantidad = 0;
+            INSERT INTO resumen_mensual (usuario_id, movimiento, mes, categoria, total, cantidad)
+            VALUES (NEW.usuario_id, 'ingreso', substr(NEW.fecha, 1, 7), NEW.tipo, NEW.monto, 1)
+            ON CONFLICT (usuario_id, movimiento, mes, categoria)
+            DO UPDATE SET total = total + excluded.total, cantidad = cantidad + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_gastos_resumen_insert AFTER INSERT ON gastos BEGIN
+            INSERT INTO resumen_mensual (usuario_id, movimiento, mes, categoria, total, cantidad)
+            VALUES (NEW.usuario_id, 'gasto', substr(NEW.fecha, 1, 7), NEW.categoria, NEW.monto, 1)
+            ON CONFLICT (usuario_id, movimiento, mes, categoria)
+            DO UPDATE SET total = total + excluded.total, cantidad = cantidad + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_gastos_resumen_delete AFTER DELETE ON gastos BEGIN
+            UPDATE resumen_mensual SET total = total - OLD.monto, cantidad = cantidad - 1
+            WHERE usuario_id = OLD.usuario_id AND movimiento = 'gasto'
+              AND mes = substr(OLD.fecha, 1, 7) AND categoria = OLD.categoria;
+            DELETE FROM resumen_mensual
+            WHERE usuario_id = OLD.usuario_id AND movimiento = 'gasto'
+              AND mes = substr(OLD.fecha, 1, 7) AND categoria = OLD.categoria AND cantidad = 0;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_gastos_resumen_update
+        AFTER UPDATE OF usuario_id, categoria, monto, fecha ON gastos BEGIN
+            UPDATE resumen_mensual SET total = total - OLD.monto, cantidad = cantidad - 1
+            WHERE usuario_id = OLD.usuario_id AND movimiento = 'gasto'
+              AND mes = substr(OLD.fecha, 1, 7) AND categoria = OLD.categoria;
+            DELETE FROM resumen_mensual
+            WHERE usuario_id = OLD.usuario_id AND movimiento = 'gasto'
+              AND mes = substr(OLD.fecha, 1, 7) AND categoria = OLD.categoria AND cantidad = 0;
+            INSERT INTO resumen_mensual (usuario_id, movimiento, mes, categoria, total, cantidad)
+            VALUES (NEW.usuario_id, 'gasto', substr(NEW.fecha, 1, 7), NEW.categoria, NEW.monto, 1)
+            ON CONFLICT (usuario_id, movimiento, mes, categoria)
+            DO UPDATE SET total = total + excluded.total, cantidad = cantidad + 1;
+        END""",
+]
+
+# Montos de REAL a centavos INTEGER: SQLite no cambia el tipo de una columna,
+# así que cada tabla se copia a una nueva y se recrean sus índices. Los
+# triggers del resumen caen con las tablas viejas y se vuelven a crear
+MONEY_TO_CENTS = [
+    """CREATE TABLE ingresos_centavos (
+        id INTEGER PRIMARY KEY,
+        usuario_id INTEGER NOT NULL,
+        tipo TEXT NOT NULL,
+        monto INTEGER NOT NULL,
+        fecha DATE NOT NULL,
+        descripcion TEXT,
+        hash_importacion TEXT)""",
+    """INSERT INTO ingresos_centavos
+       SELECT id, usuario_id, tipo, CAST(ROUND(monto * 100) AS INTEGER), fecha, descripcion, hash_importacion
+       FROM ingresos""",
+    "DROP TABLE ingresos",
+    "ALTER TABLE ingresos_centavos RENAME TO ingresos",
+    "CREATE INDEX idx_ingresos_usuario_fecha ON ingresos (usuario_id, fecha, monto)",
+    "CREATE UNIQUE INDEX idx_ingresos_hash ON ingresos (hash_importacion)",
+    "CREATE INDEX idx_ingresos_usuario_monto ON ingresos (usuario_id, monto)",
+    "CREATE INDEX idx_ingresos_usuario_tipo ON ingresos (usuario_id, tipo, fecha)",
+    """CREATE TABLE gastos_centavos (
+        id INTEGER PRIMARY KEY,
+        usuario_id INTEGER NOT NULL,
+        categoria TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        monto INTEGER NOT NULL,
+        fecha DATE NOT NULL,
+        descripcion TEXT,
+        hash_importacion TEXT)""",
+    """INSERT INTO gastos_centavos
+       SELECT id, usuario_id, categoria, tipo, CAST(ROUND(monto * 100) AS INTEGER), fecha, descripcion, hash_importacion
+       FROM gastos""",
+    "DROP TABLE gastos",
+    "ALTER TABLE gastos_centavos RENAME TO gastos",
+    "CREATE INDEX idx_gastos_usuario_categoria ON gastos (usuario_id, categoria, monto)",
+    "CREATE UNIQUE INDEX idx_gastos_hash ON gastos (hash_importacion)",
+    "CREATE INDEX idx_gastos_usuario_monto ON gastos (usuario_id, monto)",
+    "CREATE INDEX idx_gastos_usuario_categoria_fecha ON gastos (usuario_id, categoria, fecha)",
+    "CREATE INDEX idx_gastos_usuario_fecha_categoria ON gastos (usuario_id, fecha, categoria, monto)",
+    """CREATE TABLE deudas_centavos (
+        id INTEGER PRIMARY KEY,
+        usuario_id INTEGER NOT NULL,
+        nombre TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        monto_inicial INTEGER NOT NULL,
+        monto_actual INTEGER NOT NULL,
+        tasa_interes REAL,
+        fecha_inicio DATE,
+        fecha_pago DATE)""",
+    """INSERT INTO deudas_centavos
+       SELECT id, usuario_id, nombre, tipo, CAST(ROUND(monto_inicial * 100) AS INTEGER),
+              CAST(ROUND(monto_actual * 100) AS INTEGER), tasa_interes, fecha_inicio, fecha_pago
+       FROM deudas""",
+    "DROP TABLE deudas",
+    "ALTER TABLE deudas_centavos RENAME TO deudas",
+    "CREATE INDEX idx_deudas_usuario ON deudas (usuario_id, monto_actual)",
+    """CREATE TABLE objetivos_centavos (
+        id INTEGER PRIMARY KEY,
+        usuario_id INTEGER NOT NULL,
+        titulo TEXT NOT NULL,
+        tipo TEXT NOT NULL,
+        monto_actual INTEGER DEFAULT 0,
+        meta INTEGER,
+        fecha_creacion DATE,
+        fecha_meta DATE,
+        completado BOOLEAN DEFAULT 0)""",
+    """INSERT INTO objetivos_centavos
+       SELECT id, usuario_id, titulo, tipo, CAST(ROUND(monto_actual * 100) AS INTEGER),
+              CAST(ROUND(meta * 100) AS INTEGER), fecha_creacion, fecha_meta, completado
+       FROM objetivos""",
+    "DROP TABLE objetivos",
+    "ALTER TABLE objetivos_centavos RENAME TO objetivos",
+    "CREATE INDEX idx_objetivos_usuario_completado ON objetivos (usuario_id, completado)",
+    "DROP TABLE resumen_mensual",
+]
+
+# Contador de notificaciones sin leer por usuario, mantenido por triggers
+# para que el aviso de la barra no tenga que contar filas
+NOTIFICATION_STATE_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS estado_notificaciones (
+        usuario_id INTEGER PRIMARY KEY,
+        revisado_hasta DATE,
+        ultimo_gasto INTEGER NOT NULL DEFAULT 0,
+        no_leidas INTEGER NOT NULL DEFAULT 0)""",
+    """CREATE TRIGGER IF NOT EXISTS trg_notificaciones_insert AFTER INSERT ON notificaciones
+    WHEN NEW.leida = 0 BEGIN
+        INSERT INTO estado_notificaciones (usuario_id, no_leidas) VALUES (NEW.usuario_id, 1)
+        ON CONFLICT (usuario_id) DO UPDATE SET no_leidas = no_leidas + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_notificaciones_delete AFTER DELETE ON notificaciones
+    WHEN OLD.leida = 0 BEGIN
+        UPDATE estado_notificaciones SET no_leidas = no_leidas - 1 WHERE usuario_id = OLD.usuario_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_notificaciones_update AFTER UPDATE OF leida ON notificaciones
+    WHEN (OLD.leida = 0) != (NEW.leida = 0) BEGIN
+        UPDATE estado_notificaciones
+        SET no_leidas = no_leidas + CASE WHEN NEW.leida = 0 THEN 1 ELSE -1 END
+        WHERE usuario_id = NEW.usuario_id;
+    END""",
+    """INSERT INTO estado_notificaciones (usuario_id, no_leidas)
+       SELECT usuario_id, COUNT(*) FROM notificaciones WHERE leida = 0 GROUP BY usuario_id""",
+]
+
+# Índice de texto completo de las descripciones: tablas FTS5 de contenido
+# externo (el texto no se duplica, se lee de la tabla base por rowid) que los
+# triggers mantienen al día. unicode61 sin tildes para que "cafe" encuentre
+# "café"; los prefijos de 2 y 3 letras aceleran la búsqueda mientras se escribe
+def search_schema(table):
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+            descripcion, content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_insert AFTER INSERT ON {table}
+        WHEN NEW.descripcion IS NOT NULL BEGIN
+            INSERT INTO {table}_fts (rowid, descripcion) VALUES (NEW.id, NEW.descripcion);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_delete AFTER DELETE ON {table}
+        WHEN OLD.descripcion IS NOT NULL BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, descripcion) VALUES ('delete', OLD.id, OLD.descripcion);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_update AFTER UPDATE OF descripcion ON {table}
+        WHEN OLD.descripcion IS NOT NEW.descripcion BEGIN
+            INSERT INTO {table}_fts ({table}_fts, rowid, descripcion)
+            SELECT 'delete', OLD.id, OLD.descripcion WHERE OLD.descripcion IS NOT NULL;
+            INSERT INTO {table}_fts (rowid, descripcion)
+            SELECT NEW.id, NEW.descripcion WHERE NEW.descripcion IS NOT NULL;
+        END""",
+        f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')",
+    ]
+
+SEARCH_TABLES = ("ingresos", "gastos")
+
+# Carga masiva (ver DatabaseManager.bulk_load): mientras una tabla figura en
+# carga_masiva, sus triggers de alta no tocan el resumen ni el índice de
+# búsqueda; al terminar se ponen al día con una sentencia por tabla
+SUMMARY_COLUMNS = {"ingresos": ("ingreso", "tipo"), "gastos": ("gasto", "categoria")}
+
+def bulk_load_schema(table):
+    movement, category = SUMMARY_COLUMNS[table]
+    guard = f"NOT EXISTS (SELECT 1 FROM carga_masiva WHERE tabla = '{table}')"
+    return [
+        f"DROP TRIGGER IF EXISTS trg_{table}_resumen_insert",
+        f"""CREATE TRIGGER trg_{table}_resumen_insert AFTER INSERT ON {table}
+        WHEN {guard} BEGIN
+            INSERT INTO resumen_mensual (usuario_id, movimiento, mes, categoria, total, cantidad)
+            VALUES (NEW.usuario_id, '{movement}', substr(NEW.fecha, 1, 7), NEW.{category}, NEW.monto, 1)
+            ON CONFLICT (usuario_id, movimiento, mes, categoria)
+            DO UPDATE SET total = total + excluded.total, cantidad = cantidad + 1;
+        END""",
+        f"DROP TRIGGER IF EXISTS trg_{table}_fts_insert",
+        f"""CREATE TRIGGER trg_{table}_fts_insert AFTER INSERT ON {table}
+        WHEN NEW.descripcion IS NOT NULL AND {guard} BEGIN
+            INSERT INTO {table}_fts (rowid, descripcion) VALUES (NEW.id, NEW.descripcion);
+        END""",
+    ]
+
+# Migraciones del esquema en orden: (versión, sentencias). La última versión
+# aplicada se guarda en PRAGMA user_version, así cada una corre una sola vez.
+MIGRATIONS = [
+    # Índices para las consultas frecuentes (listados por fecha y totales)
+    (1, [
+        "CREATE INDEX IF NOT EXISTS idx_ingresos_usuario_fecha ON ingresos (usuario_id, fecha, monto)",
+        "CREATE INDEX IF NOT EXISTS idx_gastos_usuario_fecha ON gastos (usuario_id, fecha, monto)",
+        "CREATE INDEX IF NOT EXISTS idx_gastos_usuario_categoria ON gastos (usuario_id, categoria, monto)",
+        "CREATE INDEX IF NOT EXISTS idx_objetivos_usuario_completado ON objetivos (usuario_id, completado)",
+        "CREATE INDEX IF NOT EXISTS idx_deudas_usuario ON deudas (usuario_id, monto_actual)",
+    ]),
+    # Huella de los movimientos importados de extractos (evita duplicados)
+    (2, [
+        "ALTER TABLE ingresos ADD COLUMN hash_importacion TEXT",
+        "ALTER TABLE gastos ADD COLUMN hash_importacion TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_ingresos_hash ON ingresos (hash_importacion)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_gastos_hash ON gastos (hash_importacion)",
+    ]),
+    # Índices para ordenar y filtrar las tablas de movimientos en SQL
+    (3, [
+        "CREATE INDEX IF NOT EXISTS idx_ingresos_usuario_monto ON ingresos (usuario_id, monto)",
+        "CREATE INDEX IF NOT EXISTS idx_gastos_usuario_monto ON gastos (usuario_id, monto)",
+        "CREATE INDEX IF NOT EXISTS idx_ingresos_usuario_tipo ON ingresos (usuario_id, tipo, fecha)",
+        "CREATE INDEX IF NOT EXISTS idx_gastos_usuario_categoria_fecha ON gastos (usuario_id, categoria, fecha)",
+    ]),
+    # Índice cubriente para la agregación del dashboard; reemplaza al de (usuario_id, fecha, monto)
+    (4, [
+        "CREATE INDEX IF NOT EXISTS idx_gastos_usuario_fecha_categoria ON gastos (usuario_id, fecha, categoria, monto)",
+        "DROP INDEX IF EXISTS idx_gastos_usuario_fecha",
+    ]),
+    # Resumen mensual mantenido por triggers, con la carga inicial
+    (5, MONTHLY_SUMMARY_SCHEMA + MONTHLY_SUMMARY_REBUILD),
+    # Montos en centavos enteros (ver Money); el resumen se recalcula en enteros
+    (6, MONEY_TO_CENTS + MONTHLY_SUMMARY_SCHEMA + MONTHLY_SUMMARY_REBUILD),
+    # Índices cubrientes por categoría para la carga columnar de la analítica;
+    # reemplazan a los de (usuario_id, categoría, fecha)
+    (7, [
+        "CREATE INDEX IF NOT EXISTS idx_ingresos_usuario_tipo_fecha_monto ON ingresos (usuario_id, tipo, fecha, monto)",
+        "DROP INDEX IF EXISTS idx_ingresos_usuario_tipo",
+        "CREATE INDEX IF NOT EXISTS idx_gastos_usuario_categoria_fecha_monto ON gastos (usuario_id, categoria, fecha, monto)",
+        "DROP INDEX IF EXISTS idx_gastos_usuario_categoria_fecha",
+    ]),
+    # Pago mínimo mensual de cada deuda (centavos); NULL = se deriva de fecha_pago
+    (8, [
+        "ALTER TABLE deudas ADD COLUMN pago_minimo INTEGER",
+    ]),
+    # Avisos: clave única para no repetirlos, índices por fecha de vencimiento
+    # (parciales: solo lo que todavía puede avisar) y contador de no leídas
+    (9, [
+        "ALTER TABLE notificaciones ADD COLUMN clave TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_notificaciones_clave ON notificaciones (usuario_id, clave)",
+        "CREATE INDEX IF NOT EXISTS idx_notificaciones_usuario_leida ON notificaciones (usuario_id, leida, fecha)",
+        "CREATE INDEX IF NOT EXISTS idx_objetivos_usuario_fecha_meta ON objetivos (usuario_id, fecha_meta) WHERE completado = 0",
+        "CREATE INDEX IF NOT EXISTS idx_deudas_usuario_fecha_pago ON deudas (usuario_id, fecha_pago) WHERE monto_actual > 0",
+    ] + NOTIFICATION_STATE_SCHEMA),
+    # Movimientos recurrentes: reglas y, en cada movimiento generado, la regla
+    # y el número de ocurrencia (único, así generar dos veces no duplica)
+    (10, [
+        """CREATE TABLE IF NOT EXISTS recurrencias (
+            id INTEGER PRIMARY KEY,
+            usuario_id INTEGER NOT NULL,
+            movimiento TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            tipo TEXT,
+            monto INTEGER NOT NULL,
+            descripcion TEXT,
+            frecuencia TEXT NOT NULL,
+            intervalo INTEGER NOT NULL DEFAULT 1,
+            fecha_inicio DATE NOT NULL,
+            fecha_fin DATE,
+            generado_hasta INTEGER NOT NULL DEFAULT -1)""",
+        "CREATE INDEX IF NOT EXISTS idx_recurrencias_usuario ON recurrencias (usuario_id, fecha_inicio)",
+        "ALTER TABLE ingresos ADD COLUMN recurrencia_id INTEGER",
+        "ALTER TABLE ingresos ADD COLUMN periodo INTEGER",
+        "ALTER TABLE gastos ADD COLUMN recurrencia_id INTEGER",
+        "ALTER TABLE gastos ADD COLUMN periodo INTEGER",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_ingresos_recurrencia ON ingresos (recurrencia_id, periodo) WHERE recurrencia_id IS NOT NULL",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_gastos_recurrencia ON gastos (recurrencia_id, periodo) WHERE recurrencia_id IS NOT NULL",
+    ]),
+    # Búsqueda de texto completo en las descripciones, con la carga inicial
+    (11, [statement for table in SEARCH_TABLES for statement in search_schema(table)]),
+    # Usuarios con base propia: archivo relativo a la base compartida (NULL = compartida)
+    (12, [
+        "ALTER TABLE usuarios ADD COLUMN archivo TEXT",
+    ]),
+    # Marca de carga masiva y triggers de alta que la respetan
+    (13, ["CREATE TABLE IF NOT EXISTS carga_masiva (tabla TEXT PRIMARY KEY) WITHOUT ROWID"]
+         + [statement for table in SEARCH_TABLES for statement in bulk_load_schema(table)]),
+]
+
+# Perfil de conexión: WAL permite leer mientras se escribe y synchronous=NORMAL
+# evita un fsync por cada commit (seguro en modo WAL)
+CONNECTION_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,       # ~64 MB de caché de páginas
+    "mmap_size": 268435456,     # 256 MB mapeados en memoria
+    "temp_store": "MEMORY",
+}
+
+# Eventos de cambio que publica DatabaseManager después de cada escritura
+# table; op: "insert", "update" o "delete"; row_id: None si cambió un
+# conjunto de filas (lote, importación); row: valores insertados,
+# modificados o borrados
+ChangeEvent = namedtuple("ChangeEvent", "table op row_id row", defaults=(None, None))
+
+QUERY_TABLES_RE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)", re.IGNORECASE)
+
+# Tablas que cambian por triggers cuando se escribe en otra
+DERIVED_TABLES = {
+    "ingresos": ("resumen_mensual", "ingresos_fts"),
+    "gastos": ("resumen_mensual", "gastos_fts"),
+    "notificaciones": ("estado_notificaciones",),
+}
+
+class QueryCache:
+    # Caché LRU de resultados de lectura. Cada tabla tiene un contador de
+    # generación: un resultado leído antes de una escritura no se guarda
+    # aunque termine después (lecturas desde otros hilos)
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def snapshot(self, tables):
+        with self.lock:
+            return self.epoch, tuple(self.generations.get(table, 0) for table in tables)
+    
+    def put(self, key, tables, snapshot, result):
+        with self.lock:
+            current = self.epoch, tuple(self.generations.get(table, 0) for table in tables)
+            if current != snapshot:
+                return
+            self.entries[key] = (tables, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def invalidate(self, table):
+        with self.lock:
+            for name in (table,) + DERIVED_TABLES.get(table, ()):
+                self.generations[name] = self.generations.get(name, 0) + 1
+                stale = [key for key, (tables, _) in self.entries.items() if name in tables]
+                for key in stale:
+                    del self.entries[key]
+    
+    def clear(self):
+        with self.lock:
+            self.epoch += 1
+            self.entries.clear()
+    
+    def stats(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+# Una caché por archivo de base, compartida por todas sus conexiones
+_query_caches = {}
+_query_caches_lock = threading.Lock()
+
+def query_cache_for(db_name):
+    if db_name == ":memory:":
+        return QueryCache()
+    key = os.path.abspath(db_name)
+    with _query_caches_lock:
+        if key not in _query_caches:
+            _query_caches[key] = QueryCache()
+        return _query_caches[key]
+
+WRITE_QUERY_RE = re.compile(r"^\s*(INSERT|UPDATE|DELETE)\b(?:\s+OR\s+\w+)?(?:\s+INTO|\s+FROM)?\s+(\w+)", re.IGNORECASE)
+
+class DatabaseManager:
+    def __init__(self, db_name='finanzas.db', pragmas=CONNECTION_PRAGMAS, read_only=False):
+        self.db_name = db_name
+        self._transaction_depth = 0
+        self._bulk_tables = set()
+        self._listeners = []
+        self._pending_events = []
+        self._data_version = None
+        self.cache = query_cache_for(db_name)
+        if read_only:
+            # Conexión de solo lectura para los hilos de consulta: no toca el esquema
+            from pathlib import Path  # solo los hilos de consulta; pathlib cuesta al arrancar
+            uri = Path(db_name).absolute().as_uri() + "?mode=ro"
+            self.connection = sqlite3.connect(uri, uri=True)
+            self.configure_connection({k: v for k, v in pragmas.items() if k != "journal_mode"})
+            return
+        self.connection = sqlite3.connect(db_name)
+        self.configure_connection(pragmas)
+        self.create_tables()
+        self.run_migrations()
+    
+    def create_tables(self):
+        cursor = self.connection.cursor()
+        
+        # Tabla de usuarios
+        cursor.execute('''CREATE TABLE IF NOT EXISTS usuarios (
+                        id INTEGER PRIMARY KEY,
+                        nombre TEXT NOT NULL,
+                        email TEXT UNIQUE NOT NULL,
+                        moneda TEXT DEFAULT '$')''')
+        
+        # Tablas de movimientos: los montos van en centavos (Money)
+        # Tabla de ingresos
+        cursor.execute('''CREATE TABLE IF NOT EXISTS ingresos (
+                        id INTEGER PRIMARY KEY,
+                        usuario_id INTEGER NOT NULL,
+                        tipo TEXT NOT NULL,
+                        monto INTEGER NOT NULL,
+                        fecha DATE NOT NULL,
+                        descripcion TEXT)''')
+        
+        # Tabla de gastos
+        cursor.execute('''CREATE TABLE IF NOT EXISTS gastos (
+                        id INTEGER PRIMARY KEY,
+                        usuario_id INTEGER NOT NULL,
+                        categoria TEXT NOT NULL,
+                        tipo TEXT NOT NULL,
+                        monto INTEGER NOT NULL,
+                        fecha DATE NOT NULL,
+                        descripcion TEXT)''')
+        
+        # Tabla de deudas
+        cursor.execute('''CREATE TABLE IF NOT EXISTS deudas (
+                        id INTEGER PRIMARY KEY,
+                        usuario_id INTEGER NOT NULL,
+                        nombre TEXT NOT NULL,
+                        tipo TEXT NOT NULL,
+                        monto_inicial INTEGER NOT NULL,
+                        monto_actual INTEGER NOT NULL,
+                        tasa_interes REAL,
+                        fecha_inicio DATE,
+                        fecha_pago DATE)''')
+        
+        # Tabla de objetivos
+        cursor.execute('''CREATE TABLE IF NOT EXISTS objetivos (
+                        id INTEGER PRIMARY KEY,
+                        usuario_id INTEGER NOT NULL,
+                        titulo TEXT NOT NULL,
+                        tipo TEXT NOT NULL,
+                        monto_actual INTEGER DEFAULT 0,
+                        meta INTEGER,
+                        fecha_creacion DATE,
+                        fecha_meta DATE,
+                        completado BOOLEAN DEFAULT 0)''')
+        
+        # Tabla de notificaciones
+        cursor.execute('''CREATE TABLE IF NOT EXISTS notificaciones (
+                        id INTEGER PRIMARY KEY,
+                        usuario_id INTEGER NOT NULL,
+                        titulo TEXT NOT NULL,
+                        mensaje TEXT NOT NULL,
+                        fecha DATE NOT NULL,
+                        leida BOOLEAN DEFAULT 0)''')
+        
+        self.connection.commit()
+    
+    def configure_connection(self, pragmas):
+        for name, value in pragmas.items():
+            self.connection.execute(f"PRAGMA {name} = {value}")
+    
+    def schema_version(self):
+        return self.connection.execute("PRAGMA user_version").fetchone()[0]
+    
+    def run_migrations(self):
+        current = self.schema_version()
+        for version, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            # Cada migración es atómica: se aplica completa o no se aplica
+            with self.transaction():
+                cursor = self.connection.cursor()
+                for statement in statements:
+                    cursor.execute(statement)
+                cursor.execute(f"PRAGMA user_version = {version}")
+            current = version
+        self.cache.clear()
+    
+    def rebuild_monthly_summary(self):
+        with self.transaction():
+            cursor = self.connection.cursor()
+            for statement in MONTHLY_SUMMARY_REBUILD:
+                cursor.execute(statement)
+        self.cache.invalidate("resumen_mensual")
+    
+    @contextmanager
+    def transaction(self):
+        # La transacción externa usa BEGIN/COMMIT; las anidadas, SAVEPOINT.
+        # Los eventos se retienen hasta el COMMIT y se descartan si se deshace
+        depth = self._transaction_depth
+        savepoint = f"sp_{depth}"
+        pending_mark = len(self._pending_events)
+        if depth == 0:
+            self.connection.execute("BEGIN")
+        else:
+            self.connection.execute(f"SAVEPOINT {savepoint}")
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._transaction_depth -= 1
+            del self._pending_events[pending_mark:]
+            self.cache.clear()
+            if depth == 0:
+                self.connection.rollback()
+            else:
+                self.connection.execute(f"ROLLBACK TO {savepoint}")
+                self.connection.execute(f"RELEASE {savepoint}")
+            raise
+        self._transaction_depth -= 1
+        if depth == 0:
+            self.connection.commit()
+            events, self._pending_events = self._pending_events, []
+            for event in events:
+                self.cache.invalidate(event.table)
+            for event in events:
+                self.dispatch(event)
+        else:
+            self.connection.execute(f"RELEASE {savepoint}")
+    
+    def in_transaction(self):
+        return self._transaction_depth > 0
+    
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+    
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    def publish(self, event):
+        if self.in_transaction():
+            self._pending_events.append(event)
+        else:
+            self.cache.invalidate(event.table)
+            self.dispatch(event)
+    
+    def dispatch(self, event):
+        for listener in list(self._listeners):
+            listener(event)
+    
+    def publish_write(self, query):
+        # Evento genérico (sin fila) para escrituras hechas con SQL libre
+        match = WRITE_QUERY_RE.match(query)
+        if match:
+            self.publish(ChangeEvent(match.group(2).lower(), match.group(1).lower()))
+        elif not query.lstrip().upper().startswith(("SELECT", "WITH")):
+            # DDL u otra sentencia sin tabla reconocible: se vacía toda la caché
+            self.cache.clear()
+    
+    def _execute(self, query, params=None):
+        cursor = self.connection.cursor()
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
+        if not self.in_transaction():
+            self.connection.commit()
+        return cursor
+    
+    def execute_query(self, query, params=None):
+        cursor = self._execute(query, params)
+        self.publish_write(query)
+        return cursor
+    
+    @contextmanager
+    def bulk_load(self, tables):
+        # Altas masivas en ingresos/gastos: los triggers de alta se saltean y
+        # al salir el índice de búsqueda y el resumen mensual se actualizan
+        # con las filas nuevas (id mayor al último de antes) en una sentencia
+        # por tabla. Solo altas: una baja o un cambio dentro del bloque
+        # descontaría algo que el resumen todavía no sumó. La marca es parte
+        # de la transacción, así que otras conexiones no la ven y un error la
+        # deshace junto con las filas. Anidado sobre la misma tabla no hace nada
+        tables = [table for table in tables if table not in self._bulk_tables]
+        with self.transaction():
+            last_ids = {}
+            for table in tables:
+                self.connection.execute("INSERT INTO carga_masiva (tabla) VALUES (?)", (table,))
+                last_ids[table] = self.connection.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+            self._bulk_tables.update(tables)
+            try:
+                yield self
+            finally:
+                self._bulk_tables.difference_update(tables)
+            for table, last_id in last_ids.items():
+                movement, category = SUMMARY_COLUMNS[table]
+                self.connection.execute(
+                    f"INSERT INTO {table}_fts (rowid, descripcion) "
+                    f"SELECT id, descripcion FROM {table} WHERE id > ? AND descripcion IS NOT NULL",
+                    (last_id,)
+                )
+                self.connection.execute(
+                    f"""INSERT INTO resumen_mensual (usuario_id, movimiento, mes, categoria, total, cantidad)
+                       SELECT usuario_id, '{movement}', substr(fecha, 1, 7), {category}, SUM(monto), COUNT(*)
+                       FROM {table} WHERE id > ? GROUP BY usuario_id, substr(fecha, 1, 7), {category}
+                       ON CONFLICT (usuario_id, movimiento, mes, categoria)
+                       DO UPDATE SET total = total + excluded.total, cantidad = cantidad + excluded.cantidad""",
+                    (last_id,)
+                )
+                self.connection.execute("DELETE FROM carga_masiva WHERE tabla = ?", (table,))
+    
+    def execute_batch(self, query, params_seq, bulk=False):
+        # bulk=True para lotes grandes de INSERT en ingresos/gastos (ver bulk_load)
+        if bulk:
+            with self.bulk_load([WRITE_QUERY_RE.match(query).group(2).lower()]):
+                return self.execute_batch(query, params_seq)
+        cursor = self.connection.cursor()
+        cursor.executemany(query, params_seq)
+        if not self.in_transaction():
+            self.connection.commit()
+        self.publish_write(query)
+        return cursor
+    
+    def insert(self, table, values):
+        columns = ", ".join(values)
+        marks = ", ".join("?" for _ in values)
+        cursor = self._execute(f"INSERT INTO {table} ({columns}) VALUES ({marks})", tuple(values.values()))
+        row = dict(values, id=cursor.lastrowid)
+        self.publish(ChangeEvent(table, "insert", cursor.lastrowid, row))
+        return cursor.lastrowid
+    
+    def update(self, table, row_id, values):
+        assignments = ", ".join(f"{column} = ?" for column in values)
+        self._execute(f"UPDATE {table} SET {assignments} WHERE id = ?", (*values.values(), row_id))
+        self.publish(ChangeEvent(table, "update", row_id, dict(values)))
+    
+    def delete(self, table, row_id):
+        # Se lee la fila antes de borrarla para que las vistas puedan descontarla
+        cursor = self.connection.execute(f"SELECT * FROM {table} WHERE id = ?", (row_id,))
+        found = cursor.fetchone()
+        if found is None:
+            return
+        row = dict(zip([column[0] for column in cursor.description], found))
+        self._execute(f"DELETE FROM {table} WHERE id = ?", (row_id,))
+        self.publish(ChangeEvent(table, "delete", row_id, row))
+    
+    def check_external_writes(self):
+        # La caché solo se invalida con las escrituras de este proceso. PRAGMA
+        # data_version cambia cuando otra conexión confirma cambios en el
+        # archivo (la línea de comandos desde cron, otra instancia): entonces
+        # se vacía entera. La primera lectura de una conexión nueva también
+        # la vacía, porque no sabe qué pasó antes de abrirse
+        version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            self.cache.clear()
+    
+    def _cached(self, query, params, fetch, kind=None):
+        # Dentro de una transacción se lee directo: puede haber datos sin confirmar
+        if self.in_transaction():
+            return fetch()
+        self.check_external_writes()
+        key = (" ".join(query.split()), tuple(params or ()), kind or fetch.__name__)
+        result = self.cache.get(key)
+        if result is None:
+            tables = tuple(sorted({table.lower() for table in QUERY_TABLES_RE.findall(query)}))
+            snapshot = self.cache.snapshot(tables)
+            result = fetch()
+            self.cache.put(key, tables, snapshot, result)
+        return result
+    
+    def fetch_all(self, query, params=None):
+        def fetch_rows():
+            cursor = self.connection.cursor()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            return cursor.fetchall()
+        return list(self._cached(query, params, fetch_rows))
+    
+    def fetch_one(self, query, params=None):
+        def fetch_row():
+            cursor = self.connection.cursor()
+            if params:
+                cursor.execute(query, params)
+            else:
+                cursor.execute(query)
+            return cursor.fetchone()
+        return self._cached(query, params, fetch_row)
+    
+    def fetch_derived(self, query, params, derive):
+        # Cachea derive(filas) en lugar de las filas, p. ej. arreglos de NumPy
+        # ya armados; se invalida igual que fetch_all
+        def fetch_derived():
+            return derive(self.connection.execute(query, params or ()).fetchall())
+        return self._cached(query, params, fetch_derived, f"fetch_derived:{derive.__qualname__}")
+    
+    def cache_stats(self):
+        return self.cache.stats()
+    
+    def close(self):
+        self.connection.close()
+
+# ====================== USUARIOS ======================
+# La tabla usuarios de la base compartida es el directorio de la instalación.
+# Cada usuario guarda sus datos en la base compartida o en un archivo propio
+# (usuarios.archivo) con su conexión, su WAL y sus bloqueos: una importación
+# grande de un usuario no frena las consultas de otro. El archivo propio
+# tiene el esquema completo y una copia de la fila del usuario, así el resto
+# del código no distingue entre los dos modos
+DEFAULT_USER_ID = 1
+DEFAULT_CURRENCY = "$"
+USER_CURRENCIES = ("$", "€", "£", "US$", "R$", "S/", "Bs")
+
+def load_users(db_manager):
+    return db_manager.fetch_all("SELECT id, nombre, email, moneda, archivo FROM usuarios ORDER BY nombre, id")
+
+def user_currency(db_manager, user_id):
+    row = db_manager.fetch_one("SELECT moneda FROM usuarios WHERE id = ?", (user_id,))
+    return row[0] if row and row[0] else DEFAULT_CURRENCY
+
+def user_database_path(db_manager, user_id):
+    row = db_manager.fetch_one("SELECT archivo FROM usuarios WHERE id = ?", (user_id,))
+    if row is None or row[0] is None:
+        return db_manager.db_name
+    return os.path.join(os.path.dirname(os.path.abspath(db_manager.db_name)), row[0])
+
+def open_user_database(db_manager, user_id):
+    # Conexión nueva a la base del usuario, abierta recién cuando se la pide;
+    # la cierra quien la abrió
+    return DatabaseManager(user_database_path(db_manager, user_id))
+
+def create_user(db_manager, name, email, currency=DEFAULT_CURRENCY, own_file=False):
+    with db_manager.transaction():
+        user_id = db_manager.insert("usuarios", {"nombre": name, "email": email, "moneda": currency})
+        if own_file:
+            stem = os.path.splitext(os.path.basename(db_manager.db_name))[0]
+            db_manager.update("usuarios", user_id, {"archivo": f"{stem}_usuario{user_id}.db"})
+    if own_file:
+        user_db = open_user_database(db_manager, user_id)
+        try:
+            user_db.insert("usuarios", {"id": user_id, "nombre": name, "email": email, "moneda": currency})
+        finally:
+            user_db.close()
+    return user_id
+
+# ====================== AGREGACIONES ======================
+DASHBOARD_WINDOWS = (6, 12, 24, 60)
+
+class DashboardSummary:
+    # Todos los montos en centavos enteros. Mutable: el dashboard le aplica
+    # los cambios por fila sin volver a consultar
+    def __init__(self, months, monthly_income, monthly_expense, expense_by_category,
+                 total_income=0, total_expense=0, total_savings=0, total_debts=0, until=None):
+        self.months = months                              # claves "YYYY-MM", de la más antigua a la actual
+        self.monthly_income = monthly_income
+        self.monthly_expense = monthly_expense
+        self.expense_by_category = expense_by_category    # [(categoría, total)] ordenado por total
+        self.total_income = total_income
+        self.total_expense = total_expense
+        self.total_savings = total_savings                # saldos de hoy, aun con until
+        self.total_debts = total_debts
+        self.until = until                                # mes de cierre "YYYY-MM"; None = hoy
+    
+    @property
+    def net_worth(self):
+        return self.total_savings - self.total_debts
+
+def month_keys(months, today=None):
+    today = today or date.today()
+    current = today.year * 12 + today.month - 1
+    return [f"{index // 12:04d}-{index % 12 + 1:02d}" for index in range(current - months + 1, current + 1)]
+
+def load_dashboard_summary(db_manager, user_id, months=6, today=None, until=None):
+    # Todo sale del resumen mensual materializado, cuyo tamaño depende de
+    # meses × categorías y no de la cantidad de movimientos. until ("YYYY-MM")
+    # limita los totales de ingresos y gastos y la torta a los meses hasta
+    # ese, inclusive (el dashboard al cierre de un mes pasado); None = todos.
+    # Objetivos y deudas no guardan historia: ahorros, deudas y patrimonio
+    # son siempre los saldos de hoy y quien los muestre debe aclararlo
+    keys = month_keys(months, today)
+    positions = {key: index for index, key in enumerate(keys)}
+    monthly_income = [0] * months
+    monthly_expense = [0] * months
+    by_category = {}
+    total_income = total_expense = 0
+    
+    query = "SELECT movimiento, mes, categoria, total FROM resumen_mensual WHERE usuario_id = ?"
+    params = [user_id]
+    if until is not None:
+        query += " AND mes <= ?"
+        params.append(until)
+    for kind, month, category, amount in db_manager.fetch_all(query, params):
+        position = positions.get(month)
+        if kind == "ingreso":
+            total_income += amount
+            if position is not None:
+                monthly_income[position] += amount
+        else:
+            total_expense += amount
+            by_category[category] = by_category.get(category, 0) + amount
+            if position is not None:
+                monthly_expense[position] += amount
+    
+    total_savings, total_debts = db_manager.fetch_one(
+        "SELECT (SELECT SUM(monto_actual) FROM objetivos WHERE usuario_id = ?), "
+        "(SELECT SUM(monto_actual) FROM deudas WHERE usuario_id = ?)",
+        (user_id, user_id)
+    )
+    return DashboardSummary(
+        months=keys,
+        monthly_income=monthly_income,
+        monthly_expense=monthly_expense,
+        expense_by_category=sorted(by_category.items(), key=lambda item: item[1], reverse=True),
+        total_income=total_income,
+        total_expense=total_expense,
+        total_savings=total_savings or 0,
+        total_debts=total_debts or 0,
+        until=until,
+    )
+
+def load_open_goals(db_manager, user_id):
+    return db_manager.fetch_all(
+        "SELECT id, titulo, tipo, monto_actual, meta FROM objetivos WHERE usuario_id = ? AND completado = 0 ORDER BY id",
+        (user_id,)
+    )
+
+# ====================== NOTIFICACIONES ======================
+# Cada revisión mira solo lo nuevo desde la anterior: las fechas de
+# vencimiento por rango sobre índices (desde revisado_hasta hasta hoy + el
+# aviso previo) y los gastos por id mayor que ultimo_gasto
+NOTIFICATION_LEAD_DAYS = 7
+OVERSPEND_RATIO = 1.2       # gasto del mes sobre el promedio de los meses anteriores
+OVERSPEND_HISTORY = 3       # meses de historia para el promedio
+
+def notification_state(db_manager, user_id):
+    row = db_manager.fetch_one(
+        "SELECT revisado_hasta, ultimo_gasto, no_leidas FROM estado_notificaciones WHERE usuario_id = ?",
+        (user_id,)
+    )
+    return row or (None, 0, 0)
+
+def unread_count(db_manager, user_id):
+    return notification_state(db_manager, user_id)[2]
+
+def load_notifications(db_manager, user_id, limit=20):
+    return db_manager.fetch_all(
+        "SELECT id, titulo, mensaje, fecha FROM notificaciones "
+        "WHERE usuario_id = ? AND leida = 0 ORDER BY fecha DESC, id DESC LIMIT ?",
+        (user_id, limit)
+    )
+
+def mark_notifications_read(db_manager, user_id):
+    db_manager.execute_query(
+        "UPDATE notificaciones SET leida = 1 WHERE usuario_id = ? AND leida = 0", (user_id,)
+    )
+
+def due_date_notifications(db_manager, user_id, start, end, today):
+    # Objetivos y deudas que vencen en [start, end]; los índices parciales
+    # dejan fuera los objetivos completados y las deudas saldadas
+    notifications = []
+    goals = db_manager.fetch_all(
+        "SELECT id, titulo, fecha_meta, meta - monto_actual FROM objetivos "
+        "WHERE usuario_id = ? AND completado = 0 AND fecha_meta BETWEEN ? AND ?",
+        (user_id, start, end)
+    )
+    for goal_id, title, due, missing in goals:
+        days = (date.fromisoformat(due) - today).days
+        notifications.append((
+            f"objetivo:{goal_id}:{due}", "Objetivo por vencer",
+            f"«{title}» vence en {days} días ({due}); faltan {Money(max(missing or 0, 0)).format()}",
+        ))
+    debts = db_manager.fetch_all(
+        "SELECT id, nombre, fecha_pago, monto_actual FROM deudas "
+        "WHERE usuario_id = ? AND monto_actual > 0 AND fecha_pago BETWEEN ? AND ?",
+        (user_id, start, end)
+    )
+    for debt_id, name, due, balance in debts:
+        days = (date.fromisoformat(due) - today).days
+        notifications.append((
+            f"deuda:{debt_id}:{due}", "Pago de deuda",
+            f"«{name}» vence en {days} días ({due}) con {Money(balance).format()} pendientes",
+        ))
+    return notifications
+
+def overspend_notifications(db_manager, user_id, after_id, last_id, today):
+    # Solo las categorías con gastos nuevos de este mes; los totales salen
+    # del resumen mensual por clave primaria. NOT INDEXED obliga a recorrer
+    # el rango de rowid en lugar de todos los gastos del usuario
+    month = today.strftime("%Y-%m")
+    categories = db_manager.fetch_all(
+        "SELECT DISTINCT categoria FROM gastos NOT INDEXED "
+        "WHERE id > ? AND id <= ? AND usuario_id = ? AND fecha >= ?",
+        (after_id, last_id, user_id, f"{month}-01")
+    )
+    first = month_keys(OVERSPEND_HISTORY + 1, today)[0]
+    notifications = []
+    for (category,) in categories:
+        history, current = db_manager.fetch_one(
+            "SELECT COALESCE(SUM(CASE WHEN mes < ? THEN total END), 0), "
+            "COALESCE(SUM(CASE WHEN mes = ? THEN total END), 0) FROM resumen_mensual "
+            "WHERE usuario_id = ? AND movimiento = 'gasto' AND mes >= ? AND mes <= ? AND categoria = ?",
+            (month, month, user_id, first, month, category)
+        )
+        average = history // OVERSPEND_HISTORY
+        if average > 0 and current > average * OVERSPEND_RATIO:
+            notifications.append((
+                f"gasto:{category}:{month}", f"Gasto elevado en {category}",
+                f"Llevas {Money(current).format()} este mes, el promedio es {Money(average).format()}",
+            ))
+    return notifications
+
+def generate_notifications(db_manager, user_id, today=None, rescan=False):
+    # Devuelve cuántos avisos se intentaron crear; la clave única descarta
+    # los repetidos, así revisar dos veces lo mismo no duplica nada
+    today = today or date.today()
+    reviewed, last_seen, _ = notification_state(db_manager, user_id)
+    end = (today + timedelta(days=NOTIFICATION_LEAD_DAYS)).isoformat()
+    notifications = []
+    
+    # Vencimientos: solo la franja de fechas que todavía no se revisó
+    start = today.isoformat()
+    if reviewed and not rescan:
+        start = max(start, (date.fromisoformat(reviewed) + timedelta(days=1)).isoformat())
+    if start <= end:
+        notifications += due_date_notifications(db_manager, user_id, start, end, today)
+    
+    # Gastos: solo los ids posteriores a la marca (MAX(id) sale del rowid)
+    last_id = db_manager.fetch_one("SELECT MAX(id) FROM gastos")[0] or 0
+    if last_id > last_seen:
+        notifications += overspend_notifications(db_manager, user_id, last_seen, last_id, today)
+    
+    if reviewed == end and last_id == last_seen and not notifications:
+        return 0
+    with db_manager.transaction():
+        if notifications:
+            db_manager.execute_batch(
+                "INSERT OR IGNORE INTO notificaciones (usuario_id, clave, titulo, mensaje, fecha) VALUES (?, ?, ?, ?, ?)",
+                [(user_id, key, title, message, today.isoformat()) for key, title, message in notifications]
+            )
+        db_manager.execute_query(
+            "INSERT INTO estado_notificaciones (usuario_id, revisado_hasta, ultimo_gasto) VALUES (?, ?, ?) "
+            "ON CONFLICT (usuario_id) DO UPDATE SET revisado_hasta = excluded.revisado_hasta, "
+            "ultimo_gasto = excluded.ultimo_gasto",
+            (user_id, end, last_id)
+        )
+    return len(notifications)
+
+# ====================== RECURRENCIAS ======================
+# Cada regla genera la ocurrencia n en inicio + n * intervalo (meses,
+# semanas o días). generado_hasta guarda la última ocurrencia creada: al
+# ponerse al día solo se calculan las que faltan y todas se insertan en un
+# único lote; el índice único (recurrencia_id, periodo) descarta repetidas
+RECURRENCE_FREQUENCIES = {"mensual": "Mensual", "semanal": "Semanal", "dias": "Cada N días"}
+
+def occurrence_date(start, frequency, interval, index):
+    if frequency == "mensual":
+        # Los días 29-31 caen en el último día de los meses más cortos
+        month = start.month - 1 + index * interval
+        year, month = start.year + month // 12, month % 12 + 1
+        return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+    days = 7 if frequency == "semanal" else 1
+    return start + timedelta(days=index * interval * days)
+
+def pending_occurrences(start, frequency, interval, generated, until):
+    # (índice, fecha) de las ocurrencias posteriores a `generated` hasta `until`
+    index = generated + 1
+    day = occurrence_date(start, frequency, interval, index)
+    while day <= until:
+        yield index, day
+        index += 1
+        day = occurrence_date(start, frequency, interval, index)
+
+def materialize_recurrences(db_manager, user_id=None, today=None):
+    # Crea todas las ocurrencias que faltan hasta hoy en una transacción;
+    # devuelve cuántos movimientos se generaron
+    today = today or date.today()
+    query = ("SELECT id, usuario_id, movimiento, categoria, tipo, monto, descripcion, frecuencia, "
+             "intervalo, fecha_inicio, fecha_fin, generado_hasta FROM recurrencias WHERE fecha_inicio <= ?")
+    params = [today.isoformat()]
+    if user_id is not None:
+        query += " AND usuario_id = ?"
+        params.append(user_id)
+    incomes, expenses, progress = [], [], []
+    for (rule_id, owner, kind, category, expense_type, amount, description,
+         frequency, interval, start, end, generated) in db_manager.fetch_all(query, params):
+        until = min(today, date.fromisoformat(end)) if end else today
+        last = generated
+        for index, day in pending_occurrences(date.fromisoformat(start), frequency, max(interval, 1), generated, until):
+            if kind == "ingreso":
+                incomes.append((owner, category, amount, day.isoformat(), description, rule_id, index))
+            else:
+                expenses.append((owner, category, expense_type, amount, day.isoformat(), description, rule_id, index))
+            last = index
+        if last != generated:
+            progress.append((last, rule_id))
+    if not progress:
+        return 0
+    with db_manager.transaction():
+        if incomes:
+            db_manager.execute_batch(
+                "INSERT OR IGNORE INTO ingresos (usuario_id, tipo, monto, fecha, descripcion, recurrencia_id, periodo) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", incomes
+            )
+        if expenses:
+            db_manager.execute_batch(
+                "INSERT OR IGNORE INTO gastos (usuario_id, categoria, tipo, monto, fecha, descripcion, recurrencia_id, periodo) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", expenses
+            )
+        db_manager.execute_batch("UPDATE recurrencias SET generado_hasta = ? WHERE id = ?", progress)
+    return len(incomes) + len(expenses)
+
+def add_recurrence(db_manager, user_id, kind, category, amount, start, frequency,
+                   interval=1, expense_type=None, description=""):
+    # Guarda la regla y genera de inmediato las ocurrencias ya vencidas
+    rule_id = db_manager.insert("recurrencias", {
+        "usuario_id": user_id,
+        "movimiento": kind,
+        "categoria": category,
+        "tipo": expense_type,
+        "monto": amount,
+        "descripcion": description,
+        "frecuencia": frequency,
+        "intervalo": interval,
+        "fecha_inicio": start,
+    })
+    materialize_recurrences(db_manager, user_id)
+    return rule_id
+
+def stop_recurrence(db_manager, table, row_id, today=None):
+    # Termina la regla que generó el movimiento; devuelve False si no tenía
+    row = db_manager.fetch_one(f"SELECT recurrencia_id FROM {table} WHERE id = ?", (row_id,))
+    if not row or row[0] is None:
+        return False
+    db_manager.update("recurrencias", row[0], {"fecha_fin": (today or date.today()).isoformat()})
+    return True
+
+# ====================== BÚSQUEDA ======================
+# Búsqueda en las descripciones con el índice FTS5 (ver search_schema). bm25
+# necesita contar en cuántas filas aparece cada palabra, lo que recorre toda
+# su lista en el índice: con una palabra muy común (la mitad de los
+# movimientos) eso solo ya pasa de 50 ms. Por eso se cuenta primero, hasta
+# SEARCH_CANDIDATES, cuántas filas tiene cada palabra: si ninguna es común se
+# ordena por bm25 y, si no, se toman las coincidencias más recientes y se
+# ordenan por largo de la descripción, que es lo que haría bm25 cuando cada
+# palabra aparece una vez por fila
+SEARCH_TOKEN_RE = re.compile(r"[^\W_]+")
+SEARCH_LIMIT = 200
+SEARCH_CANDIDATES = 500
+SEARCH_PREFIX_INDEX = 3     # prefijo más largo indexado (prefix='2 3')
+
+def filter_conditions(filters, columns, alias=None):
+    # filters usa el formato de TransactionFilterBar: {columna: valor} para
+    # igualdad y {columna: (desde, hasta)} para rangos, None = sin límite
+    conditions = []
+    params = []
+    for column, value in (filters or {}).items():
+        if column not in columns:
+            raise ValueError(f"Columna de filtro desconocida: {column}")
+        name = f"{alias}.{column}" if alias else column
+        if isinstance(value, tuple):
+            low, high = value
+            if low is not None:
+                conditions.append(f"{name} >= ?")
+                params.append(low)
+            if high is not None:
+                conditions.append(f"{name} <= ?")
+                params.append(high)
+        elif value is not None:
+            conditions.append(f"{name} = ?")
+            params.append(value)
+    return conditions, params
+
+def search_tokens(text):
+    # Palabras como las separa el tokenizador: minúsculas y sin tildes
+    folded = unicodedata.normalize("NFKD", text.lower())
+    return SEARCH_TOKEN_RE.findall("".join(char for char in folded if not unicodedata.combining(char)))
+
+def search_terms(tokens):
+    # Cada palabra entre comillas: lo escrito no se interpreta como sintaxis
+    # de FTS5. La última es prefijo, salvo de una letra (recorrería medio índice)
+    terms = [f'"{token}"' for token in tokens]
+    if tokens and len(tokens[-1]) > 1:
+        terms[-1] += "*"
+    return terms
+
+def search_match(text):
+    # Expresión MATCH de lo escrito en la búsqueda, o None si no hay palabras
+    return " ".join(search_terms(search_tokens(text))) or None
+
+def count_matches(db_manager, table, match):
+    # Coincidencias en todo el índice, hasta SEARCH_CANDIDATES + 1: el total
+    # no hace falta y contar una palabra común costaría lo mismo que bm25
+    return db_manager.fetch_one(
+        f"SELECT COUNT(*) FROM (SELECT 1 FROM {table}_fts WHERE {table}_fts MATCH ? LIMIT ?)",
+        (match, SEARCH_CANDIDATES + 1)
+    )[0]
+
+def search_transactions(db_manager, table, user_id, text, columns, filters=None, limit=SEARCH_LIMIT):
+    # Filas (con las columnas pedidas) del usuario cuya descripción contiene
+    # todas las palabras de text, la última como prefijo para buscar mientras
+    # se escribe; de la más a la menos relevante
+    if table not in SEARCH_TABLES:
+        raise ValueError(f"Tabla sin búsqueda: {table}")
+    tokens = search_tokens(text)
+    if not tokens:
+        return []
+    terms = search_terms(tokens)
+    last = tokens[-1]
+    
+    conditions, params = filter_conditions(filters, columns, "t")
+    where = " AND ".join([f"{table}_fts MATCH ?", "t.usuario_id = ?"] + conditions)
+    joined = f"FROM {table}_fts AS f JOIN {table} AS t ON t.id = f.rowid WHERE {where}"
+    selected = ", ".join(f"t.{column}" for column in columns)
+    
+    def recent(match, keep=None):
+        # Las SEARCH_CANDIDATES coincidencias más recientes, de la descripción
+        # más corta a la más larga
+        rows = db_manager.fetch_all(
+            f"SELECT t.descripcion, t.id, {selected} {joined} ORDER BY f.rowid DESC LIMIT ?",
+            [match, user_id] + params + [SEARCH_CANDIDATES]
+        )
+        if keep:
+            rows = [row for row in rows if keep(row[0] or "")]
+        rows.sort(key=lambda row: (len(row[0] or ""), -row[1]))
+        return [row[2:] for row in rows[:limit]]
+    
+    if len(last) > SEARCH_PREFIX_INDEX:
+        # Un prefijo más largo que los indexados junta las listas de todas las
+        # palabras que empiezan así antes de dar la primera fila (más de
+        # 100 ms si es común). Si la palabra exacta ya es común se busca esa;
+        # si no, se recorre el prefijo indexado y se verifica el resto en
+        # Python, y solo si así no se llena la página se usa el prefijo largo
+        exact = terms[:-1] + [f'"{last}"']
+        if count_matches(db_manager, table, " ".join(exact)) > SEARCH_CANDIDATES:
+            terms = exact
+        else:
+            short = terms[:-1] + [f'"{last[:SEARCH_PREFIX_INDEX]}"*']
+            if count_matches(db_manager, table, " ".join(short)) > SEARCH_CANDIDATES:
+                rows = recent(" ".join(short),
+                              lambda description: any(word.startswith(last) for word in search_tokens(description)))
+                if len(rows) >= limit:
+                    return rows
+    
+    match = " ".join(terms)
+    if any(count_matches(db_manager, table, term) > SEARCH_CANDIDATES for term in terms):
+        return recent(match)
+    return db_manager.fetch_all(
+        f"SELECT {selected} {joined} ORDER BY f.rank, f.rowid DESC LIMIT ?",
+        [match, user_id] + params + [limit]
+    )
+
+# ====================== IMPORTACIÓN CSV ======================
+# Nombres de columna aceptados en los extractos bancarios (en minúsculas)
+CSV_COLUMN_ALIASES = {
+    "fecha": ("fecha", "date", "fecha operación", "fecha operacion", "fecha valor"),
+    "monto": ("monto", "importe", "amount", "valor", "cantidad"),
+    "descripcion": ("descripcion", "descripción", "concepto", "description", "detalle"),
+    "categoria": ("categoria", "categoría", "category", "tipo", "type"),
+}
+
+CSV_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d.%m.%Y", "%m/%d/%Y")
+
+# Sentencias de inserción por tabla destino
+CSV_IMPORT_QUERIES = {
+    "ingresos": "INSERT INTO ingresos (usuario_id, tipo, monto, fecha, descripcion) VALUES (?, ?, ?, ?, ?)",
+    "gastos": "INSERT INTO gastos (usuario_id, categoria, tipo, monto, fecha, descripcion) VALUES (?, ?, ?, ?, ?, ?)",
+}
+
+def normalize_date(value):
+    value = value.strip()
+    # Camino rápido para fechas con día y mes de dos dígitos
+    if len(value) == 10:
+        if value[4] in "-/":
+            year, month, day = value[0:4], value[5:7], value[8:10]
+        elif value[2] in "-/.":
+            day, month, year = value[0:2], value[3:5], value[6:10]
+        else:
+            year = month = day = ""
+        if (year + month + day).isdigit():
+            # date() rechaza los días que el mes no tiene (2026-02-30); si no
+            # vale como día/mes se prueban los formatos (p. ej. mes/día)
+            try:
+                return date(int(year), int(month), int(day)).isoformat()
+            except ValueError:
+                pass
+    for fmt in CSV_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+def to_cents(amount):
+    # Monto positivo y finito en centavos, o None
+    amount = abs(amount)
+    if not amount < float("inf"):
+        return None
+    return round(amount * 100) or None
+
+def normalize_amount(value):
+    # Devuelve el monto en centavos enteros
+    try:
+        return to_cents(float(value))
+    except ValueError:
+        pass
+    value = value.strip().replace("$", "").replace(" ", "").strip("()")
+    if "," in value and "." in value:
+        # El último separador es el decimal: "1.234,56" o "1,234.56"
+        if value.rfind(",") > value.rfind("."):
+            value = value.replace(".", "").replace(",", ".")
+        else:
+            value = value.replace(",", "")
+    elif "," in value:
+        head, _, tail = value.rpartition(",")
+        value = head.replace(",", "") + ("." if len(tail) <= 2 else "") + tail
+    try:
+        return to_cents(float(value))
+    except ValueError:
+        return None
+
+def read_csv_rows(csv_file):
+    sample = csv_file.read(4096)
+    csv_file.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(csv_file, dialect)
+    header = [name.strip().lower() for name in next(reader, [])]
+    columns = {}
+    for field, aliases in CSV_COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in header:
+                columns[field] = header.index(alias)
+                break
+    if "fecha" not in columns or "monto" not in columns:
+        raise csv.Error("El archivo debe tener columnas de fecha y monto")
+    width = max(columns.values()) + 1
+    for row in reader:
+        if len(row) < width:
+            yield None
+            continue
+        yield {field: row[index] for field, index in columns.items()}
+
+def normalize_rows(rows, table, user_id):
+    # Convierte cada fila en parámetros de inserción o None si no es válida
+    for row in rows:
+        if row is None:
+            yield None
+            continue
+        date = normalize_date(row["fecha"])
+        amount = normalize_amount(row["monto"])
+        if date is None or amount is None:
+            yield None
+            continue
+        category = row.get("categoria", "").strip() or "Otros"
+        description = row.get("descripcion", "").strip()
+        if table == "ingresos":
+            yield (user_id, category, amount, date, description)
+        else:
+            yield (user_id, category, "Variable", amount, date, description)
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def import_csv(db_manager, path, table, user_id, chunk_size=5000, progress=None):
+    # Todo el archivo en una transacción, con un savepoint por bloque: si
+    # falla a mitad no queda nada guardado y reintentar no duplica filas (el
+    # CSV no trae un identificador por movimiento como FITID). Mientras dura,
+    # otra conexión que quiera escribir espera o recibe "database is locked"
+    # (la interfaz lo avisa, ver warn_if_busy). El resumen y el índice de
+    # búsqueda se ponen al día una sola vez, al final (ver bulk_load)
+    query = CSV_IMPORT_QUERIES[table]
+    imported = skipped = 0
+    last_percent = -1
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as csv_file, db_manager.bulk_load([table]):
+        total_size = os.fstat(csv_file.fileno()).st_size or 1
+        rows = normalize_rows(read_csv_rows(csv_file), table, user_id)
+        for chunk in chunked(rows, chunk_size):
+            valid = [params for params in chunk if params is not None]
+            skipped += len(chunk) - len(valid)
+            if valid:
+                with db_manager.transaction():
+                    db_manager.execute_batch(query, valid)
+                imported += len(valid)
+            if progress:
+                # Posición aproximada: lo que el lector ya consumió del archivo
+                percent = min(100, csv_file.buffer.tell() * 100 // total_size)
+                if percent != last_percent:
+                    last_percent = percent
+                    progress(percent)
+    return imported, skipped
+
+# ====================== IMPORTACIÓN OFX/QIF ======================
+OFX_ACCOUNT_RE = re.compile(r"<ACCTID>([^<\r\n]*)", re.IGNORECASE)
+OFX_FIELD_RE = re.compile(r"<(TRNAMT|DTPOSTED|FITID|NAME|MEMO)>([^<\r\n]*)", re.IGNORECASE)
+
+STATEMENT_QUERIES = {
+    "ingresos": "INSERT OR IGNORE INTO ingresos (usuario_id, tipo, monto, fecha, descripcion, hash_importacion) VALUES (?, ?, ?, ?, ?, ?)",
+    "gastos": "INSERT OR IGNORE INTO gastos (usuario_id, categoria, tipo, monto, fecha, descripcion, hash_importacion) VALUES (?, ?, ?, ?, ?, ?, ?)",
+}
+
+def normalize_ofx_date(value):
+    # DTPOSTED empieza por AAAAMMDD (lo sigue la hora, opcional). Una fecha
+    # truncada o imposible (20250230) es None: el movimiento se omite
+    value = value[:8]
+    if len(value) != 8 or not value.isdigit():
+        return None
+    try:
+        return date(int(value[:4]), int(value[4:6]), int(value[6:])).isoformat()
+    except ValueError:
+        return None
+
+def read_ofx_transactions(ofx_file):
+    # Lee el archivo por bloques y entrega cada <STMTTRN> completo
+    account = ""
+    buffer = ""
+    for chunk in iter(lambda: ofx_file.read(65536), ""):
+        buffer += chunk
+        position = 0
+        while True:
+            start = buffer.find("<STMTTRN>", position)
+            end = buffer.find("</STMTTRN>", start) if start >= 0 else -1
+            if end < 0:
+                break
+            for match in OFX_ACCOUNT_RE.finditer(buffer, position, start):
+                account = match.group(1).strip()
+            fields = {name.upper(): value.strip() for name, value in OFX_FIELD_RE.findall(buffer, start, end)}
+            position = end + len("</STMTTRN>")
+            yield {
+                "cuenta": account,
+                "fecha": normalize_ofx_date(fields.get("DTPOSTED", "")),
+                "monto": fields.get("TRNAMT", ""),
+                "descripcion": fields.get("NAME") or fields.get("MEMO", ""),
+                "categoria": "",
+                "fitid": fields.get("FITID", ""),
+            }
+        for match in OFX_ACCOUNT_RE.finditer(buffer, position, start if start >= 0 else len(buffer)):
+            account = match.group(1).strip()
+        # Se conserva la transacción a medio leer o la cola por si corta una etiqueta
+        buffer = buffer[start:] if start >= 0 else buffer[-64:]
+
+def normalize_qif_date(value):
+    parts = re.split(r"[/\-.']", value.strip())
+    if len(parts) != 3 or not all(part.strip().isdigit() for part in parts):
+        return None
+    first, second, year = (int(part) for part in parts)
+    if len(parts[0]) == 4:
+        year, first, second = first, second, year
+    elif year < 100:
+        year += 2000
+    # Quicken usa mes/día; si el primer número no puede ser mes, es día/mes
+    month, day = (second, first) if first > 12 else (first, second)
+    try:
+        return datetime(year, month, day).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+def read_qif_transactions(qif_file):
+    account = ""
+    record = {}
+    in_account = False
+    for line in qif_file:
+        line = line.rstrip("\r\n")
+        if not line:
+            continue
+        code, value = line[0], line[1:].strip()
+        if code == "!":
+            in_account = value.lower() == "account"
+            continue
+        if code == "^":
+            if in_account:
+                in_account = False
+            elif record:
+                yield {
+                    "cuenta": account,
+                    "fecha": normalize_qif_date(record.get("D", "")),
+                    "monto": record.get("T") or record.get("U", ""),
+                    "descripcion": record.get("P") or record.get("M", ""),
+                    "categoria": record.get("L", ""),
+                    "fitid": "",
+                }
+            record = {}
+        elif in_account:
+            if code == "N":
+                account = value
+        else:
+            record[code] = value
+
+def transaction_hash(user_id, transaction, amount, occurrence):
+    # FITID identifica el movimiento en OFX; en QIF se usa el contenido normalizado
+    if transaction["fitid"]:
+        key = f"{user_id}|{transaction['cuenta']}|fitid|{transaction['fitid']}"
+    else:
+        description = " ".join(transaction["descripcion"].lower().split())
+        # Mismo texto que cuando los montos eran float, para no duplicar reimportaciones
+        key = f"{user_id}|{transaction['cuenta']}|{transaction['fecha']}|{amount / 100:.2f}|{description}|{occurrence}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def statement_rows(transactions, user_id):
+    # Devuelve (tabla, parámetros) o None para los movimientos inválidos
+    occurrences = {}
+    for transaction in transactions:
+        amount = normalize_amount(transaction["monto"].lstrip("+"))
+        if transaction["fecha"] is None or amount is None:
+            yield None
+            continue
+        signed = -amount if transaction["monto"].strip().startswith(("-", "(")) else amount
+        # Movimientos idénticos en el mismo extracto se distinguen por su orden
+        content = (transaction["cuenta"], transaction["fecha"], signed, transaction["descripcion"])
+        occurrence = occurrences.get(content, 0)
+        occurrences[content] = occurrence + 1
+        row_hash = transaction_hash(user_id, transaction, signed, occurrence)
+        category = transaction["categoria"] or "Otros"
+        description = transaction["descripcion"]
+        if signed > 0:
+            yield "ingresos", (user_id, category, amount, transaction["fecha"], description, row_hash)
+        else:
+            yield "gastos", (user_id, category, "Variable", amount, transaction["fecha"], description, row_hash)
+
+def import_statement(db_manager, path, user_id, chunk_size=1000, progress=None):
+    inserted = skipped = 0
+    last_percent = -1
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as statement_file, db_manager.bulk_load(SEARCH_TABLES):
+        total_size = os.fstat(statement_file.fileno()).st_size or 1
+        header = statement_file.read(512)
+        statement_file.seek(0)
+        if "<OFX" in header.upper() or path.lower().endswith((".ofx", ".qfx")):
+            transactions = read_ofx_transactions(statement_file)
+        else:
+            transactions = read_qif_transactions(statement_file)
+        rows = statement_rows(transactions, user_id)
+        # Una transacción con un savepoint por bloque y la carga masiva, como en import_csv
+        for chunk in chunked(rows, chunk_size):
+            batches = {"ingresos": [], "gastos": []}
+            for row in chunk:
+                if row is None:
+                    skipped += 1
+                else:
+                    batches[row[0]].append(row[1])
+            with db_manager.transaction():
+                for table, params in batches.items():
+                    if params:
+                        # rowcount no incluye las filas que escriben los triggers
+                        added = db_manager.execute_batch(STATEMENT_QUERIES[table], params).rowcount
+                        inserted += added
+                        skipped += len(params) - added
+            if progress:
+                percent = min(100, statement_file.buffer.tell() * 100 // total_size)
+                if percent != last_percent:
+                    last_percent = percent
+                    progress(percent)
+    return inserted, skipped
+
+def import_file(db_manager, path, table, user_id, progress=None):
+    # Los extractos OFX/QIF reparten cada movimiento en ingresos o gastos según su signo
+    if path.lower().endswith((".ofx", ".qfx", ".qif")):
+        return import_statement(db_manager, path, user_id, progress=progress)
+    return import_csv(db_manager, path, table, user_id, progress=progress)
+
+# ====================== MANTENIMIENTO ======================
+def rebuild_aggregates(db_manager):
+    # Recalcula desde cero lo que mantienen los triggers: el resumen mensual,
+    # el contador de notificaciones sin leer y el índice de búsqueda
+    db_manager.rebuild_monthly_summary()
+    with db_manager.transaction():
+        for table in SEARCH_TABLES:
+            db_manager.execute_query(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+        db_manager.execute_query("UPDATE estado_notificaciones SET no_leidas = 0")
+        db_manager.execute_query(
+            "INSERT INTO estado_notificaciones (usuario_id, no_leidas) "
+            "SELECT usuario_id, COUNT(*) FROM notificaciones WHERE leida = 0 GROUP BY usuario_id "
+            "ON CONFLICT (usuario_id) DO UPDATE SET no_leidas = excluded.no_leidas"
+        )
+
+def create_sample_data(db_manager, user_id):
+    # Si el usuario ya existe no hay nada que crear (consulta por clave primaria)
+    user_exists = db_manager.fetch_one(
+        "SELECT EXISTS(SELECT 1 FROM usuarios WHERE id = ?)", (user_id,)
+    )[0]
+    
+    if not user_exists:
+        today = datetime.now().date()
+        
+        with db_manager.transaction():
+            # Usuario por defecto
+            db_manager.execute_query(
+                "INSERT OR IGNORE INTO usuarios (id, nombre, email) VALUES (?, ?, ?)",
+                (user_id, "Usuario Demo", "demo@finanzas.com")
+            )
+            
+            # Sueldo y alquiler de muestra: mensuales desde hoy
+            db_manager.execute_batch(
+                "INSERT INTO recurrencias (usuario_id, movimiento, categoria, tipo, monto, descripcion, "
+                "frecuencia, fecha_inicio) VALUES (?, ?, ?, ?, ?, ?, 'mensual', ?)",
+                [(user_id, "ingreso", "Sueldo", None, 250000, "Salario mensual", today.strftime("%Y-%m-%d")),
+                 (user_id, "gasto", "Vivienda", "Fijo", 80000, "Alquiler", today.strftime("%Y-%m-%d"))]
+            )
+            
+            # Objetivos de muestra
+            db_manager.execute_query(
+                "INSERT INTO objetivos (usuario_id, titulo, tipo, monto_actual, meta, fecha_creacion, fecha_meta) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_id, "Fondo Emergencia", "Emergencia", 50000, 500000,
+                 today.strftime("%Y-%m-%d"), (today + timedelta(days=180)).strftime("%Y-%m-%d"))
+            )
+
+# ====================== EXPORTACIÓN ======================
+# Exportación en streaming: el cursor entrega lotes con fetchmany y cada lote
+# se escribe antes de pedir el siguiente, así la memoria no depende de la
+# cantidad de filas. SQLite arma cada línea completa (printf o json_object)
+# y Python solo une y escribe cadenas, sin crear un objeto por campo
+EXPORT_COLUMNS = {
+    "ingresos": ("id", "tipo", "monto", "fecha", "descripcion"),
+    "gastos": ("id", "categoria", "tipo", "monto", "fecha", "descripcion"),
+    "objetivos": ("id", "titulo", "tipo", "monto_actual", "meta", "fecha_creacion", "fecha_meta", "completado"),
+    "deudas": ("id", "nombre", "tipo", "monto_inicial", "monto_actual", "tasa_interes", "pago_minimo",
+               "fecha_inicio", "fecha_pago"),
+}
+EXPORT_MONEY_COLUMNS = {"monto", "monto_actual", "monto_inicial", "meta", "pago_minimo"}
+EXPORT_TEXT_COLUMNS = {"tipo", "categoria", "descripcion", "titulo", "nombre"}
+# Columna de fecha (filtro por rango y orden de salida) y de categoría de cada tabla
+EXPORT_DATE_COLUMNS = {"ingresos": "fecha", "gastos": "fecha", "objetivos": "fecha_meta", "deudas": "fecha_pago"}
+EXPORT_CATEGORY_COLUMNS = {"ingresos": "tipo", "gastos": "categoria", "objetivos": "tipo", "deudas": "tipo"}
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_BATCH_SIZE = 5000
+EXPORT_GZIP_LEVEL = 1       # los niveles altos comprimen poco más y son varias veces más lentos
+
+def csv_field(column):
+    # (formato de printf, expresión) de un campo CSV: montos con dos
+    # decimales, textos entre comillas con %w (duplica las comillas internas)
+    # y NULL como vacío
+    if column in EXPORT_MONEY_COLUMNS:
+        return "%s", f"iif({column} IS NULL, '', printf('%.2f', {column} / 100.0))"
+    if column in EXPORT_TEXT_COLUMNS:
+        return '"%w"', f"coalesce({column}, '')"
+    return "%s", column
+
+def export_query(table, user_id, export_format="csv", filters=None, search=None):
+    # filters como en filter_conditions; search, el texto de la búsqueda en
+    # descripciones (solo las tablas de SEARCH_TABLES)
+    columns = EXPORT_COLUMNS[table]
+    if export_format == "jsonl":
+        # En JSON los montos quedan en centavos enteros, como en la base
+        line = "json_object(" + ", ".join(f"'{column}', {column}" for column in columns) + ")"
+    else:
+        # Un único printf por fila: concatenar campo por campo cuesta el doble
+        fields = [csv_field(column) for column in columns]
+        line = f"printf('{','.join(fmt for fmt, _ in fields)}', {', '.join(value for _, value in fields)})"
+    conditions, params = filter_conditions(filters, columns)
+    match = search_match(search) if search else None
+    if match:
+        if table not in SEARCH_TABLES:
+            raise ValueError(f"Tabla sin búsqueda: {table}")
+        conditions.append(f"id IN (SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)")
+        params.append(match)
+    where = " AND ".join(["usuario_id = ?"] + conditions)
+    params = [user_id] + params
+    if len(params) > 1:
+        # Con filtros se sigue un índice (usuario_id, [categoría,] fecha, ...):
+        # sale por fecha y solo se ordenan por id las filas de un mismo día
+        return f"SELECT {line} FROM {table} WHERE {where} ORDER BY {EXPORT_DATE_COLUMNS[table]}, id", params
+    # Sin filtros, lectura secuencial de la tabla en orden de id: ordenar por
+    # fecha costaría una búsqueda en la tabla por cada fila del índice
+    return f"SELECT {line} FROM {table} NOT INDEXED WHERE {where} ORDER BY id", params
+
+def export_batches(db_manager, table, user_id, export_format="csv", filters=None, batch_size=EXPORT_BATCH_SIZE,
+                   search=None):
+    query, params = export_query(table, user_id, export_format, filters, search)
+    cursor = db_manager.connection.execute(query, params)
+    try:
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            yield batch
+    finally:
+        cursor.close()
+
+def open_export(path, compress=None):
+    # Archivo de texto de salida; se comprime con gzip si termina en .gz
+    if compress is None:
+        compress = path.lower().endswith(".gz")
+    if compress:
+        import gzip  # solo al exportar comprimido, para no cargarlo en cada arranque
+        return gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=EXPORT_GZIP_LEVEL)
+    return open(path, "w", encoding="utf-8", newline="")
+
+def export_format_for(path):
+    name = path.lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return "jsonl" if name.endswith((".jsonl", ".json", ".ndjson")) else "csv"
+
+def export_table(db_manager, table, user_id, output, export_format="csv", filters=None, progress=None,
+                 search=None):
+    # Escribe en `output` (archivo de texto ya abierto) y devuelve cuántas
+    # filas exportó; progress recibe la cantidad acumulada después de cada lote
+    count = 0
+    if export_format == "csv":
+        output.write(",".join(EXPORT_COLUMNS[table]) + "\n")
+    for batch in export_batches(db_manager, table, user_id, export_format, filters, search=search):
+        output.write("\n".join([row[0] for row in batch]) + "\n")
+        count += len(batch)
+        if progress:
+            progress(count)
+    return count
+
+def export_file(db_manager, path, table, user_id, filters=None, progress=None, search=None):
+    # Formato y compresión según la extensión: .csv, .jsonl, .csv.gz, .jsonl.gz
+    with open_export(path) as output:
+        return export_table(db_manager, table, user_id, output, export_format_for(path), filters, progress, search)
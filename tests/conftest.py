@@ -0,0 +1,61 @@
+import importlib.util
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from finanzas_servicios import DatabaseManager
+
+@pytest.fixture
+def db(tmp_path):
+    # Base en archivo (no :memory:): WAL, caché por archivo y conexiones de
+    # solo lectura se comportan como en la aplicación
+    db_manager = DatabaseManager(str(tmp_path / "finanzas.db"))
+    db_manager.execute_query("INSERT INTO usuarios (id, nombre, email) VALUES (1, 'Prueba', 'prueba@ejemplo.com')")
+    yield db_manager
+    db_manager.close()
+
+@pytest.fixture(scope="session")
+def app():
+    # La interfaz (.py) solo si PyQt5 está instalado; sin pantalla
+    pytest.importorskip("PyQt5.QtWidgets")
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    spec = importlib.util.spec_from_file_location("finanzas_app", ROOT / ".py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(scope="session")
+def qapp(app):
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
+
+@pytest.fixture
+def wait_until(qapp):
+    # Procesa eventos de Qt hasta que condition() se cumpla o pase el tiempo
+    def wait(condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            qapp.processEvents()
+            time.sleep(0.005)
+        return condition()
+    return wait
+
+# Columnas (todas, ordenables) de los modelos paginados de cada pestaña
+TABLE_MODELS = {
+    "ingresos": (["id", "tipo", "monto", "fecha", "descripcion"], ["id", "tipo", "monto", "fecha"]),
+    "gastos": (["id", "categoria", "tipo", "monto", "fecha", "descripcion"], ["id", "categoria", "tipo", "monto", "fecha"]),
+}
+
+@pytest.fixture
+def table_model(app, db):
+    def build(table, **options):
+        columns, sortable = TABLE_MODELS[table]
+        return app.PagedTableModel(db, table, columns, columns, 1, sortable_columns=sortable,
+                                   secondary_sort="fecha", **options)
+    return build
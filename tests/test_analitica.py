@@ -0,0 +1,18 @@
+from datetime import date
+
+import pytest
+
+analytics = pytest.importorskip("finanzas_analitica")
+
+def test_overdue_debt_uses_default_term(db):
+    # Una deuda con la fecha de pago vencida no exige todo el saldo en un mes:
+    # se reparte en el plazo por defecto, igual que una deuda sin fecha
+    db.execute_query(
+        "INSERT INTO deudas (usuario_id, nombre, tipo, monto_inicial, monto_actual, tasa_interes, fecha_pago) VALUES "
+        "(1, 'Vencida', 'Préstamo', 600000, 600000, 0, '2020-01-15'), "
+        "(1, 'Sin fecha', 'Préstamo', 600000, 600000, 0, NULL), "
+        "(1, 'Vigente', 'Préstamo', 600000, 600000, 0, '2025-01-15')"
+    )
+    debts = analytics.load_debts(db, 1, today=date(2024, 7, 1))
+    expected = -(-600000 // analytics.DEFAULT_DEBT_TERM)
+    assert debts.minimums.tolist() == [expected, expected, 100000]
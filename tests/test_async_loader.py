@@ -0,0 +1,15 @@
+def failing_job(db_manager):
+    raise ValueError("datos inválidos")
+
+def test_any_worker_error_is_reported_and_frees_the_loader(app, db, wait_until):
+    # Un error que no es de SQLite (ValueError, NumPy...) también llega a
+    # on_error, y el cargador acepta y entrega las peticiones siguientes
+    loader = app.AsyncLoader(db)
+    errors, results = [], []
+    loader.request(failing_job, results.append, errors.append)
+    assert wait_until(lambda: errors)
+    assert errors == ["datos inválidos"] and not loader.is_busy()
+
+    loader.request(lambda db_manager: db_manager.fetch_one("SELECT COUNT(*) FROM usuarios")[0], results.append, errors.append)
+    assert wait_until(lambda: results)
+    assert results == [1] and not loader.is_busy()
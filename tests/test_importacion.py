@@ -0,0 +1,108 @@
+import pytest
+
+from finanzas_servicios import import_csv, import_file, load_dashboard_summary, normalize_date
+
+# ====================== CSV ======================
+@pytest.mark.parametrize("value, expected", [
+    ("2026-02-28", "2026-02-28"),
+    ("2024-02-29", "2024-02-29"),
+    ("29/02/2024", "2024-02-29"),
+    ("02/13/2025", "2025-02-13"),      # mes/día: no vale como día/mes
+    ("2026-02-30", None),
+    ("31/02/2026", None),
+    ("2025-04-31", None),
+    ("2025-13-01", None),
+    ("00/01/2025", None),
+])
+def test_normalize_date_rejects_impossible_days(value, expected):
+    assert normalize_date(value) == expected
+
+def test_failed_csv_import_saves_nothing_and_can_be_retried(db, tmp_path):
+    # Un error a mitad del archivo deshace también los bloques ya insertados:
+    # reintentar no duplica filas ni cuenta dos veces en el resumen
+    path = tmp_path / "gastos.csv"
+    lines = ["fecha,monto,categoria,descripcion"]
+    lines += [f"2025-01-{day % 28 + 1:02d},{day % 90 + 1}.50,Comida,fila {day}" for day in range(3000)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    calls = []
+    def failing_progress(percent):
+        calls.append(percent)
+        if len(calls) == 3:
+            raise OSError("disco desconectado")
+    with pytest.raises(OSError):
+        import_csv(db, str(path), "gastos", 1, chunk_size=500, progress=failing_progress)
+    assert db.fetch_one("SELECT COUNT(*) FROM gastos")[0] == 0
+    assert db.fetch_all("SELECT * FROM resumen_mensual") == []
+    assert import_csv(db, str(path), "gastos", 1, chunk_size=500) == (3000, 0)
+    assert db.fetch_one("SELECT COUNT(*) FROM gastos")[0] == 3000
+    assert db.fetch_one("SELECT SUM(cantidad) FROM resumen_mensual")[0] == 3000
+
+# ====================== EXTRACTOS OFX/QIF ======================
+OFX_STATEMENT = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKACCTFROM><ACCTID>ES12-3456</BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250105<TRNAMT>-42.50<FITID>A1<NAME>Farmacia</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20250131<TRNAMT>2500.00<FITID>A2<NAME>Nómina</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250201<TRNAMT>-42.50<FITID>A3<NAME>Farmacia</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+QIF_STATEMENT = """!Type:Bank
+D01/05/2025
+T-12.00
+PCafé
+^
+D01/05/2025
+T-12.00
+PCafé
+^
+D01/06/2025
+T1,200.00
+PTransferencia
+^
+"""
+
+def test_statement_import_is_idempotent(db, tmp_path):
+    ofx = tmp_path / "extracto.ofx"
+    ofx.write_text(OFX_STATEMENT, encoding="utf-8")
+    assert import_file(db, str(ofx), "gastos", 1) == (3, 0)
+    assert import_file(db, str(ofx), "gastos", 1) == (0, 3)
+    assert db.fetch_one("SELECT COUNT(*), SUM(monto) FROM gastos") == (2, 8500)
+    assert db.fetch_one("SELECT COUNT(*), SUM(monto) FROM ingresos") == (1, 250000)
+    
+    # En QIF no hay FITID: dos movimientos iguales del mismo extracto se
+    # distinguen por su orden y reimportar no los duplica
+    qif = tmp_path / "extracto.qif"
+    qif.write_text(QIF_STATEMENT, encoding="utf-8")
+    assert import_file(db, str(qif), "gastos", 1) == (3, 0)
+    assert import_file(db, str(qif), "gastos", 1) == (0, 3)
+    assert db.fetch_one("SELECT COUNT(*) FROM gastos WHERE descripcion = 'Café'")[0] == 2
+    # Los triggers del resumen contaron cada fila una sola vez
+    assert db.fetch_one("SELECT SUM(cantidad) FROM resumen_mensual")[0] == 6
+
+OFX_BAD_DATES = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKACCTFROM><ACCTID>ES12-3456</BANKACCTFROM>
+<BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250230<TRNAMT>-10.00<FITID>B1<NAME>Día imposible</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>202503<TRNAMT>-20.00<FITID>B2<NAME>Fecha truncada</STMTTRN>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20250310120000[-3:ART]<TRNAMT>-30.00<FITID>B3<NAME>Con hora</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+def import_bad_dates(db_manager, tmp_path):
+    ofx = tmp_path / "extracto.ofx"
+    ofx.write_text(OFX_BAD_DATES, encoding="utf-8")
+    return import_file(db_manager, str(ofx), "gastos", 1)
+
+def test_ofx_rows_with_impossible_dates_are_skipped(db, tmp_path):
+    # Una fecha imposible o truncada no llega a la base ni al resumen mensual
+    assert import_bad_dates(db, tmp_path) == (1, 2)
+    assert db.fetch_all("SELECT fecha, monto FROM gastos") == [("2025-03-10", 3000)]
+    assert db.fetch_all("SELECT mes FROM resumen_mensual") == [("2025-03",)]
+    assert load_dashboard_summary(db, 1).total_expense == 3000
+
+def test_trends_load_after_ofx_import(db, tmp_path):
+    # Las fechas de 10 caracteres son las que decodifica la carga columnar
+    analytics = pytest.importorskip("finanzas_analitica")
+    import_bad_dates(db, tmp_path)
+    assert analytics.load_columns(db, 1, "gastos").cents.tolist() == [3000]
@@ -0,0 +1,160 @@
+import random
+import threading
+from datetime import date
+
+import pytest
+
+from finanzas_servicios import load_dashboard_summary, materialize_recurrences
+
+@pytest.fixture
+def window(app, qapp, tmp_path):
+    window = app.FinancialDashboard("light", str(tmp_path / "finanzas.db"))
+    yield window
+    app.apply_theme(qapp, "light")
+    window.recurrence_timer.stop()
+    window.close_user()
+    window.directory.close()
+
+def test_theme_change_repaints_every_chart(app, window):
+    # También los gráficos de las pestañas que no son el dashboard (plan de
+    # deudas) y los que solo existen con NumPy (tendencia)
+    pytest.importorskip("numpy")
+    dashboard, debts = window.dashboard_tab, window.debts_tab
+    charts = [dashboard.chart, dashboard.bar_chart, dashboard.trend_chart, debts.plan_chart]
+    axes = [dashboard.axis_y, dashboard.trend_axis_y, debts.plan_axis_x, debts.plan_axis_y]
+    for theme in ("dark", "light"):
+        window.set_theme(theme)
+        colors = app.THEMES[theme]
+        for chart in charts:
+            assert chart.backgroundBrush().color().name() == colors["surface"]
+            assert chart.legend().labelColor().name() == colors["text"]
+        for axis in axes:
+            assert axis.labelsBrush().color().name() == colors["text"]
+            assert axis.titleBrush().color().name() == colors["text"]
+
+def test_widget_benchmark_compares_against_per_instance_styles(app, qapp):
+    # El modo "por widget" reproduce las hojas chicas que cada tarjeta y
+    # botón tenían antes, no la hoja completa de la aplicación repetida
+    card, button = app.CardWidget("Tarjeta", "$0", "danger"), app.ModernButton("Botón", color="danger")
+    app.apply_legacy_styles(card, button, "danger")
+    color = app.THEMES["light"]["danger"]
+    assert card.lbl_value.styleSheet() == f"color: {color};"
+    assert f"background-color: {color};" in button.styleSheet()
+    assert len(card.styleSheet()) < len(app.stylesheet_for("light")) // 4
+    assert set(app.benchmark_widgets(count=3)) == {"compartida", "por widget"}
+
+def test_recurrences_materialize_off_the_gui_thread(app, window, monkeypatch, wait_until):
+    # La generación corre en el QThreadPool y, al terminar, avisa a las vistas
+    # para que recarguen los movimientos nuevos
+    threads = []
+    def materialize(db_manager, user_id=None, today=None):
+        threads.append(threading.get_ident())
+        return materialize_recurrences(db_manager, user_id, today)
+    monkeypatch.setattr(app, "materialize_recurrences", materialize)
+    # La generación que lanzó open_user termina antes de crear la regla
+    assert wait_until(lambda: not window.recurrence_loader.is_busy())
+    events = []
+    window.db_manager.subscribe(lambda event: events.append(event.table))
+    window.db_manager.insert("recurrencias", {
+        "usuario_id": window.user_id, "movimiento": "gasto", "categoria": "Vivienda", "tipo": "Fijo",
+        "monto": 50000, "descripcion": "Alquiler", "frecuencia": "mensual", "intervalo": 1,
+        "fecha_inicio": "2024-01-01",
+    })
+    events.clear()
+    window.materialize_pending()
+    assert wait_until(lambda: "gastos" in events)
+    assert threads and threading.get_ident() not in threads
+    count = window.db_manager.fetch_one(
+        "SELECT COUNT(*) FROM gastos WHERE recurrencia_id IS NOT NULL AND descripcion = 'Alquiler'")[0]
+    assert count > 0
+
+class RecordingRenderer:
+    def __init__(self):
+        self.summaries = {}
+    
+    def render(self, summary, currency, prefix):
+        self.summaries[prefix[-7:]] = summary
+        return []
+
+def test_dashboard_snapshots_only_count_up_to_their_month(app, db, tmp_path):
+    # El dashboard de febrero no incluye los movimientos de marzo en los
+    # totales ni en la torta
+    db.execute_batch(
+        "INSERT INTO gastos (usuario_id, categoria, tipo, monto, fecha, descripcion) VALUES (1, ?, 'Variable', ?, ?, '')",
+        [("Comida", 1000, "2024-02-10"), ("Comida", 2000, "2024-03-05"), ("Salud", 500, "2024-03-20")]
+    )
+    db.execute_query(
+        "INSERT INTO ingresos (usuario_id, tipo, monto, fecha, descripcion) VALUES (1, 'Salario', 9000, '2024-03-01', '')"
+    )
+    renderer = RecordingRenderer()
+    app.render_dashboards(db, str(tmp_path), months=3, snapshots=2, today=date(2024, 3, 31), renderer=renderer)
+    february, march = renderer.summaries["2024-02"], renderer.summaries["2024-03"]
+    assert (february.total_income, february.total_expense) == (0, 1000)
+    assert february.expense_by_category == [("Comida", 1000)]
+    assert (march.total_income, march.total_expense) == (9000, 3500)
+    assert march.expense_by_category == [("Comida", 3000), ("Salud", 500)]
+
+def test_dated_snapshot_labels_balances_as_current(app, qapp, db):
+    # Ahorros y patrimonio no tienen historia: al cierre de un mes pasado
+    # las tarjetas aclaran que son los saldos de hoy
+    pytest.importorskip("PyQt5.QtChart")
+    db.execute_query(
+        "INSERT INTO objetivos (usuario_id, titulo, tipo, monto_actual, meta) VALUES (1, 'Viaje', 'Viaje', 40000, 90000)"
+    )
+    renderer = app.ChartRenderer()
+    titles = lambda: [card.lbl_title.text() for card in renderer.cards[2:]]
+    renderer.show_summary(load_dashboard_summary(db, 1, 3, date(2024, 2, 1), until="2024-02"), "$")
+    assert titles() == ["Ahorros (saldo actual)", "Patrimonio Neto (saldo actual)"]
+    assert renderer.cards[2].lbl_value.text() == "$400.00"
+    renderer.show_summary(load_dashboard_summary(db, 1, 3, date(2024, 2, 1)), "$")
+    assert titles() == ["Ahorros", "Patrimonio Neto"]
+
+def broken_importer(db_manager, path, table, user_id, progress=None):
+    raise KeyError("fecha")
+
+def broken_exporter(db_manager, path, table, user_id, filters=None, progress=None, search=None):
+    raise RuntimeError("disco lleno")
+
+@pytest.mark.parametrize("start, button, patched", [
+    ("start_import", "btn_import", ("import_file", broken_importer)),
+    ("start_export", "btn_export", ("export_file", broken_exporter)),
+])
+def test_failed_transfer_reenables_its_button(app, window, monkeypatch, wait_until, tmp_path, start, button, patched):
+    # Un error que no es de archivo ni de SQLite también llega a failed: el
+    # botón vuelve a habilitarse y la barra de progreso se oculta
+    path = str(tmp_path / "extracto.csv")
+    monkeypatch.setattr(app.QFileDialog, "getOpenFileName", lambda *args: (path, ""))
+    monkeypatch.setattr(app.QFileDialog, "getSaveFileName", lambda *args: (path, ""))
+    warnings = []
+    monkeypatch.setattr(app.QMessageBox, "warning", lambda parent, title, text: warnings.append(text))
+    monkeypatch.setattr(app, *patched)
+    tab = window.expenses_tab
+    getattr(app, start)(tab, "gastos")
+    assert not getattr(tab, button).isEnabled()
+    assert wait_until(lambda: warnings)
+    assert getattr(tab, button).isEnabled() and not tab.import_progress.isVisible()
+    assert warnings[0].split("\n")[0] in ("'fecha'", "disco lleno")
+
+@pytest.mark.parametrize("sort_column", ["fecha", "monto", "categoria", "id"])
+@pytest.mark.parametrize("descending", [True, False])
+def test_keyset_pages_cover_every_row_once(db, table_model, sort_column, descending):
+    # Muchos empates en fecha, monto y categoría: las páginas deben seguir el
+    # desempate (columna secundaria, id) sin repetir ni saltear filas
+    random.seed(3)
+    db.execute_batch(
+        "INSERT INTO gastos (usuario_id, categoria, tipo, monto, fecha) VALUES (?, ?, 'Variable', ?, ?)",
+        [(random.choice((1, 1, 1, 2)), random.choice(("Salud", "Otros")), random.choice((100, 250, 999)),
+          f"2025-0{random.randint(1, 3)}-0{random.randint(1, 4)}") for _ in range(500)]
+    )
+    model = table_model("gastos", sort_column=sort_column, descending=descending, page_size=7)
+    while True:
+        query, params = model.page_query(model.last_key())
+        page = db.fetch_all(query, params)
+        model.rows.extend(page)
+        if len(page) < model.page_size:
+            break
+    expected = db.fetch_all(
+        "SELECT id FROM gastos WHERE usuario_id = 1 ORDER BY "
+        + ", ".join(f"{column} {'DESC' if descending else 'ASC'}" for column in model.order_columns())
+    )
+    assert [row[0] for row in model.rows] == [row[0] for row in expected]
@@ -0,0 +1,158 @@
+import sqlite3
+
+import pytest
+
+from finanzas_servicios import (
+    MIGRATIONS, DatabaseManager, load_dashboard_summary, load_open_goals, generate_notifications,
+    load_notifications, materialize_recurrences, export_query, search_transactions
+)
+
+# ====================== PLANES DE CONSULTA ======================
+# Las consultas frecuentes se capturan con el trace de sqlite3 (ya con los
+# parámetros expandidos) mientras corren las funciones reales, así el test no
+# repite el SQL y no puede quedar desfasado
+def traced_plans(db_manager, call):
+    statements = []
+    db_manager.connection.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        db_manager.connection.set_trace_callback(None)
+    plans = {}
+    for statement in statements:
+        # Las consultas internas de FTS5 nombran el esquema entre comillas
+        if statement.lstrip().upper().startswith("SELECT") and "'main'." not in statement:
+            plans[statement] = [row[3] for row in db_manager.connection.execute("EXPLAIN QUERY PLAN " + statement)]
+    assert plans, "no se capturó ninguna consulta"
+    return plans
+
+def explain(db_manager, query, params=()):
+    return [row[3] for row in db_manager.connection.execute("EXPLAIN QUERY PLAN " + query, params)]
+
+def full_scans(plan):
+    # Recorridos completos de una tabla; los de FTS5, subconsultas y filas
+    # constantes no recorren datos de la base
+    return [detail for detail in plan if detail.startswith("SCAN ")
+            and not any(part in detail for part in ("VIRTUAL TABLE", "CONSTANT ROW", "(subquery"))]
+
+def assert_indexed(plans, *indexes):
+    details = [detail for plan in plans.values() for detail in plan]
+    for statement, plan in plans.items():
+        assert not full_scans(plan), f"{statement}\n{plan}"
+    for index in indexes:
+        assert any(index in detail for detail in details), f"{index} no aparece en\n{details}"
+
+# ====================== MIGRACIONES ======================
+# Esquema de la primera versión, sin índices ni user_version
+LEGACY_SCHEMA = """
+CREATE TABLE usuarios (id INTEGER PRIMARY KEY, nombre TEXT NOT NULL, email TEXT UNIQUE NOT NULL, moneda TEXT DEFAULT '$');
+CREATE TABLE ingresos (id INTEGER PRIMARY KEY, usuario_id INTEGER NOT NULL, tipo TEXT NOT NULL,
+                       monto REAL NOT NULL, fecha DATE NOT NULL, descripcion TEXT);
+CREATE TABLE gastos (id INTEGER PRIMARY KEY, usuario_id INTEGER NOT NULL, categoria TEXT NOT NULL, tipo TEXT NOT NULL,
+                     monto REAL NOT NULL, fecha DATE NOT NULL, descripcion TEXT);
+CREATE TABLE deudas (id INTEGER PRIMARY KEY, usuario_id INTEGER NOT NULL, nombre TEXT NOT NULL, tipo TEXT NOT NULL,
+                     monto_inicial REAL NOT NULL, monto_actual REAL NOT NULL, tasa_interes REAL,
+                     fecha_inicio DATE, fecha_pago DATE);
+CREATE TABLE objetivos (id INTEGER PRIMARY KEY, usuario_id INTEGER NOT NULL, titulo TEXT NOT NULL, tipo TEXT NOT NULL,
+                        monto_actual REAL DEFAULT 0, meta REAL, fecha_creacion DATE, fecha_meta DATE,
+                        completado BOOLEAN DEFAULT 0);
+CREATE TABLE notificaciones (id INTEGER PRIMARY KEY, usuario_id INTEGER NOT NULL, titulo TEXT NOT NULL,
+                             mensaje TEXT NOT NULL, fecha DATE NOT NULL, leida BOOLEAN DEFAULT 0);
+INSERT INTO usuarios (id, nombre, email) VALUES (1, 'Prueba', 'prueba@ejemplo.com');
+INSERT INTO ingresos (usuario_id, tipo, monto, fecha, descripcion) VALUES (1, 'Salario', 1500.5, '2024-03-01', 'Marzo');
+INSERT INTO gastos (usuario_id, categoria, tipo, monto, fecha, descripcion) VALUES (1, 'Salud', 'Variable', 12.25, '2024-03-05', '');
+"""
+
+DATE_RANGE_INDEXES = {"ingresos": "idx_ingresos_usuario_fecha", "gastos": "idx_gastos_usuario_fecha_categoria"}
+
+def test_legacy_database_migrates_to_latest_version(tmp_path):
+    # Una base de la primera versión se actualiza de una vez, conserva sus
+    # datos y queda en la última versión del esquema
+    path = str(tmp_path / "finanzas.db")
+    legacy = sqlite3.connect(path)
+    legacy.executescript(LEGACY_SCHEMA)
+    legacy.close()
+    db_manager = DatabaseManager(path)
+    try:
+        assert db_manager.schema_version() == MIGRATIONS[-1][0]
+        assert db_manager.fetch_one("SELECT monto FROM ingresos")[0] == 150050
+        assert db_manager.fetch_one("SELECT monto FROM gastos")[0] == 1225
+        indexes = {row[0] for row in db_manager.fetch_all("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert set(DATE_RANGE_INDEXES.values()) <= indexes
+    finally:
+        db_manager.close()
+    # Abrirla otra vez no vuelve a aplicar nada
+    db_manager = DatabaseManager(path)
+    assert db_manager.fetch_one("SELECT COUNT(*) FROM ingresos")[0] == 1
+    db_manager.close()
+
+def test_date_ranges_follow_composite_index(db):
+    # Los listados por usuario y rango de fechas salen del índice
+    # (usuario_id, fecha, ...) ya ordenados, sin recorrer la tabla
+    for table, index in DATE_RANGE_INDEXES.items():
+        plan = explain(db, f"SELECT fecha, monto FROM {table} WHERE usuario_id = ? AND fecha BETWEEN ? AND ? "
+                           "ORDER BY fecha", (1, "2024-01-01", "2024-12-31"))
+        assert not full_scans(plan), plan
+        assert any(index in detail for detail in plan), plan
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan
+
+# ====================== TABLAS PAGINADAS ======================
+@pytest.mark.parametrize("table", ["gastos", "ingresos"])
+def test_page_queries_search_an_index(db, table_model, table):
+    model = table_model(table)
+    category = model.columns[1]
+    for sort_column in model.sortable_columns:
+        model.sort_column = sort_column
+        for filters in ({}, {category: "Otros"}, {"fecha": ("2020-01-01", None)}):
+            model.filters = filters
+            for key in (None, [0] * len(model.order_columns())):
+                plan = explain(db, *model.page_query(key))
+                assert not full_scans(plan), (sort_column, filters, plan)
+    # Orden por defecto (fecha descendente): el índice da el orden y solo se
+    # ordenan por id las filas de un mismo día
+    model.sort_column, model.filters = "fecha", {}
+    plan = explain(db, *model.page_query(None))
+    assert any(f"idx_{table}_usuario_fecha" in detail for detail in plan), plan
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plan
+
+# ====================== DASHBOARD ======================
+def test_dashboard_queries_use_indexes(db):
+    plans = traced_plans(db, lambda: (load_dashboard_summary(db, 1, 12), load_open_goals(db, 1)))
+    assert_indexed(plans, "resumen_mensual USING PRIMARY KEY", "idx_objetivos_usuario_completado", "idx_deudas_usuario")
+
+# ====================== ANALÍTICA ======================
+def test_analytics_queries_use_covering_indexes(db):
+    analytics = pytest.importorskip("finanzas_analitica")
+    plans = traced_plans(db, lambda: (analytics.load_trends(db, 1), analytics.load_debts(db, 1)))
+    assert_indexed(plans, "COVERING INDEX idx_ingresos_usuario_tipo_fecha_monto",
+                   "COVERING INDEX idx_gastos_usuario_categoria_fecha_monto")
+
+# ====================== NOTIFICACIONES ======================
+def test_notification_queries_use_indexes(db):
+    db.execute_query("INSERT INTO gastos (usuario_id, categoria, tipo, monto, fecha) VALUES (1, 'Salud', 'Variable', 500, date('now'))")
+    plans = traced_plans(db, lambda: (generate_notifications(db, 1, rescan=True), load_notifications(db, 1)))
+    assert_indexed(plans, "idx_objetivos_usuario_fecha_meta", "idx_deudas_usuario_fecha_pago",
+                   "idx_notificaciones_usuario_leida", "USING INTEGER PRIMARY KEY (rowid>? AND rowid<?)")
+
+# ====================== RECURRENCIAS ======================
+def test_recurrence_queries_use_indexes(db):
+    plans = traced_plans(db, lambda: materialize_recurrences(db, 1))
+    assert_indexed(plans, "idx_recurrencias_usuario")
+
+# ====================== EXPORTACIÓN ======================
+@pytest.mark.parametrize("table, filters, index", [
+    ("gastos", {"fecha": ("2024-01-01", "2024-12-31")}, "idx_gastos_usuario_fecha_categoria"),
+    ("gastos", {"categoria": "Salud", "fecha": ("2024-01-01", None)}, "idx_gastos_usuario_categoria_fecha_monto"),
+    ("ingresos", {"fecha": (None, "2024-12-31")}, "idx_ingresos_usuario_fecha"),
+])
+def test_filtered_export_follows_date_index(db, table, filters, index):
+    plan = explain(db, *export_query(table, 1, "csv", filters))
+    assert not full_scans(plan), plan
+    assert any(index in detail for detail in plan), plan
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plan
+
+# ====================== BÚSQUEDA ======================
+def test_search_queries_use_indexes(db):
+    plans = traced_plans(db, lambda: search_transactions(
+        db, "gastos", 1, "farmacia", ("id", "fecha", "monto"), {"fecha": ("2020-01-01", None)}))
+    assert_indexed(plans, "SEARCH t USING INTEGER PRIMARY KEY")